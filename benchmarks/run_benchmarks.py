@@ -0,0 +1,323 @@
+"""Sıcak yollar için çevrimdışı benchmark paketi
+
+Kullanım (depo kökünden):
+    python -m benchmarks.run_benchmarks --output bench_results.json
+    python -m benchmarks.run_benchmarks --gallery-sizes 10,1000,100000,1000000 --real
+
+Sentetik ses ve sahte (stub) kodlayıcı ile çalışır; --real verilirse ve
+model yerelde mevcutsa gerçek ECAPA kodlayıcısı da ölçülür. Sonuçlar
+karşılaştırılabilir JSON olarak yazılır. Batch'li çıkarımın tek dosya
+yoluyla uyumu da ölçülür; en düşük kosinüs `--parity-tolerance` altındaysa
+çıkış kodu 1'dir.
+"""
+import argparse
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+import torch
+
+from modules.gallery import compare_storage
+from modules.inference_pool import InferencePool, default_pool_size
+from modules.recognizer import SpeakerRecognizer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+SAMPLE_RATE = 16000
+EMBEDDING_DIM = 192
+
+
+class StubEncoder:
+    """ECAPA yerine kullanılan, uzunlukla orantılı maliyetli deterministik kodlayıcı"""
+
+    source = "stub-encoder"
+
+    def __init__(self, dim=EMBEDDING_DIM, frame=160, seed=0):
+        generator = torch.Generator().manual_seed(seed)
+        self.frame = frame
+        self.weights = torch.randn(frame, dim, generator=generator) / np.sqrt(frame)
+
+    def encode_batch(self, wavs, wav_lens=None):
+        if wavs.dim() == 1:
+            wavs = wavs.unsqueeze(0)
+        batch, length = wavs.shape
+        n_frames = max(1, length // self.frame)
+        padded = torch.zeros(batch, n_frames * self.frame)
+        usable = min(length, n_frames * self.frame)
+        padded[:, :usable] = wavs[:, :usable]
+        features = torch.tanh(padded.reshape(batch, n_frames, self.frame) @ self.weights)
+        if wav_lens is None:
+            wav_lens = torch.ones(batch)
+        # Tek dosya yoluyla aynı: sinyalin sadece tam çerçeveleri havuzlanır
+        whole = (wav_lens * length / self.frame).floor().clamp(min=1)
+        valid = (torch.arange(n_frames).unsqueeze(0) < whole.unsqueeze(1)).float()
+        pooled = (features * valid.unsqueeze(-1)).sum(dim=1) / valid.sum(dim=1, keepdim=True).clamp(min=1)
+        return pooled.unsqueeze(1)
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux KB, macOS bayt döner
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def summarize(name, latencies, items_per_call=1, **params):
+    latencies = np.asarray(latencies)
+    total = latencies.sum()
+    return {
+        "benchmark": name,
+        **params,
+        "calls": int(latencies.size),
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "throughput_per_s": float(latencies.size * items_per_call / total) if total > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def timed(fn, repeats):
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def synthetic_audio(rng, seconds):
+    return (0.1 * rng.standard_normal(int(seconds * SAMPLE_RATE))).astype(np.float32)
+
+
+def make_recognizer(data_dir, encoder, **kwargs):
+    # Önbellek kapalı: her çağrı gerçek kodlama maliyetini ölçsün
+    kwargs = {"data_dir": data_dir, "cache_size": 0, **kwargs}
+    if encoder == "stub":
+        kwargs["classifier"] = StubEncoder()
+    return SpeakerRecognizer(**kwargs)
+
+
+def bench_extraction(recognizer, encoder, lengths, batch_sizes, repeats, rng):
+    results = []
+    for seconds in lengths:
+        single = [synthetic_audio(rng, seconds) for _ in range(repeats)]
+        it = iter(single)
+        results.append(summarize("extract_embedding", timed(lambda: recognizer.extract_embedding(next(it)), repeats),
+                                 encoder=encoder, audio_seconds=seconds))
+        for batch_size in batch_sizes:
+            batch = [synthetic_audio(rng, seconds * rng.uniform(0.5, 1.0)) for _ in range(batch_size)]
+            latencies = timed(lambda: recognizer.extract_embeddings(batch, batch_size=batch_size), repeats)
+            results.append(summarize("extract_embeddings", latencies, items_per_call=batch_size,
+                                     encoder=encoder, audio_seconds=seconds, batch_size=batch_size))
+    return results
+
+
+def bench_parity(recognizer, encoder, rng, files=32, min_seconds=0.5, max_seconds=4.0, batch_size=8):
+    """Batch'li çıkarım ile tek dosya yolunun aynı ses için kosinüs benzerliği
+
+    Uzunluklar geniş aralıktan seçilir; böylece batch'lerde doldurulan sinyaller olur.
+    """
+    audio = [synthetic_audio(rng, rng.uniform(min_seconds, max_seconds)) for _ in range(files)]
+    batched = recognizer.extract_embeddings(audio, batch_size=batch_size)
+    single = np.stack([recognizer.extract_embedding(clip) for clip in audio])
+    cosine = np.sum(batched * single, axis=1) / (
+        np.linalg.norm(batched, axis=1) * np.linalg.norm(single, axis=1))
+    return {"benchmark": "batch_parity", "encoder": encoder, "files": files, "batch_size": batch_size,
+            "min_cosine": float(cosine.min()), "mean_cosine": float(cosine.mean())}
+
+
+def bench_gallery(encoder, gallery_sizes, repeats, rng, query_seconds=4.0):
+    results = []
+    for size in gallery_sizes:
+        data_dir = tempfile.mkdtemp(prefix="bench_gallery_")
+        try:
+            recognizer = make_recognizer(data_dir, encoder)
+            # Galeriyi doğrudan depoya yaz (kodlayıcı maliyeti olmadan)
+            names = [f"spk_{i}" for i in range(size)]
+            matrix = rng.standard_normal((size, EMBEDDING_DIM)).astype(np.float32)
+            recognizer.store.write(names, matrix)
+            del matrix
+
+            results.append(summarize("load_embeddings", timed(recognizer.load_embeddings, max(1, repeats // 5)),
+                                     encoder=encoder, gallery_size=size))
+
+            queries = rng.standard_normal((repeats, EMBEDDING_DIM)).astype(np.float32)
+            it = iter(queries)
+            results.append(summarize("identify_embedding", timed(lambda: recognizer.identify_embedding(next(it)), repeats),
+                                     encoder=encoder, gallery_size=size))
+
+            audio = synthetic_audio(rng, query_seconds)
+            results.append(summarize("identify_speaker", timed(lambda: recognizer.identify_speaker(audio), repeats),
+                                     encoder=encoder, gallery_size=size, audio_seconds=query_seconds))
+
+            counter = iter(range(repeats))
+            results.append(summarize("save_speaker",
+                                     timed(lambda: recognizer.save_speaker(f"new_{next(counter)}", audio), repeats),
+                                     encoder=encoder, gallery_size=size, audio_seconds=query_seconds))
+            del recognizer
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    return results
+
+
+def bench_storage(gallery_sizes, dtypes, repeats, rng, noise=0.3):
+    """Sıkıştırılmış galeri tipleri: bellek, skor kayması ve top-1 uyumu (float32'ye göre)"""
+    results = []
+    for size in gallery_sizes:
+        matrix = rng.standard_normal((size, EMBEDDING_DIM)).astype(np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        rows = rng.choice(size, min(repeats, size), replace=False)
+        queries = matrix[rows] + noise * rng.standard_normal((rows.size, EMBEDDING_DIM)).astype(np.float32) / np.sqrt(EMBEDDING_DIM)
+        for dtype, stats in compare_storage(matrix, queries, dtypes=dtypes).items():
+            results.append({"benchmark": "gallery_storage", "gallery_size": size, "dtype": dtype, **stats})
+        del matrix
+    return results
+
+
+def bench_pool(encoder, configs, requests, rng, audio_seconds=3.0, batch_size=1):
+    """Çıkarım havuzu: replika x iş parçacığı kombinasyonları için verim ve gecikme
+
+    Tüm istekler aynı anda gönderilir (eşzamanlı istemciler); en yüksek
+    throughput_per_s veren kombinasyon bu makine için önerilen ayardır.
+    """
+    classifier = StubEncoder() if encoder == "stub" else make_recognizer(tempfile.mkdtemp(), encoder).classifier
+    batch = torch.from_numpy(np.stack([synthetic_audio(rng, audio_seconds) for _ in range(batch_size)]))
+    results = []
+    for replicas, threads in configs:
+        pool = InferencePool(classifier, replicas=replicas, threads_per_replica=threads, max_queue=requests)
+        pool.encode_batch(batch)  # Isınma
+        submitted = []
+        start = time.perf_counter()
+        for _ in range(requests):
+            submitted.append((time.perf_counter(), pool.submit(batch)))
+        latencies = []
+        for sent, future in submitted:
+            future.result()
+            latencies.append(time.perf_counter() - sent)
+        total = time.perf_counter() - start
+        stats = pool.stats()
+        pool.shutdown()
+        row = summarize("inference_pool", latencies, items_per_call=batch_size, encoder=encoder,
+                        replicas=replicas, threads_per_replica=threads, batch_size=batch_size,
+                        audio_seconds=audio_seconds)
+        # Latency toplamı değil duvar saati: eşzamanlı isteklerde gerçek verim
+        row["throughput_per_s"] = requests * batch_size / total
+        row["max_queue_depth"] = stats["max_queue_depth"]
+        results.append(row)
+    return results
+
+
+def parse_pool_configs(text):
+    """"1x8,2x4,4x2" -> [(1, 8), (2, 4), (4, 2)]"""
+    return [tuple(int(part) for part in item.lower().split("x")) for item in text.split(",") if item]
+
+
+def parse_list(text, cast):
+    return [cast(item) for item in text.split(",") if item]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Konuşmacı tanıma benchmark paketi")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--lengths", default="1,4,10,30", help="Ses uzunlukları (sn)")
+    parser.add_argument("--batch-sizes", default="1,8,32")
+    parser.add_argument("--gallery-sizes", default="10,1000,100000,1000000")
+    parser.add_argument("--gallery-dtypes", default="float16,int8", help="float32 ile karşılaştırılacak galeri tipleri")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--pool-configs", default=None,
+                        help="Replika x iş parçacığı listesi, ör. 1x8,2x4,4x2,8x1 (varsayılan: çekirdeğe göre)")
+    parser.add_argument("--pool-requests", type=int, default=64)
+    parser.add_argument("--real", action="store_true", help="Gerçek ECAPA modelini de ölç (yerelde mevcutsa)")
+    parser.add_argument("--parity-tolerance", type=float, default=0.999,
+                        help="Batch'li ve tek dosya embedding'leri arasında kabul edilen en düşük kosinüs")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    lengths = parse_list(args.lengths, float)
+    batch_sizes = parse_list(args.batch_sizes, int)
+    gallery_sizes = parse_list(args.gallery_sizes, int)
+    if args.pool_configs:
+        pool_configs = parse_pool_configs(args.pool_configs)
+    else:
+        # Çekirdek sayısını (replicas x threads) sabit tutan kombinasyonlar
+        cores = int(np.prod(default_pool_size()))
+        pool_configs = sorted({(r, max(1, cores // r)) for r in (1, 2, 4, 8, cores) if r <= cores})
+
+    encoders = ["stub"] + (["real"] if args.real else [])
+    results = []
+    parity = []
+    skipped = {}
+    for encoder in encoders:
+        data_dir = tempfile.mkdtemp(prefix="bench_extract_")
+        try:
+            recognizer = make_recognizer(data_dir, encoder)
+        except Exception as e:
+            skipped[encoder] = str(e)
+            print(f"{encoder} kodlayıcı atlandı: {e}")
+            shutil.rmtree(data_dir, ignore_errors=True)
+            continue
+        try:
+            print(f"[{encoder}] çıkarım benchmark'ı...")
+            results += bench_extraction(recognizer, encoder, lengths, batch_sizes, args.repeats, rng)
+            parity.append(bench_parity(recognizer, encoder, rng))
+        finally:
+            del recognizer
+            shutil.rmtree(data_dir, ignore_errors=True)
+        print(f"[{encoder}] galeri benchmark'ı...")
+        results += bench_gallery(encoder, gallery_sizes, args.repeats, rng)
+        print(f"[{encoder}] çıkarım havuzu benchmark'ı...")
+        results += bench_pool(encoder, pool_configs, args.pool_requests, rng)
+
+    print("galeri depolama benchmark'ı...")
+    storage = bench_storage(gallery_sizes, parse_list(args.gallery_dtypes, str), args.repeats, rng)
+
+    failures = [f"{row['encoder']}: batch'li çıkarım tek dosya yolundan sapıyor "
+                f"(en düşük kosinüs {row['min_cosine']:.5f})"
+                for row in parity if row["min_cosine"] < args.parity_tolerance]
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "torch": torch.__version__,
+            "torch_threads": torch.get_num_threads(),
+            "encoders": encoders,
+            "skipped": skipped,
+        },
+        "results": results,
+        "parity": parity,
+        "storage": storage,
+        "failures": failures,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    for row in results:
+        params = {k: v for k, v in row.items()
+                  if k not in ("benchmark", "calls", "p50_ms", "p95_ms", "throughput_per_s", "peak_rss_mb")}
+        print(f"{row['benchmark']:<20} {str(params):<60} p50={row['p50_ms']:.2f}ms p95={row['p95_ms']:.2f}ms")
+    for row in storage:
+        print(f"gallery_storage      size={row['gallery_size']:<10} {row['dtype']:<8} "
+              f"MB={row['bytes'] / 1e6:.1f} drift_max={row['max_score_drift']:.4f} "
+              f"top1={row['top1_agreement']:.3f} score={row['score_ms']:.2f}ms")
+    for row in parity:
+        print(f"batch_parity         {row['encoder']:<8} min_cos={row['min_cosine']:.5f} "
+              f"mean_cos={row['mean_cosine']:.5f}")
+    for failure in failures:
+        print(f"BAŞARISIZ: {failure}")
+    print(f"Sonuçlar yazıldı: {args.output}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Parçalı (sharded) galeri için yerel süreçlerle doğrulama ve benchmark
+
+Kullanım (depo kökünden):
+    python -m benchmarks.sharded_gallery --shards 4 --size 100000
+    python -m benchmarks.sharded_gallery --shards 2 --size 20000 --dtype int8
+
+Rastgele bir galeri hem tek süreçli SpeakerGallery'ye hem ShardedGallery'ye
+yüklenir. Kontroller:
+  - scatter-gather top-k sonuçları tek süreçli tam taramayla aynı olmalı
+  - eşzamanlı çağıranların (--callers) sonuçları sıralı sorgularla aynı olmalı
+  - sorgular sürerken parça eklenip çıkarılabilmeli (hata/yanlış sonuç olmadan)
+  - yeniden dengelemeden sonra toplam konuşmacı sayısı korunmalı
+Herhangi bir kontrol başarısızsa çıkış kodu 1'dir.
+"""
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+
+from modules.gallery import SpeakerGallery
+from modules.sharded_gallery import ShardedGallery
+
+EMBEDDING_DIM = 192
+
+
+def agreement(reference, sharded, queries, k):
+    """Top-k isim kümeleri ve top-1 uyumu; iki tarafın gecikmeleriyle birlikte"""
+    same_sets = top1 = 0
+    ref_times, shard_times = [], []
+    for q in queries:
+        start = time.perf_counter()
+        expected = reference.top_k(q, k=k)
+        ref_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        found = sharded.top_k(q, k=k)
+        shard_times.append(time.perf_counter() - start)
+        same_sets += {n for n, _ in expected} == {n for n, _ in found}
+        top1 += bool(expected and found and expected[0][0] == found[0][0])
+    n = max(len(queries), 1)
+    return {
+        "topk_set_agreement": same_sets / n,
+        "top1_agreement": top1 / n,
+        "single_p50_ms": float(np.percentile(np.asarray(ref_times) * 1000, 50)),
+        "sharded_p50_ms": float(np.percentile(np.asarray(shard_times) * 1000, 50)),
+        "sharded_p95_ms": float(np.percentile(np.asarray(shard_times) * 1000, 95)),
+    }
+
+
+def concurrent_queries(sharded, queries, k, callers):
+    """Sorguları `callers` iş parçacığından aynı anda gönderir; sıralı sonuçlarla karşılaştırır"""
+    start = time.perf_counter()
+    expected = [sharded.top_k(q, k=k) for q in queries]
+    serial_s = time.perf_counter() - start
+    found = [None] * len(queries)
+
+    def caller(offset):
+        for i in range(offset, len(queries), callers):
+            found[i] = sharded.top_k(queries[i], k=k)
+
+    threads = [threading.Thread(target=caller, args=(offset,)) for offset in range(callers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    concurrent_s = time.perf_counter() - start
+    return {
+        "callers": callers,
+        "mismatches": sum(a != b for a, b in zip(expected, found)),
+        "serial_qps": len(queries) / serial_s,
+        "concurrent_qps": len(queries) / concurrent_s,
+    }
+
+
+def query_during(sharded, names, matrix, action, rng):
+    """`action` çalışırken arka planda kayıtlı konuşmacıları sorgular: (sorgu, hata, yanlış)"""
+    stop = threading.Event()
+    stats = {"queries": 0, "errors": 0, "wrong": 0}
+
+    def reader():
+        while not stop.is_set():
+            row = int(rng.integers(len(names)))
+            try:
+                found = sharded.top_k(matrix[row], k=1)
+            except Exception:
+                stats["errors"] += 1
+                continue
+            stats["queries"] += 1
+            if not found or found[0][0] != names[row]:
+                stats["wrong"] += 1
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    try:
+        result = action()
+    finally:
+        stop.set()
+        thread.join()
+    return result, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parçalı galeri doğrulaması")
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16", "int8"])
+    parser.add_argument("--callers", type=int, default=4, help="Eşzamanlı sorgu gönderen iş parçacığı sayısı")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    names = [f"spk_{i}" for i in range(args.size)]
+    matrix = rng.standard_normal((args.size, EMBEDDING_DIM)).astype(np.float32)
+    rows = rng.choice(args.size, min(args.queries, args.size), replace=False)
+    queries = matrix[rows] + 0.3 * rng.standard_normal((rows.size, EMBEDDING_DIM)).astype(np.float32)
+
+    reference = SpeakerGallery(dtype=args.dtype)
+    reference.add_many(names, matrix)
+
+    root = tempfile.mkdtemp(prefix="sharded_gallery_")
+    report = {"shards": args.shards, "size": args.size, "dtype": args.dtype}
+    failures = []
+    try:
+        with ShardedGallery(root, num_shards=args.shards, dtype=args.dtype) as sharded:
+            start = time.perf_counter()
+            for offset in range(0, args.size, 65536):
+                sharded.add_many(names[offset:offset + 65536], matrix[offset:offset + 65536])
+            report["load_s"] = time.perf_counter() - start
+            report["sizes"] = sharded.sizes()
+            report["initial"] = agreement(reference, sharded, queries, args.k)
+            report["concurrent"] = concurrent_queries(sharded, queries, args.k, args.callers)
+
+            added, report["during_add_shard"] = query_during(sharded, names, matrix, sharded.add_shard, rng)
+            report["after_add_shard"] = {"sizes": sharded.sizes(),
+                                         **agreement(reference, sharded, queries, args.k)}
+            _, report["during_remove_shard"] = query_during(
+                sharded, names, matrix, lambda: sharded.remove_shard(sharded.shard_ids[0]), rng)
+            report["after_remove_shard"] = {"sizes": sharded.sizes(),
+                                            **agreement(reference, sharded, queries, args.k)}
+
+            if sum(report["after_remove_shard"]["sizes"].values()) != args.size:
+                failures.append("yeniden dengelemeden sonra konuşmacı sayısı değişti")
+            for phase in ("initial", "after_add_shard", "after_remove_shard"):
+                if report[phase]["topk_set_agreement"] < 1.0:
+                    failures.append(f"{phase}: top-k tek süreçli taramayla uyuşmuyor")
+            if report["concurrent"]["mismatches"]:
+                failures.append("eşzamanlı sorgu sonuçları sıralı sorgulardan farklı")
+            for phase in ("during_add_shard", "during_remove_shard"):
+                if report[phase]["errors"] or report[phase]["wrong"]:
+                    failures.append(f"{phase}: {report[phase]}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    report["failures"] = failures
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""Galeri için eşzamanlı kayıt/tanıma stres testi
+
+Kullanım (depo kökünden):
+    python -m benchmarks.stress_gallery --writers 4 --readers 8 --seconds 10
+    python -m benchmarks.stress_gallery --index ivf --gallery-dtype int8 --cohort 200
+
+Yazıcı iş parçacıkları sürekli yeni konuşmacı kaydederken (ara sıra aynı
+kişiye ek şablon), okuyucular kaydı tamamlanmış konuşmacıları tanımaya
+çalışır. Kontroller:
+  - hiçbir çağrı hata vermemeli
+  - kaydı tamamlanmış (tek şablonlu) konuşmacı kendi embedding'iyle sorgulanınca bulunmalı
+  - top-k sonuçları sıralı olmalı, snapshot'taki isim sayısı satır sayısıyla uyuşmalı
+  - diskten yeniden yükleme tüm kayıtları geri getirmeli
+  - journal bir kaydın ortasından kesildikten sonra yapılan eklemeler,
+    kesilen kayıt dışında hiçbir kaydı bozmamalı ya da kaybetmemeli
+Herhangi bir kontrol başarısızsa çıkış kodu 1'dir.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+
+from benchmarks.run_benchmarks import EMBEDDING_DIM, make_recognizer
+from modules.embedding_store import EmbeddingStore
+
+
+def run_stress(recognizer, writers=4, readers=8, seconds=5.0, reenroll_every=5, seed=0):
+    """Eşzamanlı kayıt/tanıma yükü uygular; sayaçlar ve hata listesiyle rapor döner"""
+    stop = threading.Event()
+    bookkeeping = threading.Lock()  # Sadece test kayıtları için (galeri için değil)
+    single = {}  # Tek şablonlu konuşmacı -> embedding (kesin tanınmalı)
+    errors = []
+    counts = {"enroll": 0, "identify": 0, "top_k": 0, "mismatch": 0}
+    latencies = {"enroll": [], "identify": []}
+
+    def fail(message):
+        with bookkeeping:
+            errors.append(message)
+
+    def writer(worker):
+        rng = np.random.default_rng(seed + worker)
+        own = []
+        i = 0
+        while not stop.is_set():
+            fresh = not own or i % reenroll_every != reenroll_every - 1
+            if fresh:
+                name = f"w{worker}_{i}"
+                own.append(name)
+            else:
+                # Aynı kişiye ek şablon: merkez değişir, artık kesin eşleşme beklenmez
+                name = own[int(rng.integers(len(own)))]
+                with bookkeeping:
+                    single.pop(name, None)
+            i += 1
+            embedding = rng.standard_normal(EMBEDDING_DIM).astype(np.float32)
+            start = time.perf_counter()
+            success, msg = recognizer.enroll_embedding(name, embedding)
+            elapsed = time.perf_counter() - start
+            if not success:
+                fail(f"enroll {name}: {msg}")
+                continue
+            with bookkeeping:
+                counts["enroll"] += 1
+                latencies["enroll"].append(elapsed)
+                if fresh:
+                    single[name] = embedding
+
+    def reader(worker):
+        rng = np.random.default_rng(seed + 1000 + worker)
+        while not stop.is_set():
+            with bookkeeping:
+                names = list(single)
+            if not names:
+                time.sleep(0.001)
+                continue
+            name = names[int(rng.integers(len(names)))]
+            with bookkeeping:
+                embedding = single.get(name)
+            if embedding is None:
+                continue
+            try:
+                start = time.perf_counter()
+                found, _ = recognizer.identify_embedding(embedding, threshold=float("-inf"))
+                elapsed = time.perf_counter() - start
+                ranked = recognizer.top_k_embedding(embedding, k=3)
+                snapshot = recognizer.gallery.snapshot()
+                consistent = len(snapshot.names) == len(snapshot)
+            except Exception as e:
+                fail(f"identify {name}: {e!r}")
+                continue
+            with bookkeeping:
+                counts["identify"] += 1
+                counts["top_k"] += 1
+                latencies["identify"].append(elapsed)
+                # Okuma sırasında ek şablon almış olabilir; sadece hâlâ tek şablonluysa kontrol et
+                still_single = name in single
+            scores = [score for _, score in ranked]
+            if still_single and found != name:
+                with bookkeeping:
+                    counts["mismatch"] += 1
+                fail(f"{name} sorgusu {found} döndü")
+            if scores != sorted(scores, reverse=True) or not consistent:
+                fail(f"tutarsız okuma: {ranked}")
+
+    threads = ([threading.Thread(target=writer, args=(w,)) for w in range(writers)] +
+               [threading.Thread(target=reader, args=(r,)) for r in range(readers)])
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started
+
+    # Kalıcılık: diskten yeniden yüklenen galeri aynı konuşmacıları içermeli
+    expected = set(recognizer.gallery.names)
+    recognizer.load_embeddings()
+    reloaded = set(recognizer.gallery.names)
+    if reloaded != expected:
+        fail(f"yeniden yükleme uyuşmuyor: {len(expected - reloaded)} eksik, {len(reloaded - expected)} fazla")
+    for name, embedding in list(single.items())[:200]:
+        found, _ = recognizer.identify_embedding(embedding, threshold=float("-inf"))
+        if found != name:
+            fail(f"yeniden yüklemeden sonra {name} sorgusu {found} döndü")
+
+    def p95(values):
+        return float(np.percentile(np.asarray(values) * 1000, 95)) if values else None
+
+    return {
+        "writers": writers,
+        "readers": readers,
+        "duration_s": duration,
+        "speakers": len(reloaded),
+        **counts,
+        "enroll_per_s": counts["enroll"] / duration,
+        "identify_per_s": counts["identify"] / duration,
+        "enroll_p95_ms": p95(latencies["enroll"]),
+        "identify_p95_ms": p95(latencies["identify"]),
+        "errors": errors[:20],
+        "error_count": len(errors),
+    }
+
+
+def run_torn_journal(root, rounds=60, compact_every=16, seed=0):
+    """Journal'ı tekrar tekrar bir kaydın ortasından keser ve eklemeye devam eder
+
+    Her turda birkaç kayıt (ara sıra silme) eklenir, son kayıt rastgele bir
+    bayttan kesilir (çökme benzetimi) ve eklemeye aynı nesneyle, yeni bir
+    nesneyle ya da load'dan sonra devam edilir. Sonunda depo, kesilen kayıtlar
+    hiç yazılmamış gibi beklenen içerikle birebir aynı olmalıdır.
+    """
+    rng = np.random.default_rng(seed)
+    store = EmbeddingStore(root, compact_every=compact_every)
+    expected = {}
+    errors = []
+    torn = 0
+    for round_no in range(rounds):
+        for i in range(int(rng.integers(1, 4))):
+            if expected and rng.random() < 0.2:
+                name = sorted(expected)[int(rng.integers(len(expected)))]
+                store.delete([name])
+                del expected[name]
+            else:
+                name = f"r{round_no}_{i}"
+                vector = rng.standard_normal(EMBEDDING_DIM).astype(np.float32)
+                store.append(name, vector)
+                expected[name] = vector
+        # Son kayıt yeni bir konuşmacı: kesilince yalnızca o kaybolmalı
+        name = f"r{round_no}_torn"
+        vector = rng.standard_normal(EMBEDDING_DIM).astype(np.float32)
+        store.append(name, vector)
+        if not store.journal_path.exists():
+            expected[name] = vector  # Bu ekleme compaction tetikledi, kesilecek kayıt yok
+            continue
+        record = EmbeddingStore._RECORD_HEADER.size + len(name.encode("utf-8")) + EMBEDDING_DIM * 4
+        os.truncate(store.journal_path, store.journal_path.stat().st_size - int(rng.integers(1, record)))
+        torn += 1
+        mode = round_no % 3
+        if mode == 1:
+            store = EmbeddingStore(root, compact_every=compact_every)
+        elif mode == 2:
+            store = EmbeddingStore(root, compact_every=compact_every)
+            store.load()
+
+    names, matrix = EmbeddingStore(root).load()
+    if sorted(names) != sorted(expected):
+        errors.append(f"kesik journal: {len(set(expected) - set(names))} eksik, "
+                      f"{len(set(names) - set(expected))} fazla kayıt")
+    for row, name in enumerate(names):
+        if name in expected and not np.array_equal(matrix[row], expected[name]):
+            errors.append(f"kesik journal: {name} vektörü bozuk")
+    return {"rounds": rounds, "torn": torn, "records": len(names), "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Eşzamanlı kayıt/tanıma stres testi")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--index", default="exact", choices=["exact", "ivf"])
+    parser.add_argument("--gallery-dtype", default="float32", choices=["float32", "float16", "int8"])
+    parser.add_argument("--cohort", type=int, default=0, help="AS-norm için rastgele kohort boyutu (0: kapalı)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix="stress_gallery_")
+    try:
+        index_params = {"min_train_size": 256} if args.index == "ivf" else None
+        recognizer = make_recognizer(data_dir, "stub", index=args.index, index_params=index_params,
+                                     gallery_dtype=args.gallery_dtype)
+        if args.cohort:
+            rng = np.random.default_rng(args.seed)
+            recognizer.set_cohort(rng.standard_normal((args.cohort, EMBEDDING_DIM)).astype(np.float32))
+        report = run_stress(recognizer, args.writers, args.readers, args.seconds, seed=args.seed)
+        journal = run_torn_journal(os.path.join(data_dir, "torn_journal"), seed=args.seed)
+        report["torn_journal"] = journal
+        report["errors"] += journal["errors"]
+        report["error_count"] += len(journal["errors"])
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    sys.exit(1 if report["error_count"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Deneme skorlama motoru için sentetik doğrulama ve benchmark
+
+Kullanım (depo kökünden):
+    python -m benchmarks.trial_scoring --trials 5000000 --files 20000
+    python -m benchmarks.trial_scoring --trials 200000 --exact-limit 200000
+
+Konuşmacı başına kümelenmiş rastgele embedding'ler üretilir ve denemeler
+parça parça skorlanıp histograma eklenir (modules.evaluation ile aynı yol).
+Kontroller:
+  - blok matris çarpımı skorları satır bazlı çarpımla aynı olmalı
+  - deneme sayısı `--exact-limit`'i aşmıyorsa histogram EER/minDCF değerleri
+    sıralamaya dayalı kesin hesapla kutu çözünürlüğü içinde uyuşmalı
+Herhangi bir kontrol başarısızsa çıkış kodu 1'dir.
+"""
+import argparse
+import json
+import sys
+import time
+import numpy as np
+
+from modules.evaluation import (ScoreHistogram, compute_eer, compute_min_dcf, det_curve,
+                                score_trials)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+EMBEDDING_DIM = 192
+
+
+def synthetic_files(rng, files, speakers, noise):
+    """Konuşmacı merkezleri etrafında gürültülü, normalize embedding'ler ve konuşmacı etiketleri"""
+    centers = rng.standard_normal((speakers, EMBEDDING_DIM)).astype(np.float32)
+    owner = rng.integers(speakers, size=files)
+    matrix = centers[owner] + noise * rng.standard_normal((files, EMBEDDING_DIM)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix, owner
+
+
+def synthetic_trials(rng, owner, count, per_enroll=100, target_ratio=0.1):
+    """Kayıt dosyası başına `per_enroll` test; yaklaşık `target_ratio` oranında hedef deneme"""
+    by_speaker = {}
+    for i, speaker in enumerate(owner):
+        by_speaker.setdefault(speaker, []).append(i)
+    enroll = np.repeat(rng.integers(owner.size, size=-(-count // per_enroll)), per_enroll)[:count].astype(np.int32)
+    test = rng.integers(owner.size, size=count).astype(np.int32)
+    # Hedef denemeler için test dosyası aynı konuşmacıdan seçilir
+    targets = np.flatnonzero(rng.random(count) < target_ratio)
+    for i in targets:
+        same = by_speaker[owner[enroll[i]]]
+        test[i] = same[rng.integers(len(same))]
+    return enroll, test, owner[enroll] == owner[test]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deneme skorlama motoru doğrulaması")
+    parser.add_argument("--trials", type=int, default=2_000_000)
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--speakers", type=int, default=1000)
+    parser.add_argument("--noise", type=float, default=2.0)
+    parser.add_argument("--chunk", type=int, default=1_000_000)
+    parser.add_argument("--block", type=int, default=16384)
+    parser.add_argument("--bins", type=int, default=200_000)
+    parser.add_argument("--exact-limit", type=int, default=2_000_000,
+                        help="Bu sayıya kadar denemede kesin (sıralamalı) metriklerle karşılaştır")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    embeddings, owner = synthetic_files(rng, args.files, args.speakers, args.noise)
+    histogram = ScoreHistogram(bins=args.bins)
+    keep_exact = args.trials <= args.exact_limit
+    all_scores, all_labels = [], []
+    failures = []
+    elapsed = 0.0
+    done = 0
+    while done < args.trials:
+        count = min(args.chunk, args.trials - done)
+        enroll, test, labels = synthetic_trials(rng, owner, count)
+        start = time.perf_counter()
+        scores = score_trials(embeddings, enroll, test, block=args.block)
+        histogram.add(scores, labels)
+        elapsed += time.perf_counter() - start
+        if done == 0:
+            sample = slice(0, 100_000)
+            rowwise = np.einsum("ij,ij->i", embeddings[enroll[sample]], embeddings[test[sample]])
+            if not np.allclose(scores[sample], rowwise, atol=1e-5):
+                failures.append("blok skorları satır bazlı çarpımla uyuşmuyor")
+        if keep_exact:
+            all_scores.append(scores)
+            all_labels.append(labels)
+        done += count
+
+    curve = histogram.curve()
+    eer, eer_threshold = compute_eer(*curve)
+    min_dcf, dcf_threshold = compute_min_dcf(*curve)
+    report = {
+        "trials": done,
+        "files": args.files,
+        "targets": int(histogram.target.sum()),
+        "eer": eer,
+        "eer_threshold": eer_threshold,
+        "min_dcf": min_dcf,
+        "min_dcf_threshold": dcf_threshold,
+        "resolution": histogram.width,
+        "score_s": elapsed,
+        "trials_per_s": done / elapsed if elapsed > 0 else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if keep_exact:
+        exact = det_curve(np.concatenate(all_scores), np.concatenate(all_labels))
+        exact_eer, exact_threshold = compute_eer(*exact)
+        exact_dcf, _ = compute_min_dcf(*exact)
+        report["exact"] = {"eer": exact_eer, "eer_threshold": exact_threshold, "min_dcf": exact_dcf}
+        # Kutu içindeki skorlar ayırt edilemez: eşik bir kutu, oranlar o kutudaki deneme payı kadar sapabilir
+        if abs(exact_threshold - eer_threshold) > 2 * histogram.width:
+            failures.append("EER eşiği kesin hesaptan kutu çözünürlüğünden fazla sapıyor")
+        if abs(exact_eer - eer) > 1e-3 or abs(exact_dcf - min_dcf) > 1e-2:
+            failures.append("histogram metrikleri kesin hesapla uyuşmuyor")
+
+    report["failures"] = failures
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+import time
+import numpy as np
+from pathlib import Path
+from utils.file_manager import atomic_write
+
+
+class ExactIndex:
+    """Varsayılan indeks: galeri matrisi üzerinde tam (brute force) tarama"""
+
+    name = "exact"
+
+    def __init__(self, gallery):
+        self.gallery = gallery
+
+    def rebuild(self):
+        pass
+
+    def add(self, row):
+        pass
+
+    def search(self, query, k=5, snapshot=None):
+        """snapshot verilirse arama o sabit galeri görünümü üzerinde yapılır"""
+        return (snapshot or self.gallery.snapshot()).top_k(query, k=k)
+
+    def save(self, path):
+        pass
+
+    def load(self, path):
+        return True
+
+
+class IVFIndex(ExactIndex):
+    """Inverted-file (IVF) yaklaşık en yakın komşu indeksi
+
+    Galeri satırları k-means merkezlerine göre kümelere ayrılır. Sorguda
+    sadece en yakın `nprobe` kümenin üyeleri skorlanır; `nprobe` arttıkça
+    recall artar, gecikme de artar. Galeri `min_train_size` satırdan
+    küçükken indeks eğitilmez ve tam taramaya düşer. Galeri son eğitimdeki
+    boyutunun `retrain_growth` katına ulaşınca (küme başına satır sayısı, yani
+    sorgu başına taranan satır o oranda büyüyünce) merkezler yeniden eğitilir.
+
+    Okuyucular (centroids, kümeler) ikilisini tek bir yayınlanmış demetten
+    okur; yazıcı değiştirdiği kümeleri kopyalayıp demeti yeniden yayınlar.
+
+    Kayıtta her satırın bir sağlama değeri de saklanır: yüklemede değeri
+    değişen (ör. merkez güncellemesiyle günlükte üzerine yazılan) satırlar
+    yeniden kümelere atanır.
+    """
+
+    name = "ivf"
+
+    def __init__(self, gallery, nlist=None, nprobe=8, min_train_size=1024,
+                 kmeans_iters=10, seed=0, retrain_growth=2.0):
+        super().__init__(gallery)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.kmeans_iters = kmeans_iters
+        self.seed = seed
+        self.retrain_growth = retrain_growth
+        # Merkezlerin eğitildiği andaki galeri boyutu
+        self.trained_size = 0
+        self.centroids = None
+        self.assignments = np.empty(0, dtype=np.int32)
+        self._lists = []
+        self._published = None  # (centroids, kümeler) veya eğitilmemişse None
+
+    @property
+    def trained(self):
+        return self._published is not None
+
+    def _kmeans(self, data, nlist):
+        """Kosinüs (spherical) k-means; veri satırları birim uzunlukta"""
+        rng = np.random.default_rng(self.seed)
+        centroids = data[rng.choice(data.shape[0], nlist, replace=False)].copy()
+        for _ in range(self.kmeans_iters):
+            assign = np.argmax(data @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, data)
+            counts = np.bincount(assign, minlength=nlist)
+            empty = counts == 0
+            # Boş kalan kümeleri rastgele noktalarla yeniden başlat
+            if empty.any():
+                sums[empty] = data[rng.choice(data.shape[0], int(empty.sum()), replace=False)]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+        return centroids
+
+    def _assign(self, start, stop, block=65536):
+        """Galeri satırları [start, stop) için en yakın kümeler (bloklar halinde çözülür)"""
+        out = np.empty(stop - start, dtype=np.int32)
+        for offset in range(start, stop, block):
+            vectors = self.gallery.vectors(slice(offset, min(offset + block, stop)))
+            out[offset - start:offset - start + vectors.shape[0]] = np.argmax(vectors @ self.centroids.T, axis=1)
+        return out
+
+    def _checksums(self, start, stop, block=65536):
+        """Satırların sabit rastgele bir yöndeki izdüşümü; satır değişince değer de değişir"""
+        probe = np.random.default_rng(12345).standard_normal(self.gallery.dim).astype(np.float32)
+        out = np.empty(stop - start, dtype=np.float32)
+        for offset in range(start, stop, block):
+            vectors = self.gallery.vectors(slice(offset, min(offset + block, stop)))
+            out[offset - start:offset - start + vectors.shape[0]] = vectors @ probe
+        return out
+
+    def _rebuild_lists(self):
+        nlist = self.centroids.shape[0]
+        order = np.argsort(self.assignments, kind="stable").astype(np.int64)
+        bounds = np.searchsorted(self.assignments[order], np.arange(nlist + 1))
+        self._lists = [order[bounds[c]:bounds[c + 1]] for c in range(nlist)]
+        self._publish()
+
+    def _publish(self):
+        self._published = None if self.centroids is None else (self.centroids, tuple(self._lists))
+
+    def rebuild(self):
+        """K-means merkezlerini yeniden eğitir ve tüm satırları kümelere atar"""
+        n = len(self.gallery)
+        if n < self.min_train_size:
+            self.centroids = None
+            self.trained_size = 0
+            self.assignments = np.empty(0, dtype=np.int32)
+            self._lists = []
+            self._publish()
+            return
+
+        nlist = self.nlist or max(1, int(4 * np.sqrt(n)))
+        nlist = min(nlist, n)
+        # Eğitim için küme başına en fazla 256 örnek yeterli
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(n, nlist * 256)
+        sample = self.gallery.vectors(rng.choice(n, sample_size, replace=False)
+                                      if sample_size < n else slice(0, n))
+        self.centroids = self._kmeans(np.ascontiguousarray(sample), nlist)
+        self.trained_size = n
+        self.assignments = self._assign(0, n)
+        self._rebuild_lists()
+
+    def needs_retrain(self, n=None):
+        """Galeri son eğitimden bu yana `retrain_growth` katına büyüdü mü"""
+        n = len(self.gallery) if n is None else n
+        return bool(self.retrain_growth) and self.trained_size > 0 and n >= self.retrain_growth * self.trained_size
+
+    def add(self, row):
+        """Tek bir galeri satırını (yeni veya güncellenmiş) en yakın kümeye ekler
+
+        Galeri yeterince büyüdüyse satırı eklemek yerine indeks yeniden eğitilir.
+        """
+        if not self.trained:
+            if len(self.gallery) >= self.min_train_size:
+                self.rebuild()
+            return
+        if self.needs_retrain():
+            self.rebuild()
+            return
+
+        cluster = int(np.argmax(self.centroids @ self.gallery.vectors(row)))
+        if row < self.assignments.shape[0]:
+            old = int(self.assignments[row])
+            if old == cluster:
+                return
+            # Kümeler yerinde değiştirilmez: okuyucular eski dizileri kullanmaya devam eder
+            self._lists[old] = self._lists[old][self._lists[old] != row]
+            self.assignments[row] = cluster
+        else:
+            self.assignments = np.append(self.assignments, np.int32(cluster))
+        self._lists[cluster] = np.append(self._lists[cluster], np.int64(row))
+        self._publish()
+
+    def search(self, query, k=5, nprobe=None, snapshot=None):
+        published = self._published
+        snapshot = snapshot or self.gallery.snapshot()
+        if published is None:
+            return super().search(query, k=k, snapshot=snapshot)
+        centroids, lists = published
+
+        q = self.gallery.normalize(query)
+        nprobe = min(nprobe or self.nprobe, centroids.shape[0])
+        centroid_scores = centroids @ q
+        if nprobe < centroid_scores.shape[0]:
+            probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probe = np.arange(centroid_scores.shape[0])
+        candidates = np.concatenate([lists[c] for c in probe])
+        # Snapshot'tan sonra eklenen satırlar bu aramada görünmez
+        candidates = candidates[candidates < len(snapshot)]
+        if candidates.size == 0 or k <= 0:
+            return []
+
+        scores = snapshot.scores(q, rows=candidates)
+        k = min(k, candidates.size)
+        if k < candidates.size:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(candidates.size)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(snapshot.name(candidates[i]), float(scores[i])) for i in top]
+
+    def save(self, path):
+        if not self.trained:
+            return
+        with atomic_write(path) as f:
+            np.savez(f, centroids=self.centroids, assignments=self.assignments,
+                     checksums=self._checksums(0, self.assignments.shape[0]),
+                     trained_size=np.int64(self.trained_size))
+
+    def load(self, path):
+        """Kaydedilmiş indeksi yükler; değişen satırları yeniden, eksikleri artımlı olarak atar
+
+        Galeri kayıttan bu yana yeniden eğitim gerektirecek kadar büyüdüyse
+        False döner (çağıran rebuild etmelidir).
+        """
+        path = Path(path)
+        if not path.exists():
+            return False
+        with np.load(path) as data:
+            centroids = data["centroids"]
+            assignments = data["assignments"]
+            checksums = data["checksums"] if "checksums" in data.files else None
+            trained_size = int(data["trained_size"]) if "trained_size" in data.files else assignments.shape[0]
+        n = len(self.gallery)
+        if centroids.shape[1] != self.gallery.dim or assignments.shape[0] > n:
+            return False
+        self.trained_size = trained_size
+        if self.needs_retrain(n):
+            return False
+        self.centroids = centroids.astype(np.float32)
+        assignments = assignments.astype(np.int32)
+        saved = assignments.shape[0]
+        if checksums is None or checksums.shape[0] != saved:
+            # Eski biçim: kayıtlı atamaların hangi satırlara ait olduğu doğrulanamaz
+            assignments = self._assign(0, saved)
+        else:
+            changed = np.flatnonzero(~np.isclose(self._checksums(0, saved), checksums, rtol=1e-4, atol=1e-5))
+            if changed.size:
+                assignments[changed] = np.argmax(self.gallery.vectors(changed) @ self.centroids.T, axis=1)
+        if saved < n:
+            missing = self._assign(assignments.shape[0], n)
+            assignments = np.concatenate([assignments, missing])
+        self.assignments = assignments.astype(np.int32)
+        self._rebuild_lists()
+        return True
+
+
+def create_index(kind, gallery, **kwargs):
+    """İsimden indeks oluşturur: "exact" veya "ivf" """
+    if kind == "exact":
+        return ExactIndex(gallery)
+    if kind == "ivf":
+        return IVFIndex(gallery, **kwargs)
+    raise ValueError(f"Bilinmeyen indeks türü: {kind}")
+
+
+def verify_index(index, gallery, queries, k=10):
+    """ANN sonuçlarını tam taramayla karşılaştırır: recall@k, top-1 uyumu ve gecikmeler"""
+    queries = np.asarray(queries, dtype=np.float32)
+    hits = 0
+    top1 = 0
+    exact_time = 0.0
+    ann_time = 0.0
+    for q in queries:
+        t0 = time.perf_counter()
+        exact = gallery.top_k(q, k=k)
+        t1 = time.perf_counter()
+        approx = index.search(q, k=k)
+        t2 = time.perf_counter()
+        exact_time += t1 - t0
+        ann_time += t2 - t1
+
+        exact_names = {name for name, _ in exact}
+        hits += sum(1 for name, _ in approx if name in exact_names)
+        if exact and approx and exact[0][0] == approx[0][0]:
+            top1 += 1
+
+    n = max(len(queries), 1)
+    expected = sum(min(k, len(gallery)) for _ in range(len(queries))) or 1
+    return {
+        "queries": len(queries),
+        "k": k,
+        "recall_at_k": hits / expected,
+        "top1_agreement": top1 / n,
+        "exact_ms": exact_time / n * 1000,
+        "ann_ms": ann_time / n * 1000,
+    }
@@ -5,6 +5,47 @@ import threading
 import time
 import os
 
+class RingBuffer:
+    """Sabit boyutlu, önceden ayrılmış mono ses halka tamponu
+
+    Yazıcı (ses callback'i) sadece kısa bir memcpy için kilit alır;
+    okuyucular istedikleri pencerenin kopyasını alıp kilidi hemen bırakır.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = int(capacity)
+        self._data = np.zeros(self.capacity, dtype=np.float32)
+        self._lock = threading.Lock()
+        self.total_written = 0  # Başlangıçtan beri yazılan toplam örnek sayısı
+
+    def write(self, block):
+        block = np.asarray(block, dtype=np.float32).reshape(-1)
+        n = block.shape[0]
+        if n >= self.capacity:
+            block = block[-self.capacity:]
+        with self._lock:
+            start = (self.total_written + n - block.shape[0]) % self.capacity
+            first = min(block.shape[0], self.capacity - start)
+            self._data[start:start + first] = block[:first]
+            if first < block.shape[0]:
+                self._data[:block.shape[0] - first] = block[first:]
+            self.total_written += n
+
+    def read(self, start, end):
+        """[start, end) mutlak örnek aralığını kopyalar; veri henüz yoksa veya ezildiyse None"""
+        with self._lock:
+            if end > self.total_written or start < self.total_written - self.capacity or start >= end:
+                return None
+            i0 = start % self.capacity
+            length = end - start
+            first = min(length, self.capacity - i0)
+            out = np.empty(length, dtype=np.float32)
+            out[:first] = self._data[i0:i0 + first]
+            if first < length:
+                out[first:] = self._data[:length - first]
+            return out
+
+
 class AudioRecorder:
     def __init__(self, sample_rate=16000, channels=1):
         self.sample_rate = sample_rate
@@ -12,6 +53,7 @@ class AudioRecorder:
         self.recording = False
         self.frames = []
         self.stream = None
+        self.ring = None
 
     def start_recording(self):
         if self.recording:
@@ -46,13 +88,55 @@ class AudioRecorder:
             print(status)
         self.frames.append(indata.copy())
 
-    def record_fixed_duration(self, duration, output_path):
-        """Belirli bir süre için kayıt yapar (bloklayıcı işlem)"""
+    def start_streaming(self, buffer_seconds=30):
+        """Sürekli akış modu: kayıt listeye değil, sabit boyutlu halka tampona yazılır"""
+        if self.recording:
+            # Süren kayıt (akış ya da normal) başka bir tamponu dolduruyor; paylaşılamaz
+            raise RuntimeError("Kayıt zaten sürüyor; önce durdurun")
+        self.ring = RingBuffer(int(buffer_seconds * self.sample_rate))
+        self.recording = True
+        self.stream = sd.InputStream(samplerate=self.sample_rate,
+                                     channels=self.channels,
+                                     dtype="float32",
+                                     callback=self._stream_callback)
+        self.stream.start()
+        print("Akış kaydı başladı...")
+        return self.ring
+
+    def stop_streaming(self):
+        if not self.recording:
+            return
+        self.recording = False
+        if self.stream:
+            self.stream.stop()
+            self.stream.close()
+            self.stream = None
+        print("Akış kaydı durduruldu.")
+
+    def _stream_callback(self, indata, frames, time, status):
+        if status:
+            print(status)
+        # Çok kanallıysa mono'ya indir; callback asla çıkarım beklemez
+        if indata.shape[1] > 1:
+            self.ring.write(indata.mean(axis=1))
+        else:
+            self.ring.write(indata[:, 0])
+
+    def record_fixed_duration(self, duration, output_path=None):
+        """Belirli bir süre için kayıt yapar (bloklayıcı işlem)
+
+        output_path verilmezse kayıt diske yazılmaz, (Time, Channels) boyutlu
+        float32 numpy dizisi olarak döner.
+        """
         print(f"{duration} saniye kayıt yapılıyor...")
         recording = sd.rec(int(duration * self.sample_rate), 
                            samplerate=self.sample_rate, 
-                           channels=self.channels)
+                           channels=self.channels,
+                           dtype="float32")
         sd.wait()  # Kaydın bitmesini bekle
+        if output_path is None:
+            print("Kayıt tamamlandı (bellekte).")
+            return recording
         sf.write(output_path, recording, self.sample_rate)
         print(f"Kayıt tamamlandı: {output_path}")
         return output_path
@@ -0,0 +1,243 @@
+"""Dizinler üzerinde toplu kayıt ve tanıma (komut satırı)
+
+Kullanım (depo kökünden):
+    python -m modules.bulk enroll data/clips --output enroll.jsonl
+    python -m modules.bulk identify archive/ --output results.csv --top-k 3
+
+Kayıtta konuşmacı adı varsayılan olarak dosyanın bulunduğu klasörün
+adıdır (--name-from stem ile dosya adı kullanılır). Tanıma sonuçları her
+batch'ten sonra, kayıt sonuçları her dosyadan sonra diske yazılır; aynı çıktı
+dosyasıyla tekrar çalıştırıldığında daha önce işlenen dosyalar atlanır.
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+
+from utils.file_manager import walk_audio_files
+from .frontend import AudioFrontend
+
+_frontend = None
+
+# Kayıttan önce yazılan işaret; aynı yol için sonuç satırı yoksa kayıt yarıda kalmıştır
+PENDING = "pending"
+
+
+def decode_file(path, target_rate=16000):
+    """İşçi içinde dosyayı çözer: (yol, 16 kHz mono float32 dizi veya None, hata)"""
+    global _frontend
+    if _frontend is None or _frontend.target_rate != target_rate:
+        _frontend = AudioFrontend(target_rate=target_rate)
+    try:
+        return path, _frontend.load(path).squeeze(0).numpy(), None
+    except Exception as e:
+        return path, None, str(e)
+
+
+def path_key(path):
+    """Devam kaydı anahtarı: "dir" ve "./dir" ile yapılan çalışmalar aynı dosyayı eşler"""
+    return str(Path(path).resolve())
+
+
+class ResultWriter:
+    """JSONL veya CSV sonuçlarını artımlı yazar; devam için işlenmiş dosyaları okur
+
+    `done` ve `pending` çözülmüş yollarla anahtarlanır. `pending`, kayıt işareti
+    yazılmış ama sonucu yazılamamış (kesintiye uğramış) dosyalardır.
+    """
+
+    def __init__(self, path, fields):
+        self.path = Path(path)
+        self.fields = fields
+        self.format = "csv" if self.path.suffix.lower() == ".csv" else "jsonl"
+        self.done, self.pending = self._load_done()
+        new_file = not self.path.exists() or self.path.stat().st_size == 0
+        self._file = open(self.path, "a", encoding="utf-8", newline="")
+        if self.format == "csv":
+            self._csv = csv.DictWriter(self._file, fieldnames=fields, extrasaction="ignore")
+            if new_file:
+                self._csv.writeheader()
+
+    def _load_done(self):
+        done, pending = set(), set()
+        if not self.path.exists():
+            return done, pending
+        with open(self.path, "r", encoding="utf-8", newline="") as f:
+            if self.path.suffix.lower() == ".csv":
+                rows = csv.DictReader(f)
+            else:
+                rows = []
+                for line in f:
+                    try:
+                        rows.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # Kesintide yarım kalmış son satır
+                        continue
+            for row in rows:
+                if not row.get("path"):
+                    continue
+                if str(row.get("success")) == PENDING:
+                    pending.add(path_key(row["path"]))
+                    continue
+                # Hatalı satırlar tamamlanmış sayılmaz, devamda tekrar denenir
+                if row.get("error") or str(row.get("success")).lower() == "false":
+                    continue
+                done.add(path_key(row["path"]))
+        return done, pending - done
+
+    def write_many(self, rows):
+        for row in rows:
+            if self.format == "csv":
+                self._csv.writerow(row)
+            else:
+                self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+            if row.get("success") != PENDING:
+                self.done.add(path_key(row["path"]))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+def iter_decoded(paths, chunk, workers=4, use_processes=False, target_rate=16000):
+    """Dosyaları havuzda parça parça çözer ve her parçayı (yol, ses, hata) listesi olarak verir
+
+    Bir parça tüketilirken (ör. kodlanırken) sonraki parça arka planda çözülür.
+    """
+    pool_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with pool_cls(max_workers=workers) as pool:
+        def submit(chunk_paths):
+            return [pool.submit(decode_file, p, target_rate) for p in chunk_paths]
+
+        chunks = [paths[i:i + chunk] for i in range(0, len(paths), chunk)]
+        in_flight = submit(chunks[0]) if chunks else []
+        for index in range(len(chunks)):
+            decoded = [future.result() for future in in_flight]
+            # Bir sonraki parçanın çözümü bu parça işlenirken başlar
+            in_flight = submit(chunks[index + 1]) if index + 1 < len(chunks) else []
+            yield decoded
+
+
+def speaker_name(path, root, name_from):
+    path = Path(path)
+    if name_from == "stem" or path.parent == Path(root):
+        return path.stem
+    return path.parent.name
+
+
+def already_enrolled(recognizer, name, embedding, tolerance=1e-4):
+    """Embedding konuşmacının şablonlarından biriyle aynıysa True (yarım kalan kayıt denetimi)"""
+    templates = recognizer.get_templates(name)
+    if len(templates) == 0:
+        return False
+    vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+    vector = vector / (np.linalg.norm(vector) or 1.0)
+    templates = templates / np.maximum(np.linalg.norm(templates, axis=1, keepdims=True), 1e-12)
+    return bool(np.max(templates @ vector) >= 1.0 - tolerance)
+
+
+def run_bulk(recognizer, mode, directory, output, batch_size=16, workers=4,
+             use_processes=False, name_from="parent", top_k=1, threshold=None):
+    """Dizini tarar, çözmeyi havuzda paralel yapar ve kodlayıcıyı batch'lerle besler
+
+    Çözme bir sonraki parça için arka planda sürerken mevcut parça kodlanır.
+    Dönüş: işlenen/atlanan/hatalı dosya sayıları ve dosya/sn.
+    """
+    fields = (["path", "speaker", "success", "message"] if mode == "enroll"
+              else ["path", "speaker", "score", "top_k", "error"])
+    writer = ResultWriter(output, fields)
+    files = [str(p) for p in walk_audio_files(directory)]
+    pending = [p for p in files if path_key(p) not in writer.done]
+    skipped = len(files) - len(pending)
+    print(f"{len(files)} dosya bulundu, {skipped} tanesi daha önce işlenmiş.")
+
+    if threshold is None:
+        threshold = recognizer.default_threshold
+
+    chunk = max(batch_size * 4, 1)
+    processed = errors = 0
+    start = time.perf_counter()
+
+    for decoded in iter_decoded(pending, chunk, workers, use_processes, recognizer.sample_rate):
+        ok = [(path, audio) for path, audio, error in decoded if audio is not None]
+        rows = []
+        for path, audio, error in decoded:
+            if audio is None:
+                errors += 1
+                rows.append({"path": path, "success": False, "message": error} if mode == "enroll"
+                            else {"path": path, "error": error})
+
+        embeddings = recognizer.extract_embeddings([audio for _, audio in ok], batch_size=batch_size) if ok else []
+        for (path, _), embedding in zip(ok, embeddings):
+            if mode == "enroll":
+                name = speaker_name(path, directory, name_from)
+                if path_key(path) in writer.pending and already_enrolled(recognizer, name, embedding):
+                    # Önceki çalışma kaydı yapıp sonucu yazamadan kesilmiş
+                    writer.write_many([{"path": path, "speaker": name, "success": True,
+                                        "message": "Önceki çalışmada kaydedilmiş"}])
+                    continue
+                # İşaret kayıttan önce diske iner; kesintide devam bu dosyayı denetler
+                writer.write_many([{"path": path, "speaker": name, "success": PENDING}])
+                success, msg = recognizer.enroll_embedding(name, embedding)
+                if success:
+                    recognizer.archive_samples(name, [path])
+                writer.write_many([{"path": path, "speaker": name, "success": success, "message": msg}])
+            else:
+                # Tek skorlama turu: en iyi aday eşikle karşılaştırılır, kalanlar top_k'ya yazılır
+                ranked = recognizer.top_k_embedding(embedding, k=max(top_k, 1))
+                name, score = ranked[0] if ranked else ("Bilinmiyor", 0.0)
+                if score < threshold:
+                    name = "Bilinmiyor"
+                ranked = ranked[:top_k]
+                rows.append({"path": path, "speaker": name, "score": float(score),
+                             "top_k": json.dumps(ranked, ensure_ascii=False)})
+        writer.write_many(rows)
+        processed += len(decoded)
+
+        elapsed = time.perf_counter() - start
+        print(f"{processed}/{len(pending)} dosya | {processed / elapsed:.1f} dosya/sn")
+
+    writer.close()
+    elapsed = time.perf_counter() - start
+    return {
+        "processed": processed,
+        "skipped": skipped,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "files_per_s": processed / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Toplu konuşmacı kaydı / tanıma")
+    parser.add_argument("mode", choices=["enroll", "identify"])
+    parser.add_argument("directory")
+    parser.add_argument("--output", required=True, help=".jsonl veya .csv")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--processes", action="store_true", help="Çözme için iş parçacığı yerine süreç havuzu")
+    parser.add_argument("--name-from", choices=["parent", "stem"], default="parent")
+    parser.add_argument("--top-k", type=int, default=1)
+    parser.add_argument("--threshold", type=float, default=None)
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--archive", action="store_true",
+                        help="Kayıt seslerini data/archive altına sakla (model değişiminde yeniden kodlama için)")
+    args = parser.parse_args()
+
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    from .recognizer import SpeakerRecognizer
+    recognizer = SpeakerRecognizer(data_dir=args.data_dir, archive_audio=args.archive)
+    report = run_bulk(recognizer, args.mode, args.directory, args.output,
+                      batch_size=args.batch_size, workers=args.workers,
+                      use_processes=args.processes, name_from=args.name_from,
+                      top_k=args.top_k, threshold=args.threshold)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
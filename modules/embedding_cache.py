@@ -0,0 +1,162 @@
+import hashlib
+import os
+import threading
+import numpy as np
+from collections import OrderedDict
+from pathlib import Path
+
+
+class EmbeddingCache:
+    """Çözülmüş ses içeriğinin hash'ine göre embedding önbelleği
+
+    Bellekte sınırlı bir LRU katmanı ve isteğe bağlı, toplam boyutu
+    sınırlanan bir disk katmanı vardır. Anahtar, model kimliği ile
+    sinyalin dtype/şekil/bayt içeriğinden üretilir.
+    """
+
+    def __init__(self, model_id, max_items=256, disk_dir=None, disk_max_bytes=64 * 1024 * 1024):
+        self.model_id = model_id
+        self.max_items = max_items
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_bytes = disk_max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._disk_bytes = 0
+        if self.disk_dir:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._disk_bytes = sum(p.stat().st_size for p in self.disk_dir.glob("*.npy"))
+
+    def key_for(self, signal, batched=False):
+        """Sinyal (numpy/tensor) ve model kimliğinden içerik anahtarı üretir
+
+        batched=True: batch'li (doldurulmuş) kodlamanın sonucu tek dosya
+        sonucundan çok az farklıdır; hangi yolun önce çalıştığı dönen
+        embedding'i değiştirmesin diye ayrı anahtarda tutulur.
+        """
+        data = np.ascontiguousarray(signal.numpy() if hasattr(signal, "numpy") else signal)
+        h = hashlib.blake2b(digest_size=20)
+        h.update(self.model_id.encode("utf-8"))
+        if batched:
+            h.update(b"|batched")
+        h.update(f"{data.dtype.str}{data.shape}".encode("ascii"))
+        h.update(memoryview(data).cast("B"))
+        return h.hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            embedding = self._memory.get(key)
+            if embedding is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return embedding.copy()
+
+        embedding = self._disk_get(key)
+        with self._lock:
+            if embedding is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._memory_put(key, embedding)
+        return embedding.copy()
+
+    def put(self, key, embedding):
+        embedding = np.array(embedding, dtype=np.float32)
+        with self._lock:
+            self._memory_put(key, embedding)
+        self._disk_put(key, embedding)
+
+    def _memory_put(self, key, embedding):
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def _disk_path(self, key):
+        return self.disk_dir / f"{key}.npy"
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            embedding = np.load(path)
+        except (OSError, ValueError):
+            return None
+        # Erişim zamanını güncelle ki boyut tahliyesi LRU sırasıyla çalışsın
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return embedding
+
+    def _disk_put(self, key, embedding):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = path.with_name(path.name + f".{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, embedding)
+        with self._lock:
+            # Aynı anahtar yeniden yazılırsa eski dosyanın boyutu düşülür
+            try:
+                previous = path.stat().st_size
+            except OSError:
+                previous = 0
+            os.replace(tmp_path, path)
+            self._disk_bytes += path.stat().st_size - previous
+            over_limit = self._disk_bytes > self.disk_max_bytes
+        # Dizin taraması sadece sınır aşıldığında yapılır
+        if over_limit:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        """Disk katmanı sınırı aşarsa en eski dosyaları siler"""
+        entries = []
+        total = 0
+        for path in self.disk_dir.glob("*.npy"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+        # Sınırın %90'ına inene kadar sil, böylece her yazmada tarama yapılmaz
+        target = int(self.disk_max_bytes * 0.9)
+        entries.sort()
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_bytes = total
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self.disk_dir:
+                for path in self.disk_dir.glob("*.npy"):
+                    try:
+                        path.unlink()
+                    except OSError:
+                        pass
+                self._disk_bytes = 0
+
+    def stats(self):
+        """Önbelleğin kendini amorti edip etmediğini görmek için sayaçlar"""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
@@ -0,0 +1,400 @@
+import json
+import os
+import struct
+import zlib
+import numpy as np
+from pathlib import Path
+from utils.file_manager import atomic_write
+
+
+class JournaledMatrix:
+    """mmap'li taban matrisin üzerine journal kayıtlarını uygulayan salt okunur görünüm
+
+    Satır i, `source[i] >= 0` ise taban matrisin o satırı, değilse
+    `extra[-source[i] - 1]` journal vektörüdür. Taban dosya kopyalanmaz;
+    dilim/indeks okumaları yalnızca istenen satırları okur, böylece
+    SpeakerGallery.add_many gibi blok blok okuyan tüketiciler tek bir mmap
+    geçişiyle çalışır. np.asarray ile tam (N, D) kopya alınabilir.
+    """
+
+    ndim = 2
+    dtype = np.dtype(np.float32)
+
+    def __init__(self, base, source, extra):
+        self._base = base
+        self._source = source
+        self._extra = extra
+        self.shape = (len(source), extra.shape[1])
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        count = len(self)
+        if isinstance(key, slice):
+            return self._gather(np.arange(*key.indices(count)))
+        if isinstance(key, (int, np.integer)):
+            if not -count <= key < count:
+                raise IndexError(f"Satır {key} aralık dışında ({count})")
+            return self._gather(np.array([key % count]))[0]
+        return self._gather(np.arange(count)[np.asarray(key)])
+
+    def __array__(self, dtype=None, copy=None):
+        matrix = self._gather(np.arange(len(self)))
+        return matrix if dtype is None else matrix.astype(dtype, copy=False)
+
+    def _gather(self, rows):
+        out = np.empty((len(rows), self.shape[1]), dtype=np.float32)
+        source = self._source[rows]
+        from_base = source >= 0
+        base_rows = source[from_base]
+        if base_rows.size:
+            first = int(base_rows[0])
+            if base_rows[-1] - first + 1 == base_rows.size and (np.diff(base_rows) == 1).all():
+                # Ardışık satırlar (olağan durum): tek dilim okuması
+                out[from_base] = self._base[first:first + base_rows.size]
+            else:
+                out[from_base] = self._base[base_rows]
+        if not from_base.all():
+            out[~from_base] = self._extra[-source[~from_base] - 1]
+        return out
+
+
+class EmbeddingStore:
+    """Tüm konuşmacı embedding'lerini tek bir memory-mapped dosyada tutan depo
+
+    Dosya düzeni (root altında):
+      index.json         -> aktif matris dosyası, boyut, isim listesi (satır = offset)
+                            ve meta (ör. embedding'leri üreten modelin kimliği)
+      matrix_<gen>.npy   -> (N, D) float32 matris, np.load(mmap_mode="r") ile açılır
+      journal.bin        -> compaction'dan sonra eklenen kayıtlar (append-only);
+                            her kaydın başlığında gövde uzunluğu ve CRC32'si vardır
+
+    Yeni kayıtlar önce journal'a eklenir; journal `compact_every` kayda
+    ulaşınca matrisle birleştirilip yeni bir nesil olarak yazılır. Silinen
+    kayıtlar journal'a vektörsüz bir işaret (tombstone) olarak yazılır ve
+    compaction'da matristen çıkarılır. Çökmede yarım kalan son kayıt,
+    load ya da bir sonraki ekleme sırasında journal'dan kırpılır; yeni kayıtlar
+    hiçbir zaman yarım bir kaydın ardına yazılmaz.
+    """
+
+    INDEX_FILE = "index.json"
+    JOURNAL_FILE = "journal.bin"
+    _JOURNAL_MAGIC = b"SGJ1"
+    # Kayıt başlığı: gövde (isim + vektör) uzunluğu, gövdenin CRC32'si, isim uzunluğu
+    _RECORD_HEADER = struct.Struct("<IIH")
+    # İsim uzunluğunun en üst biti: kayıt bir silme işaretidir, vektör içermez
+    _TOMBSTONE = 0x8000
+
+    def __init__(self, root, compact_every=256):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.compact_every = compact_every
+        self.index_path = self.root / self.INDEX_FILE
+        self.journal_path = self.root / self.JOURNAL_FILE
+        self.dim = None
+        self.generation = 0
+        self.meta = {}
+        self._journal_count = 0
+        # Journal'ın doğrulanmış son kaydının bittiği bayt (None: henüz taranmadı)
+        self._journal_end = None
+
+    def exists(self):
+        return self.index_path.exists()
+
+    # --- Okuma ---
+    def _read_index(self):
+        if not self.index_path.exists():
+            return {"generation": 0, "matrix": None, "dim": None, "names": [], "meta": {}}
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _scan_journal(self, vectors=True):
+        """Journal kayıtlarını ve son geçerli kaydın bittiği baytı döner
+
+        Uzunluğu ya da CRC'si tutmayan ilk kayıtta durulur: çökmede yarım kalan
+        kuyruk ve ardından gelen her şey yok sayılır. Silme işaretlerinin
+        vektörü None'dır; vectors=False ise (isim, silme mi) çiftleri döner.
+        """
+        records = []
+        if self.dim is None or not self.journal_path.exists():
+            return records, None
+        with open(self.journal_path, "rb") as f:
+            data = f.read()
+        magic = len(self._JOURNAL_MAGIC)
+        if len(data) < magic:
+            # Boş ya da başlığı yazılırken kesilmiş journal
+            if not self._JOURNAL_MAGIC.startswith(data):
+                raise ValueError(f"Journal biçimi tanınmıyor: {self.journal_path}")
+            return records, 0
+        if data[:magic] != self._JOURNAL_MAGIC:
+            raise ValueError(f"Journal biçimi tanınmıyor: {self.journal_path}")
+        vec_bytes = self.dim * 4
+        header = self._RECORD_HEADER.size
+        pos = magic
+        while pos + header <= len(data):
+            body_len, crc, name_len = self._RECORD_HEADER.unpack_from(data, pos)
+            tombstone = bool(name_len & self._TOMBSTONE)
+            name_len &= ~self._TOMBSTONE
+            start = pos + header
+            end = start + body_len
+            if (body_len != name_len + (0 if tombstone else vec_bytes) or end > len(data)
+                    or zlib.crc32(data[start:end]) != crc):
+                break
+            name = data[start:start + name_len].decode("utf-8")
+            if not vectors:
+                records.append((name, tombstone))
+            elif tombstone:
+                records.append((name, None))
+            else:
+                records.append((name, np.frombuffer(data, dtype=np.float32, count=self.dim,
+                                                    offset=start + name_len)))
+            pos = end
+        return records, pos
+
+    def _read_journal(self, vectors=True):
+        return self._scan_journal(vectors)[0]
+
+    def _truncate_journal(self, end):
+        """Journal'ı son geçerli kaydın sonuna kırpar (yarım kalan kuyruğu atar)"""
+        if end is None:
+            return
+        size = self.journal_path.stat().st_size if self.journal_path.exists() else 0
+        if size > end:
+            print(f"Journal'ın yarım kalan kuyruğu atıldı ({size - end} bayt): {self.journal_path}")
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(end)
+                f.flush()
+                os.fsync(f.fileno())
+        self._journal_end = end
+
+    def names(self):
+        """Canlı kayıt isimleri (matris ve journal vektörleri okunmadan)"""
+        index = self._read_index()
+        self.dim = index["dim"]
+        names = list(index["names"])
+        journal = self._read_journal(vectors=False)
+        if not journal:
+            return names
+        live = dict.fromkeys(names)
+        for name, tombstone in journal:
+            if tombstone:
+                live.pop(name, None)
+            else:
+                live.setdefault(name)
+        return list(live)
+
+    def load(self):
+        """(isimler, matris) döner; taban matris tek bir mmap ile açılır
+
+        Journal boşsa matris doğrudan mmap'tir; değilse taban satırları
+        kopyalamadan journal'ı uygulayan bir JournaledMatrix görünümüdür.
+        """
+        index = self._read_index()
+        self.generation = index["generation"]
+        self.dim = index["dim"]
+        # Henüz yazılmamış depoda set_meta ile verilen meta korunur
+        self.meta = index.get("meta") or self.meta
+        names = list(index["names"])
+
+        if index["matrix"]:
+            matrix = np.load(self.root / index["matrix"], mmap_mode="r")
+        else:
+            matrix = np.empty((0, self.dim or 0), dtype=np.float32)
+
+        journal, end = self._scan_journal()
+        self._truncate_journal(end)
+        self._journal_count = len(journal)
+        if not journal:
+            return names, matrix
+
+        # Journal kayıtları taban matrisin üzerine bir görünümle uygulanır (aynı isim -> günceller);
+        # taban satırlar mmap'te kalır, belleğe sadece journal vektörleri alınır
+        rows = {name: i for i, name in enumerate(names)}
+        base_count = len(names)
+        source = np.arange(base_count, dtype=np.int64)
+        added = []
+        extra = []
+        removed = set()
+        for name, vec in journal:
+            if vec is None:
+                # Silme işareti: satır sonradan aynı isimle yeniden eklenebilir
+                if name in rows:
+                    removed.add(rows.pop(name))
+                continue
+            extra.append(vec)
+            slot = -len(extra)
+            row = rows.get(name)
+            if row is None:
+                rows[name] = len(names)
+                names.append(name)
+                added.append(slot)
+            elif row < base_count:
+                source[row] = slot
+            else:
+                added[row - base_count] = slot
+        source = np.concatenate([source, np.asarray(added, dtype=np.int64)])
+        if removed:
+            keep = np.ones(len(names), dtype=bool)
+            keep[list(removed)] = False
+            names = [name for name, kept in zip(names, keep) if kept]
+            source = source[keep]
+        extra = np.stack(extra) if extra else np.empty((0, self.dim), dtype=np.float32)
+        return names, JournaledMatrix(matrix, source, extra)
+
+    # --- Yazma ---
+    def append(self, name, embedding):
+        """Yeni kaydı journal'a ekler, gerekirse compaction tetikler"""
+        vec = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        self._adopt_index()
+        if self.dim is None:
+            self.dim = vec.shape[0]
+            self._write_index(self._read_index()["names"], None)
+        elif vec.shape[0] != self.dim:
+            raise ValueError(f"Embedding boyutu uyuşmuyor: {vec.shape[0]} != {self.dim}")
+
+        self._append_journal(self._record(name, vec))
+        self._journal_count += 1
+
+        if self._journal_count >= self.compact_every:
+            self.compact()
+
+    def delete(self, names):
+        """Kayıtları journal'a silme işareti ekleyerek siler (matris yeniden yazılmaz)"""
+        self._adopt_index()
+        if self.dim is None:
+            return
+        records = b"".join(self._record(name) for name in names)
+        if not records:
+            return
+        self._append_journal(records)
+        self._journal_count += len(names)
+
+        if self._journal_count >= self.compact_every:
+            self.compact()
+
+    def _adopt_index(self):
+        """load edilmemiş nesnede boyut, nesil ve meta mevcut index'ten alınır
+
+        Aksi halde ilk ekleme index'i matrissiz yeniden yazıp taban satırları kaybederdi.
+        """
+        if self.dim is None and self.exists():
+            index = self._read_index()
+            self.generation = index["generation"]
+            self.dim = index["dim"]
+            self.meta = index.get("meta") or self.meta
+
+    def _record(self, name, vec=None):
+        """Tek journal kaydı; vektörsüz kayıt bir silme işaretidir"""
+        name_bytes = name.encode("utf-8")
+        if len(name_bytes) >= self._TOMBSTONE:
+            raise ValueError("İsim çok uzun")
+        body = name_bytes if vec is None else name_bytes + vec.tobytes()
+        flags = len(name_bytes) | (self._TOMBSTONE if vec is None else 0)
+        return self._RECORD_HEADER.pack(len(body), zlib.crc32(body), flags) + body
+
+    def _append_journal(self, records):
+        """Kayıtları journal'ın doğrulanmış sonuna ekler ve diske zorlar"""
+        size = self.journal_path.stat().st_size if self.journal_path.exists() else 0
+        if self._journal_end != size:
+            # Taranmamış ya da beklenmedik boyutta journal: önce yarım kuyruğu kırp
+            self._truncate_journal(self._scan_journal(vectors=False)[1] or 0)
+        if not self._journal_end:
+            records = self._JOURNAL_MAGIC + records
+        with open(self.journal_path, "ab") as f:
+            f.write(records)
+            f.flush()
+            os.fsync(f.fileno())
+        self._journal_end = (self._journal_end or 0) + len(records)
+
+    def _write_index(self, names, matrix_file):
+        index = {
+            "generation": self.generation,
+            "matrix": matrix_file,
+            "dim": self.dim,
+            "names": list(names),
+            "meta": self.meta,
+        }
+        with atomic_write(self.index_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False)
+
+    def set_meta(self, **meta):
+        """Meta alanını günceller; depo varsa index atomik olarak yeniden yazılır"""
+        index = self._read_index()
+        self.meta = {**index.get("meta", {}), **meta}
+        if self.exists():
+            self.generation = index["generation"]
+            self.dim = index["dim"]
+            self._write_index(index["names"], index["matrix"])
+
+    def write(self, names, matrix):
+        """Matrisi yeni bir nesil olarak yazar, index'i atomik olarak değiştirir ve journal'ı boşaltır"""
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[0] != len(names):
+            raise ValueError("İsim sayısı ile matris satırları uyuşmuyor")
+        if matrix.shape[0]:
+            self.dim = matrix.shape[1]
+
+        old_index = self._read_index()
+        # Yüklenmemiş bir nesneyle yazılırsa eski meta korunur
+        self.meta = self.meta or old_index.get("meta", {})
+        self.generation = old_index["generation"] + 1
+        matrix_file = f"matrix_{self.generation}.npy"
+        with atomic_write(self.root / matrix_file) as f:
+            np.save(f, matrix)
+
+        # Index yeni matrisi gösterdikten sonra journal güvenle silinebilir;
+        # arada çökerse journal tekrar oynatılır, sonuç aynı kalır.
+        self._write_index(names, matrix_file)
+        if self.journal_path.exists():
+            self.journal_path.unlink()
+        self._journal_count = 0
+        self._journal_end = 0
+
+        if old_index["matrix"] and old_index["matrix"] != matrix_file:
+            try:
+                (self.root / old_index["matrix"]).unlink()
+            except OSError:
+                # Windows'ta hâlâ mmap ile açık olabilir, sonraki compaction'da silinir
+                pass
+        for stale in self.root.glob("matrix_*.npy"):
+            if stale.name != matrix_file:
+                try:
+                    stale.unlink()
+                except OSError:
+                    pass
+
+    def compact(self):
+        """Journal'ı taban matrisle birleştirir"""
+        names, matrix = self.load()
+        self.write(names, np.array(matrix, dtype=np.float32))
+
+    def import_npy_dir(self, directory):
+        """Eski konuşmacı başına .npy dizinini tek seferde depoya aktarır"""
+        names, vectors = [], []
+        for emb_file in sorted(Path(directory).glob("*.npy")):
+            names.append(emb_file.stem)
+            vectors.append(np.load(emb_file).astype(np.float32).reshape(-1))
+        if not names:
+            return 0
+        self.write(names, np.stack(vectors))
+        return len(names)
+
+
+LAYOUT_FILE = "layout.json"
+DEFAULT_LAYOUT = {"gallery": "gallery", "templates": "templates", "cohort": "cohort"}
+
+
+def read_layout(data_dir):
+    """data_dir altındaki etkin galeri/şablon/kohort dizinleri (layout.json yoksa varsayılanlar)"""
+    path = Path(data_dir) / LAYOUT_FILE
+    if not path.exists():
+        return dict(DEFAULT_LAYOUT)
+    with open(path, "r", encoding="utf-8") as f:
+        return {**DEFAULT_LAYOUT, **json.load(f)}
+
+
+def write_layout(data_dir, layout):
+    """Etkin dizinleri tek bir atomik dosya değişimiyle yeni depolara yönlendirir"""
+    with atomic_write(Path(data_dir) / LAYOUT_FILE, "w", encoding="utf-8") as f:
+        json.dump(layout, f, ensure_ascii=False, indent=2)
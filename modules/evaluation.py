@@ -0,0 +1,321 @@
+"""Doğrulama deneme listesi skorlama, EER/minDCF/DET ve eşik kalibrasyonu (komut satırı)
+
+Kullanım (depo kökünden):
+    python -m modules.evaluation trials.txt --root voxceleb1/wav --det det.csv
+    python -m modules.evaluation trials.csv --scores scores.csv --apply min_dcf
+
+Deneme listesi satırları (kayıt, test, etiket) veya VoxCeleb biçiminde
+(etiket, kayıt, test) olabilir; CSV ya da boşlukla ayrılmış metin kabul
+edilir, etiket 1/0, target/nontarget veya true/false'tur.
+
+Her benzersiz dosya bir kez kodlanır. Denemeler dosyadan parça parça
+okunur ve bloklar halinde matris çarpımıyla skorlanır; skorlar sabit
+boyutlu bir histograma eklenir. Bellek kullanımı deneme sayısına değil
+benzersiz dosya sayısına bağlıdır, bu sayede milyonlarca deneme
+işlenebilir. EER ve minDCF histogramın kümülatif toplamlarından, kutu
+genişliği çözünürlüğünde hesaplanır.
+"""
+import argparse
+import csv
+import json
+import os
+import time
+import numpy as np
+from pathlib import Path
+
+from .bulk import iter_decoded
+
+LABELS = {"1": True, "0": False, "target": True, "nontarget": False, "true": True, "false": False}
+# Histogram aralığı: kosinüs [-1, 1]; AS-norm skorları z-puanı benzeri, uçlar kenar kutularına düşer
+SCORE_RANGES = {"cosine": (-1.0, 1.0), "asnorm": (-20.0, 20.0)}
+
+
+# --- Deneme listesi ---
+def _parse_trial(fields):
+    first = fields[0].strip().lower()
+    if first in LABELS:
+        return fields[1].strip(), fields[2].strip(), LABELS[first]
+    return fields[0].strip(), fields[1].strip(), LABELS[fields[2].strip().lower()]
+
+
+def iter_trial_rows(path):
+    """(kayıt, test, etiket) üçlüleri; ilk satır ayrıştırılamazsa başlık sayılır"""
+    path = Path(path)
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        rows = csv.reader(f) if path.suffix.lower() == ".csv" else (line.split() for line in f)
+        for lineno, fields in enumerate(rows, 1):
+            if not fields or fields[0].startswith("#"):
+                continue
+            try:
+                yield _parse_trial(fields)
+            except (KeyError, IndexError):
+                if lineno == 1:
+                    continue
+                raise ValueError(f"{path}:{lineno}: geçersiz deneme satırı")
+
+
+def collect_files(path):
+    """Deneme listesindeki benzersiz dosyalar -> satır indeksi (ilk görülme sırası)"""
+    files = {}
+    for enroll, test, _ in iter_trial_rows(path):
+        files.setdefault(enroll, len(files))
+        files.setdefault(test, len(files))
+    return files
+
+
+def iter_trial_chunks(path, file_index, chunk=1_000_000):
+    """Denemeleri (kayıt satırları, test satırları, etiketler) dizileri halinde parça parça verir"""
+    enroll, test, labels = [], [], []
+    for e, t, label in iter_trial_rows(path):
+        enroll.append(file_index[e])
+        test.append(file_index[t])
+        labels.append(label)
+        if len(labels) >= chunk:
+            yield np.asarray(enroll, dtype=np.int32), np.asarray(test, dtype=np.int32), np.asarray(labels)
+            enroll, test, labels = [], [], []
+    if labels:
+        yield np.asarray(enroll, dtype=np.int32), np.asarray(test, dtype=np.int32), np.asarray(labels)
+
+
+# --- Kodlama ve skorlama ---
+def embed_files(recognizer, files, root=None, batch_size=16, workers=4, use_processes=False):
+    """Her dosyayı bir kez kodlar: (U, D) L2-normalize matris ve başarı maskesi"""
+    paths = [str(Path(root) / name) if root else name for name in files]
+    position = {path: i for i, path in enumerate(paths)}
+    matrix = None
+    valid = np.zeros(len(paths), dtype=bool)
+    done = 0
+    start = time.perf_counter()
+    for decoded in iter_decoded(paths, max(batch_size * 4, 1), workers, use_processes, recognizer.sample_rate):
+        ok = [(path, audio) for path, audio, error in decoded if audio is not None]
+        for path, audio, error in decoded:
+            if audio is None:
+                print(f"Çözülemedi: {path} ({error})")
+        if ok:
+            embeddings = np.asarray(recognizer.extract_embeddings([audio for _, audio in ok],
+                                                                  batch_size=batch_size), dtype=np.float32)
+            if matrix is None:
+                matrix = np.zeros((len(paths), embeddings.shape[1]), dtype=np.float32)
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            rows = [position[path] for path, _ in ok]
+            matrix[rows] = embeddings / norms
+            valid[rows] = True
+        done += len(decoded)
+        print(f"{done}/{len(paths)} dosya kodlandı | {done / (time.perf_counter() - start):.1f} dosya/sn")
+    if matrix is None:
+        matrix = np.zeros((len(paths), 0), dtype=np.float32)
+    return matrix, valid
+
+
+def score_trials(embeddings, enroll, test, block=16384, max_tile=1 << 22, stats=None):
+    """Denemeleri bloklar halinde skorlar (kosinüs veya `stats` verilirse AS-norm)
+
+    Denemeler kayıt dosyasına göre sıralanıp `block`'lara bölünür; her blokta
+    benzersiz kayıt x benzersiz test alt matrisi tek bir matris çarpımıyla
+    hesaplanıp denemelere dağıtılır. Alt matris `max_tile` elemandan büyükse
+    satır bazlı çarpıma düşülür. stats: dosya başına (kohort ortalaması, sapması).
+    """
+    order = np.argsort(enroll, kind="stable")
+    scores = np.empty(order.size, dtype=np.float32)
+    for start in range(0, order.size, block):
+        selected = order[start:start + block]
+        e, t = enroll[selected], test[selected]
+        unique_e, inverse_e = np.unique(e, return_inverse=True)
+        unique_t, inverse_t = np.unique(t, return_inverse=True)
+        if unique_e.size * unique_t.size <= max_tile:
+            raw = (embeddings[unique_e] @ embeddings[unique_t].T)[inverse_e, inverse_t]
+        else:
+            raw = np.einsum("ij,ij->i", embeddings[e], embeddings[t])
+        if stats is not None:
+            mean, std = stats
+            raw = 0.5 * ((raw - mean[e]) / std[e] + (raw - mean[t]) / std[t])
+        scores[selected] = raw
+    return scores
+
+
+# --- Metrikler ---
+class ScoreHistogram:
+    """Hedef/sahte skorları sabit sayıda kutuda sayar; bellek deneme sayısından bağımsızdır"""
+
+    def __init__(self, low=-1.0, high=1.0, bins=200_000):
+        self.edges = np.linspace(low, high, bins + 1)
+        self.low = low
+        self.width = (high - low) / bins
+        self.target = np.zeros(bins, dtype=np.int64)
+        self.nontarget = np.zeros(bins, dtype=np.int64)
+
+    def add(self, scores, labels):
+        bins = self.target.size
+        index = np.clip(((np.asarray(scores) - self.low) / self.width).astype(np.int64), 0, bins - 1)
+        labels = np.asarray(labels, dtype=bool)
+        self.target += np.bincount(index[labels], minlength=bins)
+        self.nontarget += np.bincount(index[~labels], minlength=bins)
+
+    def curve(self):
+        """(eşikler, FNR, FPR); eşik i, kutu i ve üstündeki skorları kabul eder"""
+        return _rates(self.edges, np.concatenate([[0], np.cumsum(self.target)]),
+                      np.concatenate([[0], np.cumsum(self.nontarget)]))
+
+
+def _rates(thresholds, target_below, nontarget_below):
+    n_target, n_nontarget = target_below[-1], nontarget_below[-1]
+    if n_target == 0 or n_nontarget == 0:
+        raise ValueError("Metrikler için hem hedef hem sahte deneme gerekli")
+    fnr = target_below / n_target
+    fpr = (n_nontarget - nontarget_below) / n_nontarget
+    return thresholds, fnr, fpr
+
+
+def det_curve(scores, labels):
+    """Bellekteki skorlar için kesin DET eğrisi (eşikler, FNR, FPR); sıralama ile"""
+    order = np.argsort(scores, kind="stable")
+    sorted_scores = np.asarray(scores)[order]
+    sorted_labels = np.asarray(labels, dtype=bool)[order]
+    target_below = np.concatenate([[0], np.cumsum(sorted_labels)])
+    nontarget_below = np.arange(sorted_scores.size + 1) - target_below
+    # Eşit skorlar aynı eşikte kabul edilir: sadece değerin değiştiği noktalar tutulur
+    keep = np.concatenate([[True], sorted_scores[1:] != sorted_scores[:-1], [True]])
+    thresholds = np.concatenate([sorted_scores, [np.nextafter(sorted_scores[-1], np.inf)]])
+    return _rates(thresholds[keep], target_below[keep], nontarget_below[keep])
+
+
+def compute_eer(thresholds, fnr, fpr):
+    """Eşit hata oranı ve eşiği; FNR = FPR kesişimi komşu noktalar arasında doğrusal bulunur"""
+    diff = fnr - fpr
+    i = int(np.searchsorted(diff, 0.0))
+    if i == 0:
+        return float(fpr[0]), float(thresholds[0])
+    if i == diff.size:
+        return float(fnr[-1]), float(thresholds[-1])
+    w = diff[i - 1] / (diff[i - 1] - diff[i])
+    eer = fnr[i - 1] + w * (fnr[i] - fnr[i - 1])
+    return float(eer), float(thresholds[i - 1] + w * (thresholds[i] - thresholds[i - 1]))
+
+
+def compute_min_dcf(thresholds, fnr, fpr, p_target=0.01, c_miss=1.0, c_fa=1.0):
+    """Normalize edilmiş en küçük tespit maliyeti ve eşiği"""
+    dcf = c_miss * p_target * fnr + c_fa * (1 - p_target) * fpr
+    i = int(np.argmin(dcf))
+    return float(dcf[i] / min(c_miss * p_target, c_fa * (1 - p_target))), float(thresholds[i])
+
+
+def det_points(thresholds, fnr, fpr, max_points=1000):
+    """DET eğrisini çizim için seyreltir (eğrinin değiştiği noktalardan eşit aralıklı seçim)"""
+    changed = np.flatnonzero(np.concatenate([[True], (np.diff(fnr) != 0) | (np.diff(fpr) != 0)]))
+    if changed.size > max_points:
+        changed = changed[np.linspace(0, changed.size - 1, max_points).astype(np.int64)]
+    return thresholds[changed], fnr[changed], fpr[changed]
+
+
+# --- Değerlendirme ---
+def evaluate(recognizer, trials_path, root=None, batch_size=16, workers=4, use_processes=False,
+             asnorm=False, chunk=1_000_000, block=16384, bins=200_000, p_target=0.01,
+             c_miss=1.0, c_fa=1.0, scores_path=None):
+    """Deneme listesini uçtan uca değerlendirir: (rapor, (eşikler, FNR, FPR))
+
+    asnorm=True ve tanıyıcıda kohort varsa skorlar AS-norm ile normalize
+    edilir; kohort istatistikleri de dosya başına bir kez hesaplanır.
+    """
+    start = time.perf_counter()
+    file_index = collect_files(trials_path)
+    files = list(file_index)
+    embeddings, valid = embed_files(recognizer, files, root=root, batch_size=batch_size,
+                                    workers=workers, use_processes=use_processes)
+    embed_s = time.perf_counter() - start
+
+    scale, stats = "cosine", None
+    if asnorm and recognizer.score_norm.enabled:
+        scale, stats = "asnorm", recognizer.score_norm.batch_stats(embeddings)
+    histogram = ScoreHistogram(*SCORE_RANGES[scale], bins=bins)
+
+    scores_file = open(scores_path, "w", encoding="utf-8", newline="") if scores_path else None
+    writer = csv.writer(scores_file) if scores_file else None
+    if writer:
+        writer.writerow(["enroll", "test", "label", "score"])
+    trials = skipped = 0
+    score_start = time.perf_counter()
+    try:
+        for enroll, test, labels in iter_trial_chunks(trials_path, file_index, chunk):
+            # Çözülemeyen dosyalara ait denemeler metriklere katılmaz
+            keep = valid[enroll] & valid[test]
+            skipped += int((~keep).sum())
+            enroll, test, labels = enroll[keep], test[keep], labels[keep]
+            scores = score_trials(embeddings, enroll, test, block=block, stats=stats)
+            histogram.add(scores, labels)
+            trials += scores.size
+            if writer:
+                writer.writerows(zip((files[i] for i in enroll), (files[i] for i in test),
+                                     labels.astype(np.int8), np.round(scores, 6)))
+    finally:
+        if scores_file:
+            scores_file.close()
+    score_s = time.perf_counter() - score_start
+
+    curve = histogram.curve()
+    eer, eer_threshold = compute_eer(*curve)
+    min_dcf, min_dcf_threshold = compute_min_dcf(*curve, p_target=p_target, c_miss=c_miss, c_fa=c_fa)
+    report = {
+        "scale": scale,
+        "files": len(files),
+        "failed_files": int((~valid).sum()),
+        "trials": trials,
+        "targets": int(histogram.target.sum()),
+        "nontargets": int(histogram.nontarget.sum()),
+        "skipped_trials": skipped,
+        "eer": eer,
+        "eer_threshold": eer_threshold,
+        "min_dcf": min_dcf,
+        "min_dcf_threshold": min_dcf_threshold,
+        "p_target": p_target,
+        "resolution": histogram.width,
+        "embed_s": embed_s,
+        "score_s": score_s,
+        "trials_per_s": trials / score_s if score_s > 0 else None,
+    }
+    return report, curve
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Doğrulama deneme listesi değerlendirmesi ve eşik kalibrasyonu")
+    parser.add_argument("trials", help="Deneme listesi (.csv veya boşlukla ayrılmış metin)")
+    parser.add_argument("--root", default=None, help="Deneme listesindeki göreli yolların kökü")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--processes", action="store_true", help="Çözme için iş parçacığı yerine süreç havuzu")
+    parser.add_argument("--asnorm", action="store_true", help="Galerinin kohortuyla AS-norm uygula")
+    parser.add_argument("--chunk", type=int, default=1_000_000, help="Bellekte tutulan deneme sayısı")
+    parser.add_argument("--bins", type=int, default=200_000, help="Skor histogramı kutu sayısı")
+    parser.add_argument("--p-target", type=float, default=0.01)
+    parser.add_argument("--c-miss", type=float, default=1.0)
+    parser.add_argument("--c-fa", type=float, default=1.0)
+    parser.add_argument("--scores", default=None, help="Deneme skorlarını CSV olarak yaz")
+    parser.add_argument("--det", default=None, help="DET eğrisini (eşik, FNR, FPR) CSV olarak yaz")
+    parser.add_argument("--apply", choices=["eer", "min_dcf"], default=None,
+                        help="Bu noktanın eşiğini tanıyıcının varsayılan eşiği olarak kaydet")
+    args = parser.parse_args()
+
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    from .recognizer import SpeakerRecognizer
+    recognizer = SpeakerRecognizer(data_dir=args.data_dir)
+    report, curve = evaluate(recognizer, args.trials, root=args.root, batch_size=args.batch_size,
+                             workers=args.workers, use_processes=args.processes, asnorm=args.asnorm,
+                             chunk=args.chunk, bins=args.bins, p_target=args.p_target,
+                             c_miss=args.c_miss, c_fa=args.c_fa, scores_path=args.scores)
+    if args.det:
+        with open(args.det, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["threshold", "fnr", "fpr"])
+            writer.writerows(zip(*det_points(*curve)))
+    if args.apply:
+        threshold = report[f"{args.apply}_threshold"]
+        recognizer.set_threshold(threshold, scale=report["scale"], criterion=args.apply,
+                                 eer=report["eer"], min_dcf=report["min_dcf"], p_target=args.p_target,
+                                 trials=report["trials"], trials_file=str(args.trials))
+        print(f"Varsayılan eşik ({report['scale']}) {threshold:.4f} olarak kaydedildi.")
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
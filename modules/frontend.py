@@ -0,0 +1,124 @@
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+import soundfile as sf
+import torch
+import torchaudio
+
+
+class AudioFrontend:
+    """Ses alma ön ucu: çözme, mono'ya indirme ve model hızına yeniden örnekleme
+
+    Tüm hat float32 çalışır. Yeniden örnekleme çekirdekleri (src, dst)
+    çifti başına bir kez oluşturulup önbellekte tutulur.
+    """
+
+    def __init__(self, target_rate=16000):
+        self.target_rate = target_rate
+        self._resamplers = {}
+        self._lock = threading.Lock()
+
+    def resampler(self, src_rate, dst_rate=None):
+        """(src_rate, dst_rate) için önbelleğe alınmış Resample modülü"""
+        dst_rate = dst_rate or self.target_rate
+        key = (int(src_rate), int(dst_rate))
+        with self._lock:
+            module = self._resamplers.get(key)
+            if module is None:
+                module = torchaudio.transforms.Resample(orig_freq=key[0], new_freq=key[1])
+                self._resamplers[key] = module
+        return module
+
+    @staticmethod
+    def downmix(data):
+        """(Time,) veya (Time, Channels) diziyi tek geçişte mono float32'ye indirir"""
+        data = np.asarray(data, dtype=np.float32)
+        if data.ndim == 1:
+            return data
+        if data.shape[1] == 1:
+            # Tek kanal: kopyasız görünüm
+            return data[:, 0]
+        return data.mean(axis=1, dtype=np.float32)
+
+    def decode(self, audio):
+        """Girdiyi (mono float32 dizi, örnekleme hızı) çiftine çevirir
+
+        Kabul edilen girdiler: dosya yolu, numpy dizisi (model hızında
+        varsayılır) veya (numpy dizisi, örnekleme hızı) çifti.
+        """
+        if isinstance(audio, tuple):
+            data, rate = audio
+            return self.downmix(data), rate
+        if isinstance(audio, np.ndarray):
+            return self.downmix(audio), self.target_rate
+
+        # Torchaudio bazen codec sorunu çıkarıyor, bu yüzden doğrudan soundfile kullanıyoruz
+        try:
+            # soundfile (Time, Channels) döner veya (Time,); doğrudan float32 okunur
+            data, rate = sf.read(audio, dtype="float32")
+            return self.downmix(data), rate
+        except Exception as e:
+            # Fallback olarak yine de torchaudio deneyelim
+            print(f"Soundfile hatası, torchaudio deneniyor: {e}")
+            signal, rate = torchaudio.load(audio, backend="soundfile")
+            return signal.mean(dim=0).numpy().astype(np.float32, copy=False), rate
+
+    def load(self, audio):
+        """Girdiden model hızında (1, Time) float32 tensör üretir"""
+        data, rate = self.decode(audio)
+        # Numpy -> Tensor (float32 girdide kopya yapılmaz, bellek paylaşılır)
+        signal = torch.from_numpy(data).unsqueeze(0)
+        if rate != self.target_rate:
+            signal = self.resampler(rate)(signal)
+        return signal
+
+
+def benchmark_mixed_rates(frontend=None, rates=(8000, 16000, 22050, 44100, 48000),
+                          seconds=5.0, repeats=10, channels=2, from_files=False):
+    """Karışık hızlı bir batch üzerinde ön uç hızını ölçer (dosya/sn ve gerçek zaman katı)
+
+    from_files=True ile girdiler geçici WAV dosyalarına yazılıp yoldan çözülür.
+    Karşılaştırma için aynı batch her çağrıda çekirdeği yeniden kuran
+    torchaudio.functional.resample ile de ölçülür ("uncached").
+    """
+    frontend = frontend or AudioFrontend()
+    rng = np.random.default_rng(0)
+    batch = [(rng.standard_normal((int(rate * seconds), channels)).astype(np.float32), rate)
+             for rate in rates]
+    with tempfile.TemporaryDirectory() as tmp:
+        if from_files:
+            paths = []
+            for i, (data, rate) in enumerate(batch):
+                paths.append(os.path.join(tmp, f"{i}_{rate}.wav"))
+                sf.write(paths[-1], data, rate, subtype="FLOAT")
+            batch = paths
+
+        def uncached(item):
+            data, rate = frontend.decode(item)
+            signal = torch.from_numpy(data).unsqueeze(0)
+            if rate != frontend.target_rate:
+                signal = torchaudio.functional.resample(signal, rate, frontend.target_rate)
+            return signal
+
+        report = {"files": len(batch) * repeats, "from_files": from_files}
+        audio_seconds = seconds * len(batch) * repeats
+        for label, load in (("", frontend.load), ("uncached_", uncached)):
+            # Isınma: çekirdekler burada oluşturulup önbelleğe girer
+            for item in batch:
+                load(item)
+            start = time.perf_counter()
+            for _ in range(repeats):
+                for item in batch:
+                    load(item)
+            elapsed = time.perf_counter() - start
+            report.update({f"{label}elapsed_s": elapsed,
+                           f"{label}files_per_s": len(batch) * repeats / elapsed,
+                           f"{label}realtime_factor": audio_seconds / elapsed})
+    return report
+
+
+if __name__ == "__main__":
+    print(benchmark_mixed_rates())
+    print(benchmark_mixed_rates(from_files=True))
@@ -0,0 +1,416 @@
+import threading
+import time
+import numpy as np
+
+
+STORAGE_DTYPES = ("float32", "float16", "int8")
+
+
+def _encode(vectors, dtype):
+    """Birim vektörleri depolama tipine çevirir: (kodlar, ölçekler veya None)"""
+    if dtype == "float32":
+        return vectors, None
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    peak = np.abs(vectors).max(axis=-1)
+    scales = np.where(peak > 0, peak / 127.0, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(vectors / scales[..., None]), -127, 127).astype(np.int8)
+    return codes, scales
+
+
+class GallerySnapshot:
+    """Galerinin değişmez (salt okunur) bir görünümü
+
+    Okuyucular kilit almadan bir snapshot üzerinde skorlar. Satırlar
+    `chunk_rows` satırlık parçalarda tutulur; yazıcı bir satırı
+    güncellerken sadece o parçayı kopyalar, sona eklemeyi ise eski
+    snapshot'ların göremediği (count'un ötesindeki) boş kapasiteye yapar.
+    """
+
+    def __init__(self, dim, dtype, chunk_rows, count=0, names=None, index=None,
+                 chunks=(), scales=()):
+        self.dim = dim
+        self.dtype = dtype
+        self.chunk_rows = chunk_rows
+        self.count = count
+        # İsim listesi ve sözlük yazıcıyla paylaşılır; sadece count'tan küçük satırlar geçerlidir
+        self._names = names if names is not None else []
+        self._index = index if index is not None else {}
+        self._chunks = chunks
+        self._scales = scales  # Sadece int8: parça başına satır ölçekleri
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, name):
+        row = self._index.get(name)
+        return row is not None and row < self.count
+
+    def row(self, name):
+        row = self._index[name]
+        if row >= self.count:
+            raise KeyError(name)
+        return row
+
+    def name(self, row):
+        return self._names[row]
+
+    @property
+    def names(self):
+        return self._names[:self.count]
+
+    @property
+    def matrix(self):
+        """(N, D) boyutlu, satırları birim uzunlukta float32 galeri matrisi (kopya)"""
+        return self.vectors(slice(0, self.count))
+
+    @property
+    def nbytes(self):
+        """Kullanılan satırların bellekte kapladığı bayt (ölçekler dahil)"""
+        if not self.count:
+            return 0
+        size = self.count * self.dim * np.dtype(self.dtype).itemsize
+        if self.dtype == "int8":
+            size += self.count * 4
+        return size
+
+    def _decode(self, chunk, offsets):
+        data = self._chunks[chunk][offsets].astype(np.float32, copy=False)
+        if self.dtype == "int8":
+            data = data * self._scales[chunk][offsets][..., None]
+        return data
+
+    def vectors(self, rows):
+        """Seçilen satırları (indeks, dilim veya dizi) float32 olarak çözer"""
+        if isinstance(rows, (int, np.integer)):
+            return self.vectors(np.asarray([rows]))[0]
+        size = self.chunk_rows
+        if isinstance(rows, slice):
+            start, stop, step = rows.indices(self.count)
+            if step == 1:
+                out = np.empty((max(stop - start, 0), self.dim or 0), dtype=np.float32)
+                pos = start
+                while pos < stop:
+                    chunk, offset = divmod(pos, size)
+                    take = min(size - offset, stop - pos)
+                    out[pos - start:pos - start + take] = self._decode(chunk, slice(offset, offset + take))
+                    pos += take
+                return out
+            rows = np.arange(start, stop, step)
+        rows = np.asarray(rows, dtype=np.int64)
+        out = np.empty((rows.shape[0], self.dim or 0), dtype=np.float32)
+        chunk_ids, offsets = np.divmod(rows, size)
+        # Satırları parçalarına göre grupla, her parçayı tek seferde çöz
+        order = np.argsort(chunk_ids, kind="stable")
+        bounds = np.flatnonzero(np.diff(chunk_ids[order])) + 1
+        for group in np.split(order, bounds):
+            if group.size:
+                out[group] = self._decode(int(chunk_ids[group[0]]), offsets[group])
+        return out
+
+    def scores(self, query, rows=None):
+        """Sorgu vektörünün galeriye (veya seçili `rows` satırlarına) kosinüs benzerliği
+
+        Parça başına bir matris-vektör çarpımı yapılır; sıkıştırılmış
+        modlarda parça float32'ye çevrilerek çarpılır, tam kopya oluşmaz.
+        """
+        q = GallerySnapshot.normalize(query)
+        if rows is not None:
+            return self.vectors(rows) @ q
+        out = np.empty(self.count, dtype=np.float32)
+        size = self.chunk_rows
+        for chunk in range(0, -(-self.count // size)):
+            start = chunk * size
+            used = min(size, self.count - start)
+            data = self._chunks[chunk][:used]
+            if self.dtype == "float32":
+                out[start:start + used] = data @ q
+            else:
+                out[start:start + used] = data.astype(np.float32) @ q
+                if self.dtype == "int8":
+                    out[start:start + used] *= self._scales[chunk][:used]
+        return out
+
+    def top_k(self, query, k=5):
+        """En yüksek skorlu k konuşmacıyı (isim, skor) listesi olarak döner"""
+        n = self.count
+        if n == 0 or k <= 0:
+            return []
+        scores = self.scores(query)
+        k = min(k, n)
+        if k < n:
+            candidates = np.argpartition(-scores, k - 1)[:k]
+        else:
+            candidates = np.arange(n)
+        order = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self._names[i], float(scores[i])) for i in order]
+
+    @staticmethod
+    def normalize(embedding):
+        vec = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vec)
+        if norm > 0:
+            vec = vec / norm
+        return vec
+
+
+class SpeakerGallery:
+    """Kayıtlı konuşmacıların L2-normalize edilmiş embedding matrisi
+
+    `dtype` galerinin bellekte nasıl tutulacağını belirler:
+      float32 -> tam hassasiyet (varsayılan)
+      float16 -> yarı bellek
+      int8    -> satır başına ölçekli int8 (x ≈ scale * code), ~dörtte bir bellek
+    Sıkıştırılmış modlarda skorlama doğrudan kompakt matris üzerinde,
+    bloklar halinde yapılır; tam float32 kopya oluşturulmaz.
+
+    Eşzamanlılık: okuma metotları o anki `GallerySnapshot` üzerinde kilitsiz
+    çalışır. Yazıcılar (add/add_many/remove/clear) bir kilitle sıralanır,
+    değişiklikleri yeni bir snapshot olarak tek atamayla yayınlar.
+    """
+
+    def __init__(self, dim=None, initial_capacity=64, dtype="float32", block=4096):
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"Bilinmeyen galeri veri tipi: {dtype}")
+        self.dim = dim
+        self.dtype = dtype
+        self.block = block
+        self._initial_capacity = min(initial_capacity, block)
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # Yazıcı tarafı durum; okuyucular sadece yayınlanan snapshot'ı görür
+        self._names = []
+        self._index = {}
+        self._chunks = []
+        self._scale_chunks = []
+        self._count = 0
+        self._publish()
+
+    def _publish(self):
+        self._snapshot = GallerySnapshot(self.dim, self.dtype, self.block, self._count,
+                                         self._names, self._index,
+                                         tuple(self._chunks), tuple(self._scale_chunks))
+
+    def snapshot(self):
+        """Tutarlı, değişmeyen okuma görünümü (birden fazla okuma tek snapshot'la yapılmalı)"""
+        return self._snapshot
+
+    # --- Okuma (o anki snapshot'a yönlendirilir) ---
+    def __len__(self):
+        return self._snapshot.count
+
+    def __contains__(self, name):
+        return name in self._snapshot
+
+    def row(self, name):
+        return self._snapshot.row(name)
+
+    @property
+    def names(self):
+        return self._snapshot.names
+
+    @property
+    def matrix(self):
+        """(N, D) float32 galeri matrisi; parçalar birleştirildiği için kopyadır"""
+        return self._snapshot.matrix
+
+    @property
+    def nbytes(self):
+        return self._snapshot.nbytes
+
+    def vectors(self, rows):
+        return self._snapshot.vectors(rows)
+
+    def scores(self, query, rows=None):
+        return self._snapshot.scores(query, rows=rows)
+
+    def top_k(self, query, k=5):
+        return self._snapshot.top_k(query, k=k)
+
+    normalize = staticmethod(GallerySnapshot.normalize)
+
+    def stored_vector(self, embedding):
+        """Embedding'in galeride skorlanacağı hali (normalize + depolama tipinden geçmiş)"""
+        codes, scale = _encode(self.normalize(embedding), self.dtype)
+        vec = codes.astype(np.float32)
+        return vec * scale if scale is not None else vec
+
+    def next_row(self, name):
+        """`name` eklenirse alacağı satır (mevcutsa kendi satırı)"""
+        return self._index.get(name, self._count)
+
+    # --- Yazma (kilit altında, sonunda yayınlanır) ---
+    def _writable_chunk(self, chunk, shared):
+        """Yayınlanmış snapshot'ların gördüğü parçayı değiştirmeden önce kopyalar"""
+        if chunk in shared:
+            self._chunks[chunk] = self._chunks[chunk].copy()
+            if self._scale_chunks:
+                self._scale_chunks[chunk] = self._scale_chunks[chunk].copy()
+            shared.discard(chunk)
+
+    def _ensure_row(self, row):
+        """Satır için yer açar; son parça ikiye katlanarak `block` satıra kadar büyür"""
+        chunk, offset = divmod(row, self.block)
+        if chunk == len(self._chunks):
+            capacity = self._initial_capacity if chunk == 0 else self.block
+            self._chunks.append(np.empty((capacity, self.dim), dtype=np.dtype(self.dtype)))
+            if self.dtype == "int8":
+                self._scale_chunks.append(np.ones(capacity, dtype=np.float32))
+        if offset >= self._chunks[chunk].shape[0]:
+            capacity = self._chunks[chunk].shape[0]
+            while capacity <= offset:
+                capacity = min(capacity * 2, self.block)
+            grown = np.empty((capacity, self.dim), dtype=np.dtype(self.dtype))
+            grown[:offset] = self._chunks[chunk][:offset]
+            self._chunks[chunk] = grown
+            if self.dtype == "int8":
+                scales = np.ones(capacity, dtype=np.float32)
+                scales[:offset] = self._scale_chunks[chunk][:offset]
+                self._scale_chunks[chunk] = scales
+
+    def _write_rows(self, rows, vectors, shared):
+        codes, scales = _encode(vectors, self.dtype)
+        chunk_ids, offsets = np.divmod(np.asarray(rows, dtype=np.int64), self.block)
+        for chunk in np.unique(chunk_ids):
+            chunk = int(chunk)
+            sel = chunk_ids == chunk
+            self._writable_chunk(chunk, shared)
+            # Aynı isim tekrar ederse numpy atamasında son değer kalır
+            self._chunks[chunk][offsets[sel]] = codes[sel]
+            if scales is not None:
+                self._scale_chunks[chunk][offsets[sel]] = scales[sel]
+
+    def _shared_chunks(self):
+        """Yayınlanmış satırları içeren parçalar (yerinde değiştirilemez)"""
+        return set(range(-(-self._snapshot.count // self.block)))
+
+    def add(self, name, embedding):
+        """Konuşmacıyı ekler, aynı isim varsa satırını günceller"""
+        vec = self.normalize(embedding)
+        with self._lock:
+            if self.dim is None:
+                self.dim = vec.shape[0]
+            elif vec.shape[0] != self.dim:
+                raise ValueError(f"Embedding boyutu uyuşmuyor: {vec.shape[0]} != {self.dim}")
+
+            shared = self._shared_chunks()
+            row = self._index.get(name)
+            if row is None:
+                # Yeni satır: eski snapshot'lar count'un ötesini görmez, kopya gerekmez
+                row = self._count
+                self._ensure_row(row)
+                shared.discard(row // self.block)
+                self._names.append(name)
+                self._index[name] = row
+                self._count += 1
+            self._write_rows([row], vec[None, :], shared)
+            self._publish()
+        return row
+
+    def add_many(self, names, matrix):
+        """Toplu ekleme: matrisi bloklar halinde vektörel olarak normalize edip kodlar
+
+        Blok blok işlendiği için (ör. mmap'li) kaynak matrisin tam float32
+        kopyası oluşmaz. Tüm satırlar tek bir snapshot olarak yayınlanır.
+        """
+        if len(names) == 0:
+            return
+        with self._lock:
+            if self.dim is None:
+                self.dim = matrix.shape[1]
+            shared = self._shared_chunks()
+            rows = []
+            for name in names:
+                row = self._index.get(name)
+                if row is None:
+                    row = self._count
+                    self._ensure_row(row)
+                    self._names.append(name)
+                    self._index[name] = row
+                    self._count += 1
+                rows.append(row)
+            # Yeni satırlar, mevcut paylaşılan parçalarda sadece görünmeyen kapasiteye yazılır
+            first_new = self._snapshot.count
+            rows = np.asarray(rows, dtype=np.int64)
+            for start in range(0, len(rows), self.block):
+                chunk = np.asarray(matrix[start:start + self.block], dtype=np.float32)
+                norms = np.linalg.norm(chunk, axis=1, keepdims=True)
+                norms[norms == 0] = 1.0
+                block_rows = rows[start:start + self.block]
+                touched = shared if (block_rows < first_new).any() else set()
+                self._write_rows(block_rows, chunk / norms, touched)
+            self._publish()
+
+    def remove(self, name):
+        """Konuşmacıyı siler, son satırı boşalan yere taşır"""
+        with self._lock:
+            if name not in self._index:
+                return False
+            # Yayınlanmış isim listesi/sözlüğü değiştirilmez, kopyalanır
+            self._names = list(self._names[:self._count])
+            self._index = dict(self._index)
+            row = self._index.pop(name)
+            last = self._count - 1
+            shared = self._shared_chunks()
+            if row != last:
+                last_name = self._names[last]
+                self._writable_chunk(row // self.block, shared)
+                self._chunks[row // self.block][row % self.block] = self._chunks[last // self.block][last % self.block]
+                if self._scale_chunks:
+                    self._scale_chunks[row // self.block][row % self.block] = \
+                        self._scale_chunks[last // self.block][last % self.block]
+                self._names[row] = last_name
+                self._index[last_name] = row
+            # Boşalan son satıra sonraki eklemeler yazacak: eski snapshot'lar hâlâ görüyor
+            self._writable_chunk(last // self.block, shared)
+            self._names.pop()
+            self._count -= 1
+            self._publish()
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+
+def compare_storage(matrix, queries, dtypes=("float16", "int8"), k=10):
+    """Sıkıştırılmış galeri tiplerini float32 referansıyla karşılaştırır
+
+    Her tip için bellek, skor kayması (|s - s_float32|), top-1 uyumu,
+    recall@k ve sorgu başına skorlama süresi döner.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    queries = np.asarray(queries, dtype=np.float32)
+    names = [str(i) for i in range(matrix.shape[0])]
+    results = {}
+    reference = None
+    for dtype in ("float32",) + tuple(d for d in dtypes if d != "float32"):
+        gallery = SpeakerGallery(dtype=dtype)
+        gallery.add_many(names, matrix)
+        k_eff = min(k, len(gallery))
+        scores, tops, elapsed = [], [], 0.0
+        for q in queries:
+            start = time.perf_counter()
+            s = gallery.scores(q)
+            elapsed += time.perf_counter() - start
+            scores.append(s)
+            tops.append(set(np.argpartition(-s, k_eff - 1)[:k_eff].tolist()) if k_eff else set())
+        scores = np.asarray(scores)
+        best = scores.argmax(axis=1) if scores.size else np.empty(0, dtype=np.int64)
+        if reference is None:
+            reference = (scores, tops, best, gallery.nbytes)
+        ref_scores, ref_tops, ref_best, ref_bytes = reference
+        drift = np.abs(scores - ref_scores) if scores.size else np.zeros(1)
+        n = max(len(queries), 1)
+        results[dtype] = {
+            "bytes": gallery.nbytes,
+            "bytes_ratio": gallery.nbytes / ref_bytes if ref_bytes else 1.0,
+            "max_score_drift": float(drift.max()),
+            "mean_score_drift": float(drift.mean()),
+            "top1_agreement": float(np.mean(best == ref_best)) if best.size else 1.0,
+            "recall_at_k": sum(len(a & b) for a, b in zip(tops, ref_tops)) / (n * k_eff) if k_eff else 1.0,
+            "score_ms": elapsed / n * 1000,
+        }
+    return results
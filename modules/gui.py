@@ -2,17 +2,17 @@ import customtkinter as ctk
 import threading
 import os
 import time
-import random
 from .audio_recorder import AudioRecorder
-from .recognizer import SpeakerRecognizer
+from .stream_monitor import identify_progressive
 
 # Tema Ayarları - Projeksiyon İçin Optimize Edilmiş
 ctk.set_appearance_mode("Light") 
 ctk.set_default_color_theme("blue")
 
 class App(ctk.CTk):
-    def __init__(self):
+    def __init__(self, startup_timer=None):
         super().__init__()
+        self.startup_timer = startup_timer
 
         # Pencere Ayarları
         self.title("Ses İzi v2.0 - İleri Seviye Konuşmacı Tanıma Sistemi")
@@ -25,16 +25,17 @@ class App(ctk.CTk):
         # Değişkenler
         self.recorder = AudioRecorder()
         self.recognizer = None
-        self.tech_messages = [
-            "MFCC öznitelikleri çıkarılıyor...",
-            "Spektrogram analizi yapılıyor...",
-            "VAD (Voice Activity Detection) aktif...",
-            "Gürültü filtresi (Noise Suppression) uygulanıyor...",
-            "Vektör uzayı hizalanıyor...",
-            "Örüntü eşleştirme algoritması çalışıyor...",
-            "Sinir ağı katmanlarından geçiyor...",
-            "Benzerlik matrisi hesaplanıyor..."
-        ]
+        # Tanıyıcının gerçek aşama olaylarına karşılık gelen mesajlar
+        self.stage_messages = {
+            "decode": "Ses çözülüyor...",
+            "preprocess": "VAD (Voice Activity Detection) ile sessizlik ayıklanıyor...",
+            "encode": "ECAPA-TDNN sinir ağından geçiyor...",
+            "score": "Benzerlik skorları hesaplanıyor...",
+        }
+        # Aşama sırası: ilerleme çubuğu biten aşamanın bu sıradaki yerine göre dolar
+        self.stage_order = list(self.stage_messages)
+        self.active_log_label = None
+        self.active_progress_bar = None
 
         # Arayüzü Yükle
         self.setup_sidebar()
@@ -48,15 +49,23 @@ class App(ctk.CTk):
 
     def load_model(self):
         try:
-            # Yapay bir gecikme ekle ki "Yükleniyor" ekranı havalı görünsün :)
-            time.sleep(1.5)
-            self.recognizer = SpeakerRecognizer()
+            # Ağır importlar (torch, speechbrain) pencere açıldıktan sonra, arka planda yapılır
+            if self.startup_timer:
+                with self.startup_timer.phase("recognizer_import"):
+                    from .recognizer import SpeakerRecognizer
+            else:
+                from .recognizer import SpeakerRecognizer
+            self.recognizer = SpeakerRecognizer(timer=self.startup_timer, archive_audio=True)
+            if self.startup_timer:
+                self.startup_timer.report()
             self.after(0, self.on_model_loaded)
         except Exception as e:
             error_msg = str(e)
             self.after(0, lambda: self.on_model_load_error(error_msg))
 
     def on_model_loaded(self):
+        # Simüle edilmiş mesajlar yerine tanıyıcının gerçek aşama olaylarını dinle
+        self.recognizer.metrics.subscribe(self.on_stage_event)
         self.loading_frame.grid_forget()
         self.select_frame("home")
         self.update_stats()
@@ -249,33 +258,51 @@ class App(ctk.CTk):
     def show_identify(self): self.select_frame("identify")
 
     # --- ANIMATION LOGIC ---
-    def animate_progress_with_log(self, progress_bar, label, duration, callback):
-        steps = 50
-        step_time = duration / steps
-        
-        def _animate(current_step):
-            if current_step <= steps:
-                val = current_step / steps
-                progress_bar.set(val)
-                
-                # Rastgele Tech Log Mesajları
-                if current_step % 5 == 0:
-                    msg = random.choice(self.tech_messages)
-                    label.configure(text=msg)
-                
-                self.after(int(step_time * 1000), lambda: _animate(current_step + 1))
-            else:
-                progress_bar.set(0)
-                label.configure(text="İşlem Tamamlandı.")
-                if callback:
-                    callback()
-        
-        _animate(0)
+    def on_stage_event(self, stage, event, duration):
+        """Tanıyıcı aşama olayı (işçi iş parçacığından gelir, UI'a aktarılır)"""
+        label = self.active_log_label
+        progress_bar = self.active_progress_bar
+        if label is None:
+            return
+        msg = self.stage_messages.get(stage, stage)
+        if event == "end":
+            msg = f"{msg} ✓ {duration * 1000:.0f} ms"
+        self.after(0, lambda: self._show_stage(progress_bar, label, stage, event, msg))
+
+    def _show_stage(self, progress_bar, label, stage, event, msg):
+        if progress_bar is not self.active_progress_bar:
+            # İş bitti veya başka bir işlem başladı: geç gelen olayı yok say
+            return
+        label.configure(text=msg)
+        if progress_bar.cget("mode") == "indeterminate":
+            # İlk aşama olayı: kayıt bitti, çubuk gerçek aşamaları izlemeye başlar
+            progress_bar.stop()
+            progress_bar.configure(mode="determinate")
+            progress_bar.set(0)
+        if stage in self.stage_order:
+            done = self.stage_order.index(stage) + (event == "end")
+            progress_bar.set(done / len(self.stage_order))
+
+    def start_progress(self, progress_bar, label):
+        """Kayıt sürerken çubuk belirsiz modda döner; sonra aşama başı/sonu olaylarıyla dolar"""
+        self.active_log_label = label
+        self.active_progress_bar = progress_bar
+        label.configure(text="Ses kaydediliyor...")
+        progress_bar.configure(mode="indeterminate")
+        progress_bar.start()
+
+    def finish_progress(self, progress_bar):
+        progress_bar.stop()
+        progress_bar.configure(mode="determinate")
+        progress_bar.set(0)
+        if self.active_progress_bar is progress_bar:
+            self.active_progress_bar = None
+            self.active_log_label = None
 
     # --- BUSINESS LOGIC ---
     def update_stats(self):
         if self.recognizer:
-            count = len(self.recognizer.known_embeddings)
+            count = self.recognizer.speaker_count
             self.lbl_total_speakers.configure(text=str(count))
 
     def record_and_add(self):
@@ -287,23 +314,20 @@ class App(ctk.CTk):
         self.btn_record_add.configure(state="disabled", text="KAYDEDİLİYOR...")
         self.lbl_tech_log_add.configure(text_color="gray") # Reset color
         
-        # Animasyon Başlat
-        self.animate_progress_with_log(self.progress_bar_add, self.lbl_tech_log_add, 5, None)
+        self.start_progress(self.progress_bar_add, self.lbl_tech_log_add)
 
         threading.Thread(target=self._process_add_speaker, args=(name,), daemon=True).start()
 
     def _process_add_speaker(self, name):
-        filename = f"temp_rec_{name}.wav"
-        self.recorder.record_fixed_duration(5, filename)
+        # Kayıt bellekte tutulur, geçici WAV dosyası yazılmaz
+        audio = self.recorder.record_fixed_duration(5)
         
-        success, msg = self.recognizer.save_speaker(name, filename)
-        
-        if os.path.exists(filename):
-            os.remove(filename)
+        success, msg = self.recognizer.save_speaker(name, audio)
 
         self.after(0, lambda: self._finish_add_speaker(success, msg))
 
     def _finish_add_speaker(self, success, msg):
+        self.finish_progress(self.progress_bar_add)
         self.btn_record_add.configure(state="normal", text="🎙️  SES KAYDINI BAŞLAT")
         color = "green" if success else "red"
         self.lbl_tech_log_add.configure(text=msg.upper(), text_color=color)
@@ -317,27 +341,42 @@ class App(ctk.CTk):
         self.lbl_result_score.configure(text="Güven Skoru: Hesaplanıyor...")
         self.lbl_tech_log_id.configure(text_color="gray")
 
-        self.animate_progress_with_log(self.progress_bar_id, self.lbl_tech_log_id, 4, None)
+        self.start_progress(self.progress_bar_id, self.lbl_tech_log_id)
         
         threading.Thread(target=self._process_identify, daemon=True).start()
 
     def _process_identify(self):
-        filename = "temp_identify.wav"
-        self.recorder.record_fixed_duration(4, filename)
-        
-        name, score = self.recognizer.identify_speaker(filename)
-        
-        if os.path.exists(filename):
-            os.remove(filename)
+        # Artan tamponla tanıma: kazanan netleşince 4 saniyeyi beklemeden durur
+        try:
+            result = identify_progressive(self.recorder, self.recognizer, max_duration=4)
+        except Exception as e:
+            # Ör. galeri başka bir modele ait: tanıma reddedilir
+            error = str(e)
+            self.after(0, lambda: self._fail_identify(error))
+            return
+        name, score = result["name"], result["score"]
             
-        self.after(0, lambda: self._finish_identify(name, score))
+        self.after(0, lambda: self._finish_identify(name, score, result["stop_time"]))
 
-    def _finish_identify(self, name, score):
+    def _fail_identify(self, error):
+        self.finish_progress(self.progress_bar_id)
+        self.btn_identify_action.configure(state="normal", text="🔍  ANALİZİ BAŞLAT")
+        self.lbl_result_name.configure(text="HATA", text_color="#d81b60")
+        self.lbl_result_score.configure(text="Güven Skoru: -")
+        self.lbl_tech_log_id.configure(text=error, text_color="red")
+
+    def _finish_identify(self, name, score, stop_time=None):
+        self.finish_progress(self.progress_bar_id)
         self.btn_identify_action.configure(state="normal", text="🔍  ANALİZİ BAŞLAT")
         
         if name:
             self.lbl_result_name.configure(text=name, text_color="#00897b")
-            self.lbl_result_score.configure(text=f"Güven Skoru: %{score*100:.2f}")
+            suffix = f"  |  Karar Süresi: {stop_time:.1f} sn" if stop_time is not None else ""
+            if self.recognizer.score_norm.enabled:
+                # AS-norm skorları yüzde değil, kohorta göre standartlaştırılmış değerlerdir
+                self.lbl_result_score.configure(text=f"AS-norm Skoru: {score:.2f}{suffix}")
+            else:
+                self.lbl_result_score.configure(text=f"Güven Skoru: %{score*100:.2f}{suffix}")
         else:
             self.lbl_result_name.configure(text="BİLİNMEYEN SES", text_color="#d81b60")
             self.lbl_result_score.configure(text="Eşleşme Oranı: Çok Düşük")
@@ -0,0 +1,183 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import torch
+
+try:
+    import psutil
+except ImportError:  # İsteğe bağlı: yoksa Linux topolojisi okunur
+    psutil = None
+
+
+def physical_cores():
+    """Bu sürecin kullanabileceği fiziksel çekirdek sayısı (SMT kardeşleri tek sayılır)
+
+    os.cpu_count() mantıksal CPU sayar; hiper iş parçacıklı makinede iki katı
+    çıkar ve replicas × threads kuralı aşırı aboneliğe yol açar.
+    """
+    if psutil is not None:
+        count = psutil.cpu_count(logical=False)
+        if count:
+            return count
+    try:
+        cpus = os.sched_getaffinity(0)
+    except AttributeError:  # Linux dışı
+        return os.cpu_count() or 1
+    cores = set()
+    for cpu in cpus:
+        try:
+            with open(f"/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list") as f:
+                cores.add(f.read().strip())
+        except OSError:
+            cores.add(str(cpu))
+    return max(1, len(cores))
+
+
+def default_pool_size(cores=None):
+    """Çekirdek sayısına göre başlangıç için (replika, replika başına iş parçacığı) önerisi
+
+    Kısa ifadelerde ECAPA'nın tek çağrı içi paralelliği birkaç iş
+    parçacığından sonra doymaya başlar; verim için çok sayıda küçük replika
+    genelde daha iyidir. Kural: replicas × threads ≤ fiziksel çekirdek.
+    Kesin değer için `python -m benchmarks.run_benchmarks --pool-configs`
+    ile ölçüm yapılmalıdır.
+    """
+    cores = cores or physical_cores()
+    threads = 2 if cores >= 4 else 1
+    return max(1, cores // threads), threads
+
+
+class InferencePool:
+    """Aynı (salt okunur) kodlayıcı ağırlıklarını paylaşan çok replikalı CPU çıkarım havuzu
+
+    Her replika kendi iş parçacığında çalışır ve torch intra-op iş parçacığı
+    sayısını `threads_per_replica` ile sınırlar. Bu ayar yalnızca OpenMP
+    derlemelerinde çağıran iş parçacığına özeldir; yerel (native) iş parçacığı
+    havuzlu derlemelerde süreç geneli tek bir havuzu değiştirir, bu yüzden
+    orada havuz bir kez replicas × threads boyutuna ayarlanır ve replikalar
+    onu paylaşır. MKL'in kendi iş parçacığı sayısı da süreç genelidir.
+    Toplam replicas × threads fiziksel çekirdek sayısını aşmamalıdır, aksi
+    halde aşırı abonelik gecikmeyi dengesizleştirir. Tüm çağrılar
+    torch.inference_mode altında yapılır.
+
+    `submit` bir concurrent.futures.Future döner; `encode_batch` bekleyen
+    kısayoldur, böylece havuz kodlayıcının yerine kullanılabilir.
+    """
+
+    def __init__(self, classifier, replicas=None, threads_per_replica=None, max_queue=256,
+                 metrics=None):
+        default_replicas, default_threads = default_pool_size()
+        self.classifier = classifier
+        self.replicas = replicas or default_replicas
+        self.threads_per_replica = threads_per_replica or default_threads
+        self.metrics = metrics
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._max_depth = 0
+        self._counters = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+        self._closed = False
+        # Intra-op ayarı iş parçacığına özel mi (OpenMP), yoksa süreç geneli mi
+        self.per_thread_limits = "OpenMP" in torch.__config__.parallel_info()
+        if not self.per_thread_limits:
+            torch.set_num_threads(self.replicas * self.threads_per_replica)
+            print(f"Intra-op havuzu süreç geneli; {self.replicas} replika "
+                  f"{self.replicas * self.threads_per_replica} iş parçacığını paylaşıyor.")
+        self._workers = [
+            threading.Thread(target=self._run, name=f"encoder-replica-{i}", daemon=True)
+            for i in range(self.replicas)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, wavs, wav_lens=None, block=True, timeout=None):
+        """Kodlama isteğini kuyruğa ekler; kuyruk doluysa (block=False) queue.Full yükseltir"""
+        if self._closed:
+            raise RuntimeError("Havuz kapatıldı")
+        future = Future()
+        try:
+            self._queue.put((wavs, wav_lens, future, time.perf_counter()), block=block, timeout=timeout)
+        except queue.Full:
+            self._count("rejected")
+            raise
+        depth = self._queue.qsize()
+        with self._lock:
+            self._counters["submitted"] += 1
+            self._max_depth = max(self._max_depth, depth)
+        if self.metrics is not None:
+            self.metrics.set_gauge("pool_queue_depth", depth)
+        return future
+
+    def encode_batch(self, wavs, wav_lens=None):
+        """EncoderClassifier.encode_batch ile aynı imza; sonuç gelene kadar bekler"""
+        return self.submit(wavs, wav_lens).result()
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+        if self.metrics is not None:
+            self.metrics.increment(f"pool_{name}")
+
+    def _run(self):
+        expected = self.replicas * self.threads_per_replica
+        if self.per_thread_limits:
+            torch.set_num_threads(self.threads_per_replica)
+            expected = self.threads_per_replica
+        if torch.get_num_threads() != expected:
+            # Ayar başka bir yerden (ör. başka replika, kütüphane) ezilmiş
+            print(f"Uyarı: {threading.current_thread().name} {torch.get_num_threads()} "
+                  f"iş parçacığıyla çalışıyor (beklenen {expected}).")
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            wavs, wav_lens, future, queued_at = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            started = time.perf_counter()
+            with self._lock:
+                self._in_flight += 1
+            try:
+                with torch.inference_mode():
+                    result = self.classifier.encode_batch(wavs, wav_lens)
+            except Exception as e:
+                future.set_exception(e)
+                self._count("failed")
+            else:
+                future.set_result(result)
+                self._count("completed")
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                if self.metrics is not None:
+                    self.metrics.observe("pool_wait", started - queued_at)
+                    self.metrics.observe("pool_run", time.perf_counter() - started)
+                    self.metrics.set_gauge("pool_queue_depth", self._queue.qsize())
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "replicas": self.replicas,
+                "threads_per_replica": self.threads_per_replica,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_depth,
+                "in_flight": self._in_flight,
+                **self._counters,
+            }
+
+    def shutdown(self, wait=True):
+        """Yeni istekleri reddeder; kuyruktaki istekler bitince replikalar durur"""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._workers:
+            self._queue.put(None)
+        if wait:
+            for worker in self._workers:
+                worker.join()
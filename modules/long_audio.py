@@ -0,0 +1,158 @@
+import numpy as np
+import soundfile as sf
+from .frontend import AudioFrontend
+from .vad import EnergyVAD
+
+
+def iter_blocks(path, block_seconds=30.0):
+    """Dosyayı soundfile blokları halinde okur: (mono float32 blok, örnekleme hızı)"""
+    info = sf.info(path)
+    blocksize = int(block_seconds * info.samplerate)
+    for block in sf.blocks(path, blocksize=blocksize, dtype="float32", always_2d=True):
+        yield AudioFrontend.downmix(block), info.samplerate
+
+
+def iter_fixed_segments(blocks, segment_seconds=3.0, hop_seconds=None, min_segment_seconds=1.0):
+    """Sabit uzunluklu (isteğe bağlı örtüşen) segmentler: (başlangıç_sn, bitiş_sn, sinyal, hız)"""
+    hop_seconds = hop_seconds or segment_seconds
+    pending = np.empty(0, dtype=np.float32)
+    offset = 0  # pending[0]'ın mutlak örnek konumu
+    skip = 0  # Atlama segmentten uzunsa sonraki bloklardan atılacak örnek sayısı
+    rate = None
+    for block, rate in blocks:
+        if skip:
+            dropped = min(skip, block.shape[0])
+            block = block[dropped:]
+            skip -= dropped
+        pending = np.concatenate([pending, block])
+        seg_len = int(segment_seconds * rate)
+        hop = int(hop_seconds * rate)
+        while pending.shape[0] >= seg_len:
+            yield offset / rate, (offset + seg_len) / rate, pending[:seg_len].copy(), rate
+            dropped = min(hop, pending.shape[0])
+            pending = pending[dropped:]
+            skip = hop - dropped
+            offset += hop
+    if rate and pending.shape[0] >= int(min_segment_seconds * rate):
+        yield offset / rate, (offset + pending.shape[0]) / rate, pending, rate
+
+
+def iter_vad_segments(blocks, vad=None, max_segment_seconds=3.0, min_segment_seconds=1.0):
+    """Konuşma bölgelerine göre kesilen segmentler; uzun bölgeler max_segment_seconds'a bölünür
+
+    VAD'ın `speech_mask(signal, sample_rate)` -> (çerçeve maskesi, çerçeve uzunluğu)
+    sunması gerekir (EnergyVAD gibi); yalnızca `trim` sunan VAD'lar için
+    analyze_long_recording sabit segmentlere döner.
+    """
+    vad = vad or EnergyVAD()
+    current = []
+    current_start = None
+    current_len = 0
+    position = 0  # Mutlak örnek konumu
+    rate = None
+
+    def flush():
+        nonlocal current, current_start, current_len
+        segment = None
+        if current_len >= int(min_segment_seconds * rate):
+            segment = (current_start / rate, (current_start + current_len) / rate,
+                       np.concatenate(current), rate)
+        current, current_start, current_len = [], None, 0
+        return segment
+
+    for block, rate in blocks:
+        mask, frame_len = vad.speech_mask(block, rate)
+        max_len = int(max_segment_seconds * rate)
+        # Konuşma/sessizlik geçişlerini vektörel olarak bul
+        edges = np.flatnonzero(np.diff(np.concatenate([[0], mask.astype(np.int8), [0]])))
+        runs = edges.reshape(-1, 2) * frame_len
+        cursor = 0
+        for start, end in runs:
+            if start > cursor:
+                # Araya sessizlik girdi: açık segmenti kapat
+                segment = flush()
+                if segment:
+                    yield segment
+            s = start
+            while s < end:
+                if current_start is None:
+                    current_start = position + s
+                take = min(end - s, max_len - current_len)
+                current.append(block[s:s + take])
+                current_len += take
+                s += take
+                if current_len >= max_len:
+                    segment = flush()
+                    if segment:
+                        yield segment
+            cursor = end
+        if cursor < block.shape[0]:
+            # Blok sessizlikle bitti
+            segment = flush()
+            if segment:
+                yield segment
+        position += block.shape[0]
+    if rate:
+        segment = flush()
+        if segment:
+            yield segment
+
+
+def analyze_long_recording(recognizer, path, segment_seconds=3.0, hop_seconds=None,
+                           use_vad=False, batch_size=16, block_seconds=30.0,
+                           min_segment_seconds=1.0, threshold=None, merge=True):
+    """Uzun kaydı bloklar halinde okuyup segment başına konuşmacı zaman çizelgesi çıkarır
+
+    Bellekte en fazla bir blok, bir segment artığı ve `batch_size` segment
+    tutulur; tepe bellek dosya uzunluğuna değil batch boyutuna bağlıdır.
+    Dönüş: {"start", "end", "speaker", "score"} sözlüklerinden oluşan liste.
+    """
+    blocks = iter_blocks(path, block_seconds=block_seconds)
+    vad = getattr(recognizer, "vad", None)
+    if use_vad and vad is not None and not hasattr(vad, "speech_mask"):
+        print(f"{type(vad).__name__} speech_mask sunmuyor; sabit segmentler kullanılıyor.")
+        use_vad = False
+    if use_vad:
+        segments = iter_vad_segments(blocks, vad=vad,
+                                     max_segment_seconds=segment_seconds,
+                                     min_segment_seconds=min_segment_seconds)
+    else:
+        segments = iter_fixed_segments(blocks, segment_seconds, hop_seconds, min_segment_seconds)
+
+    timeline = []
+    batch = []
+
+    def flush_batch():
+        # Tanıyıcının normal hattı: yeniden örnekleme, ön işleme (VAD) ve embedding önbelleği
+        embeddings = recognizer.extract_embeddings([audio for _, _, audio in batch], batch_size=batch_size)
+        for (start, end, _), embedding in zip(batch, embeddings):
+            speaker, score = recognizer.identify_embedding(embedding, threshold=threshold)
+            timeline.append({"start": round(float(start), 3), "end": round(float(end), 3),
+                             "speaker": speaker, "score": score})
+        batch.clear()
+
+    for start, end, samples, rate in segments:
+        batch.append((start, end, (samples, rate)))
+        if len(batch) >= batch_size:
+            flush_batch()
+    if batch:
+        flush_batch()
+
+    return merge_timeline(timeline) if merge else timeline
+
+
+def merge_timeline(timeline):
+    """Ardışık aynı konuşmacılı segmentleri birleştirir (skor: ortalama)"""
+    merged = []
+    for entry in timeline:
+        last = merged[-1] if merged else None
+        if last and last["speaker"] == entry["speaker"] and entry["start"] <= last["end"]:
+            count = last.pop("_count", 1)
+            last["score"] = (last["score"] * count + entry["score"]) / (count + 1)
+            last["end"] = max(last["end"], entry["end"])
+            last["_count"] = count + 1
+        else:
+            merged.append(dict(entry))
+    for entry in merged:
+        entry.pop("_count", None)
+    return merged
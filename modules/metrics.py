@@ -0,0 +1,122 @@
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+
+
+class MetricsRegistry:
+    """Aşama süreleri, sayaçlar ve anlık göstergeler için basit metrik kaydı
+
+    `stage(name)` bağlam yöneticisi süreyi kaydeder ve abonelere
+    (stage, "start" | "end", süre) olayları gönderir. Sonuçlar JSON veya
+    Prometheus metin formatında dışa aktarılabilir.
+    """
+
+    def __init__(self, window=2048, prefix="speaker"):
+        self.prefix = prefix
+        self.window = window
+        self._timings = {}
+        self._counters = {}
+        self._gauges = {}
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    # --- Abonelik ---
+    def subscribe(self, callback):
+        """callback(stage, event, duration) her aşama başı/sonunda çağrılır"""
+        with self._lock:
+            self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def _emit(self, stage, event, duration=None):
+        for callback in list(self._subscribers):
+            try:
+                callback(stage, event, duration)
+            except Exception as e:
+                print(f"Metrik abonesi hata verdi: {e}")
+
+    # --- Kayıt ---
+    @contextmanager
+    def stage(self, name):
+        self._emit(name, "start")
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            self.observe(name, duration)
+            self._emit(name, "end", duration)
+
+    def observe(self, name, duration):
+        with self._lock:
+            entry = self._timings.get(name)
+            if entry is None:
+                entry = {"count": 0, "sum": 0.0, "recent": deque(maxlen=self.window)}
+                self._timings[name] = entry
+            entry["count"] += 1
+            entry["sum"] += duration
+            entry["recent"].append(duration)
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name, value):
+        """Anlık değer (ör. kuyruk derinliği); son yazılan değer tutulur"""
+        with self._lock:
+            self._gauges[name] = value
+
+    def reset(self):
+        with self._lock:
+            self._timings.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+    # --- Dışa aktarma ---
+    def snapshot(self):
+        with self._lock:
+            timings = {name: (entry["count"], entry["sum"], list(entry["recent"]))
+                       for name, entry in self._timings.items()}
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        report = {"stages": {}, "counters": counters, "gauges": gauges}
+        for name, (count, total, recent) in timings.items():
+            recent_ms = np.asarray(recent) * 1000
+            report["stages"][name] = {
+                "count": count,
+                "total_s": total,
+                "mean_ms": total / count * 1000 if count else 0.0,
+                "p50_ms": float(np.percentile(recent_ms, 50)) if recent else 0.0,
+                "p95_ms": float(np.percentile(recent_ms, 95)) if recent else 0.0,
+            }
+        return report
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def to_prometheus(self):
+        """Prometheus metin formatı (summary + counter)"""
+        report = self.snapshot()
+        metric = f"{self.prefix}_stage_seconds"
+        lines = [f"# HELP {metric} Aşama süreleri (saniye)", f"# TYPE {metric} summary"]
+        for name, stats in report["stages"].items():
+            lines.append(f'{metric}{{stage="{name}",quantile="0.5"}} {stats["p50_ms"] / 1000:.6f}')
+            lines.append(f'{metric}{{stage="{name}",quantile="0.95"}} {stats["p95_ms"] / 1000:.6f}')
+            lines.append(f'{metric}_sum{{stage="{name}"}} {stats["total_s"]:.6f}')
+            lines.append(f'{metric}_count{{stage="{name}"}} {stats["count"]}')
+        for name, value in report["counters"].items():
+            counter = f"{self.prefix}_{name}_total"
+            lines.append(f"# TYPE {counter} counter")
+            lines.append(f"{counter} {value}")
+        for name, value in report["gauges"].items():
+            gauge = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {gauge} gauge")
+            lines.append(f"{gauge} {value}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,142 @@
+"""Arşivlenmiş kayıt seslerinden galeriyi yeni modelle yeniden oluşturma (komut satırı)
+
+Kullanım (depo kökünden):
+    python -m modules.migrate --savedir ./pretrained_models_v2
+    python -m modules.migrate --quantize --replicas 4 --allow-missing
+
+data/archive/<isim>/ altındaki tüm sesler, tanıyıcının (yeni) modeliyle
+batch'ler halinde kodlanır: çözme iş parçacığı/süreç havuzunda, kodlama
+isteğe bağlı çıkarım havuzunda yapılır (bir parçanın batch'leri tüm
+replikalara aynı anda dağıtılır). Yeni galeri ve şablon deposu
+eskisinin yanında yeni dizinlere yazılır; iş bitince data/layout.json tek
+atomik değişimle yeni dizinleri gösterir ve galeri yeniden yüklenir. Eski
+dizinler geri dönüş için silinmez.
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+
+from utils.file_manager import walk_audio_files
+from .bulk import iter_decoded
+from .embedding_store import EmbeddingStore, read_layout, write_layout
+from .gallery import SpeakerGallery
+
+
+def archived_samples(archive_dir):
+    """Arşivdeki (isim, dosya yolu) çiftleri; isim, konuşmacı klasörünün adıdır"""
+    samples = []
+    if not archive_dir.exists():
+        return samples
+    for speaker_dir in sorted(p for p in archive_dir.iterdir() if p.is_dir()):
+        samples += [(speaker_dir.name, str(path)) for path in walk_audio_files(speaker_dir)]
+    return samples
+
+
+def run_migration(recognizer, batch_size=16, workers=4, use_processes=False, allow_missing=False):
+    """Arşivi tanıyıcının modeliyle yeniden kodlar, yeni depoları yazar ve etkinleştirir
+
+    Arşivde sesi olmayan konuşmacılar yeni galeriye taşınamaz; allow_missing
+    verilmezse bu durumda hiçbir şey değiştirilmez. Taşıma sürerken yapılan
+    kayıtlar eski depoya gider ve kaybolur, bu yüzden kayıtlar durdurulmalıdır
+    (model uyuşmazlığında tanıyıcı kaydı zaten reddeder).
+    """
+    start = time.perf_counter()
+    old_names = set(recognizer.store.load()[0])
+    old_model = recognizer.store.meta.get("model", {}).get("model_id")
+    samples = archived_samples(recognizer.archive_dir)
+    speakers = {name for name, _ in samples}
+    missing = sorted(old_names - speakers)
+    report = {"success": False, "speakers": 0, "samples": len(samples), "errors": 0,
+              "missing": missing, "from_model": old_model, "to_model": recognizer.model_id}
+    if missing and not allow_missing:
+        print(f"{len(missing)} konuşmacının arşivde sesi yok; --allow-missing olmadan taşıma yapılmaz.")
+        return report
+
+    # Şablonlar dosya sırasıyla; merkez, normalize şablonların ortalamasıdır (enroll ile aynı)
+    templates = {}
+    done = 0
+    paths = [path for _, path in samples]
+    owner = {path: name for name, path in samples}
+    # Havuz varsa her parça tüm replikaları meşgul edecek kadar batch içerir
+    replicas = recognizer.pool.replicas if recognizer.pool is not None else 1
+    chunk = max(batch_size * max(4, 2 * replicas), 1)
+    for decoded in iter_decoded(paths, chunk, workers, use_processes, recognizer.sample_rate):
+        ok = [(path, audio) for path, audio, error in decoded if audio is not None]
+        for path, audio, error in decoded:
+            if audio is None:
+                report["errors"] += 1
+                print(f"Çözülemedi: {path} ({error})")
+        embeddings = recognizer.extract_embeddings([audio for _, audio in ok], batch_size=batch_size) if ok else []
+        for (path, _), embedding in zip(ok, embeddings):
+            templates.setdefault(owner[path], []).append(np.asarray(embedding, dtype=np.float32))
+        done += len(decoded)
+        elapsed = time.perf_counter() - start
+        print(f"{done}/{len(paths)} dosya | {done / elapsed:.1f} dosya/sn")
+
+    lost = sorted(speakers - set(templates))
+    if lost and not allow_missing:
+        print(f"{len(lost)} konuşmacının hiçbir sesi çözülemedi; taşıma yapılmadı.")
+        report["missing"] = sorted(set(missing) | set(lost))
+        return report
+
+    # Yeni depolar eskilerinin yanına yazılır; layout.json değişene kadar kullanılmaz
+    tag = time.strftime("%Y%m%d_%H%M%S")
+    layout = {"gallery": f"gallery_{tag}", "templates": f"templates_{tag}", "cohort": f"cohort_{tag}"}
+    names = sorted(templates)
+    template_names, template_vectors, centroids = [], [], []
+    for name in names:
+        for i, vector in enumerate(templates[name]):
+            template_names.append(f"{name}#{i}")
+            template_vectors.append(vector)
+        centroids.append(np.mean([SpeakerGallery.normalize(v) for v in templates[name]], axis=0))
+
+    meta = {"model": recognizer.model_fingerprint, "migrated_from": old_model}
+    for directory, store_names, vectors in ((layout["gallery"], names, centroids),
+                                            (layout["templates"], template_names, template_vectors)):
+        store = EmbeddingStore(recognizer.data_dir / directory)
+        store.set_meta(**meta)
+        if store_names:
+            store.write(store_names, np.stack(vectors))
+
+    previous = read_layout(recognizer.data_dir)
+    write_layout(recognizer.data_dir, layout)
+    recognizer.switch_layout(layout)
+    if (recognizer.data_dir / previous["cohort"]).exists():
+        # Kohort embedding'leri eski modele ait; yeni modelle build_cohort ile yeniden oluşturulmalı
+        print(f"Kohort taşınmadı; AS-norm için yeni kohort oluşturun (eski: {previous['cohort']}).")
+
+    report.update(success=True, speakers=len(names), layout=layout, previous_layout=previous,
+                  elapsed_s=time.perf_counter() - start)
+    print(f"Taşıma tamamlandı: {len(names)} konuşmacı, {len(template_names)} şablon -> {layout['gallery']}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Arşivden galeriyi yeni modelle yeniden oluşturma")
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--savedir", default="./pretrained_models", help="Yeni modelin dizini")
+    parser.add_argument("--quantize", action="store_true", help="Yeni model int8 nicemlenmiş çalışsın (arşiv sesleriyle kalibre edilir)")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--processes", action="store_true", help="Çözme için iş parçacığı yerine süreç havuzu")
+    parser.add_argument("--replicas", type=int, default=None, help="Kodlayıcı replika sayısı")
+    parser.add_argument("--threads-per-replica", type=int, default=None)
+    parser.add_argument("--allow-missing", action="store_true",
+                        help="Arşivde sesi olmayan konuşmacıları yeni galeriden çıkararak devam et")
+    args = parser.parse_args()
+
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    from .recognizer import SpeakerRecognizer
+    recognizer = SpeakerRecognizer(saved_model_dir=args.savedir, quantize=args.quantize,
+                                   data_dir=args.data_dir, replicas=args.replicas,
+                                   threads_per_replica=args.threads_per_replica)
+    report = run_migration(recognizer, batch_size=args.batch_size, workers=args.workers,
+                           use_processes=args.processes, allow_missing=args.allow_missing)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    recognizer.close()
+
+
+if __name__ == "__main__":
+    main()
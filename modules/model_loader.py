@@ -0,0 +1,152 @@
+import hashlib
+import io
+import os
+from contextlib import nullcontext
+from pathlib import Path
+import torch
+
+# Anlık görüntüye yazılan modüller: encode_batch için yeterli olanlar
+SNAPSHOT_MODULES = ("compute_features", "mean_var_norm", "embedding_model")
+
+
+def checkpoint_key(savedir):
+    """savedir ve içindeki hparams/checkpoint dosyalarından anahtar; model değişince değişir
+
+    Dosya içerikleri okunmaz: çözülmüş yol, boyut ve değişiklik zamanı
+    özetlenir (hub önbelleğinde çözülmüş yol zaten içerik özetini taşır).
+    Dosyalar henüz yoksa (ilk indirme) None döner.
+    """
+    savedir = Path(savedir)
+    hparams = savedir / "hyperparams.yaml"
+    if not hparams.exists():
+        return None
+    digest = hashlib.sha1(str(savedir.resolve()).encode("utf-8"))
+    for path in [hparams] + sorted(savedir.glob("*.ckpt")):
+        stat = path.stat()
+        digest.update(f"{path.name}|{path.resolve()}|{stat.st_size}|{stat.st_mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def snapshot_path(savedir, device, key):
+    return Path(savedir) / f"encoder_snapshot_{device}_{key}.pt"
+
+
+class SnapshotEncoder(torch.nn.Module):
+    """Anlık görüntüden kurulan kodlayıcı; EncoderClassifier.encode_batch ile aynı hesap
+
+    `mods` SpeechBrain'deki gibi compute_features, mean_var_norm ve
+    embedding_model modüllerini tutar (nicemleme embedding_model'e uygulanır).
+    """
+
+    def __init__(self, modules, device="cpu"):
+        super().__init__()
+        self.mods = torch.nn.ModuleDict(modules)
+        self.device = device
+        self.to(device)
+
+    def encode_batch(self, wavs, wav_lens=None):
+        if wavs.dim() == 1:
+            wavs = wavs.unsqueeze(0)
+        if wav_lens is None:
+            wav_lens = torch.ones(wavs.shape[0], device=self.device)
+        wavs, wav_lens = wavs.to(self.device).float(), wav_lens.to(self.device)
+        feats = self.mods.compute_features(wavs)
+        feats = self.mods.mean_var_norm(feats, wav_lens)
+        return self.mods.embedding_model(feats, wav_lens)
+
+
+def module_hparams(text):
+    """Yalnızca SNAPSHOT_MODULES düğümlerini içeren, referansları çözülmüş hparams metni
+
+    Tam hparams Pretrainer'ı da kurar; o da hub indirme katmanını
+    (huggingface_hub) yükler. Hızlı yolda buna gerek yoktur.
+    """
+    from hyperpyyaml import resolve_references
+    from ruamel.yaml import YAML
+
+    yaml = YAML()
+    tree = yaml.load(resolve_references(text).getvalue())
+    for key in list(tree):
+        if key not in SNAPSHOT_MODULES:
+            del tree[key]
+    out = io.StringIO()
+    yaml.dump(tree, out)
+    return out.getvalue()
+
+
+def save_snapshot(classifier, savedir, device):
+    """Hparams metni ve modül state_dict'lerini yazar (pickle edilmiş nesne yazılmaz)"""
+    key = checkpoint_key(savedir)
+    if key is None:
+        return None
+    path = snapshot_path(savedir, device, key)
+    payload = {
+        "hparams": module_hparams((Path(savedir) / "hyperparams.yaml").read_text(encoding="utf-8")),
+        "modules": {name: classifier.mods[name].state_dict() for name in SNAPSHOT_MODULES},
+    }
+    tmp_path = path.with_name(path.name + ".tmp")
+    torch.save(payload, tmp_path)
+    os.replace(tmp_path, path)
+    # Eski anahtarlı (veya eski biçimli, pickle'lı) anlık görüntüler kullanılmaz
+    for stale in Path(savedir).glob(f"encoder_snapshot_{device}*.pt"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    return path
+
+
+def load_snapshot(path, device="cpu"):
+    """Modülleri hparams'tan kurar, ağırlıkları weights_only=True ile yükler"""
+    from utils.patches import apply_torchaudio_patch
+    apply_torchaudio_patch()
+    from hyperpyyaml import load_hyperpyyaml
+
+    payload = torch.load(path, map_location=device, weights_only=True)
+    hparams = load_hyperpyyaml(payload["hparams"])
+    modules = {name: hparams[name] for name in SNAPSHOT_MODULES}
+    for name, state in payload["modules"].items():
+        modules[name].load_state_dict(state)
+    classifier = SnapshotEncoder(modules, device=device)
+    classifier.eval()
+    return classifier
+
+
+def load_encoder(source, savedir, device="cpu", timer=None, use_snapshot=True):
+    """ECAPA kodlayıcısını yükler
+
+    Hızlı yol: savedir ve checkpoint anahtarına ait anlık görüntüden
+    (hparams + state_dict) modüller kurulur; hub yamaları, huggingface_hub ve
+    SpeechBrain çıkarım arayüzü yüklenmez. Görüntü yoksa veya checkpoint
+    değiştiyse model hub üzerinden (yamalar uygulanarak) yüklenir ve bir
+    sonraki açılış için görüntü yazılır.
+    """
+    phase = timer.phase if timer else (lambda name: nullcontext())
+
+    key = checkpoint_key(savedir) if use_snapshot else None
+    snapshot = snapshot_path(savedir, device, key) if key else None
+    if snapshot is not None and snapshot.exists():
+        try:
+            with phase("encoder_snapshot_load"):
+                return load_snapshot(snapshot, device)
+        except Exception as e:
+            print(f"Model anlık görüntüsü yüklenemedi, hub yolu deneniyor: {e}")
+
+    with phase("patches"):
+        from utils.patches import apply_patches
+        apply_patches()
+    with phase("speechbrain_import"):
+        from speechbrain.inference.speaker import EncoderClassifier
+
+    with phase("encoder_hub_load"):
+        classifier = EncoderClassifier.from_hparams(
+            source=source,
+            savedir=savedir,
+            run_opts={"device": device}
+        )
+
+    if use_snapshot:
+        with phase("encoder_snapshot_save"):
+            try:
+                save_snapshot(classifier, savedir, device)
+            except Exception as e:
+                print(f"Model anlık görüntüsü kaydedilemedi: {e}")
+    return classifier
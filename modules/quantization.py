@@ -0,0 +1,177 @@
+import copy
+import io
+import time
+import numpy as np
+import torch
+
+
+# Statik int8'e çevrilen katman türü. ECAPA-TDNN'de Linear/LSTM/GRU yoktur
+# (dinamik nicemleme hiçbir şeyi değiştirmez); hesabın neredeyse tamamı Conv1d'dedir.
+QUANTIZABLE_LAYERS = (torch.nn.Conv1d,)
+# Kalibrasyonda kullanılan en fazla klip sayısı ve klip başına en fazla süre (örnek)
+CALIBRATION_CLIPS = 16
+CALIBRATION_MAX_SAMPLES = 16000 * 6
+
+
+class QuantizedConv1d(torch.nn.Module):
+    """Tek bir Conv1d'yi girişte nicemleyip çıkışta float'a döndüren kabuk
+
+    ECAPA'nın Res2Net/SE/ASP blokları (chunk, cat, çarpma, istatistik havuzlama)
+    nicemlenmiş tensörle çalışmaz ve model FX ile izlenemez; bu yüzden model
+    bütün halinde değil, her konvolüsyon kendi ölçeğiyle ayrı nicemlenir.
+    """
+
+    def __init__(self, conv):
+        super().__init__()
+        self.quant = torch.ao.quantization.QuantStub()
+        self.conv = conv
+        self.dequant = torch.ao.quantization.DeQuantStub()
+
+    def forward(self, x):
+        return self.dequant(self.conv(self.quant(x)))
+
+
+def _quantized_engine():
+    engines = torch.backends.quantized.supported_engines
+    for engine in ("x86", "fbgemm", "qnnpack"):
+        if engine in engines:
+            return engine
+    return None
+
+
+def _wrap_convs(model, qconfig):
+    """Modeldeki her Conv1d'yi QuantizedConv1d ile sarar; sarılan katman sayısını döner"""
+    count = 0
+    for module in list(model.modules()):
+        for name, child in list(module.named_children()):
+            if type(child) in QUANTIZABLE_LAYERS:
+                wrapped = QuantizedConv1d(child)
+                wrapped.qconfig = qconfig
+                setattr(module, name, wrapped)
+                count += 1
+    return count
+
+
+def quantize_encoder(classifier, calibration):
+    """Kodlayıcının Conv1d katmanlarını kalibrasyonlu statik int8'e çevirir
+
+    calibration: (1, Time) 16 kHz sinyaller; aktivasyon ölçekleri bunların
+    tam kodlayıcı hattından (öznitelik + normalizasyon) geçirilmesiyle ölçülür,
+    bu yüzden gerçek konuşma kayıtları olmalıdır. Sadece CPU çıkarımı için
+    anlamlıdır. Nicemlenen katman sayısını döner; kalibrasyon verisi ya da
+    uygun katman yoksa model değiştirilmez ve 0 döner. Float model,
+    karşılaştırma için `classifier.float_embedding_model` olarak saklanır.
+    """
+    model = classifier.mods.embedding_model
+    engine = _quantized_engine()
+    if engine is None:
+        print("UYARI: Bu PyTorch derlemesinde int8 arka ucu yok; nicemleme yapılmadı.")
+        return 0
+    if not calibration:
+        print("UYARI: int8 kalibrasyonu için ses yok; nicemleme yapılmadı.")
+        return 0
+    torch.backends.quantized.engine = engine
+    quantized = copy.deepcopy(model).eval()
+    layers = _wrap_convs(quantized, torch.ao.quantization.get_default_qconfig(engine))
+    if layers == 0:
+        print("UYARI: Modelde int8'e uygun katman (Conv1d) yok; nicemleme yapılmadı.")
+        return 0
+    torch.ao.quantization.prepare(quantized, inplace=True)
+
+    # Gözlemciler, kalibrasyon sesleri tam hattan geçerken aktivasyon aralıklarını toplar
+    classifier.mods.embedding_model = quantized
+    try:
+        with torch.no_grad():
+            for signal in calibration:
+                classifier.encode_batch(signal.reshape(1, -1)[:, :CALIBRATION_MAX_SAMPLES])
+    except Exception:
+        classifier.mods.embedding_model = model
+        raise
+    torch.ao.quantization.convert(quantized, inplace=True)
+    classifier.float_embedding_model = model
+    return layers
+
+
+def model_size_bytes(model):
+    """Modelin serileştirilmiş state_dict boyutu (nicemlenmiş ağırlıklar dahil)"""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.getbuffer().nbytes
+
+
+def _embed_all(classifier, signals):
+    embeddings = []
+    latencies = []
+    with torch.inference_mode():
+        for signal in signals:
+            start = time.perf_counter()
+            emb = classifier.encode_batch(signal)
+            latencies.append(time.perf_counter() - start)
+            embeddings.append(emb.squeeze().cpu().numpy())
+    embeddings = np.stack(embeddings).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings, np.array(latencies)
+
+
+def compare_quantized(classifier, signals, labels=None, calibration=None):
+    """Float model ile int8 kopyasını ayrılmış bir set üzerinde karşılaştırır
+
+    signals: (1, Time) tensörleri (ör. recognizer._load_signal çıktısı).
+    calibration: kodlayıcı henüz nicemlenmemişse kalibrasyon sinyalleri;
+    verilmezse `signals` kullanılır (sapma o durumda iyimser ölçülür).
+    labels: isteğe bağlı konuşmacı etiketleri; verilirse en yakın komşu
+    doğruluğu her iki model için de raporlanır.
+    Dönüş: kosinüs skoru sapması, gecikme ve model boyutu karşılaştırması.
+    """
+    float_model = getattr(classifier, "float_embedding_model", None)
+    if float_model is not None:
+        # Verilen kodlayıcı zaten nicemlenmiş: float taraf saklanan orijinal modelle ölçülür
+        # (modeller geçici olarak değiştirilir; servis sürerken çağrılmamalı)
+        quantized_model = classifier.mods.embedding_model
+        layers = sum(1 for m in quantized_model.modules() if isinstance(m, QuantizedConv1d))
+        quant_emb, quant_lat = _embed_all(classifier, signals)
+        classifier.mods.embedding_model = float_model
+        try:
+            float_emb, float_lat = _embed_all(classifier, signals)
+        finally:
+            classifier.mods.embedding_model = quantized_model
+    else:
+        float_model = classifier.mods.embedding_model
+        quantized = copy.deepcopy(classifier)
+        layers = quantize_encoder(quantized, signals if calibration is None else calibration)
+        quantized_model = quantized.mods.embedding_model
+        float_emb, float_lat = _embed_all(classifier, signals)
+        quant_emb, quant_lat = _embed_all(quantized, signals)
+
+    # Aynı dosyanın iki modeldeki embedding'leri arasındaki benzerlik
+    self_cos = np.sum(float_emb * quant_emb, axis=1)
+    # Tüm çiftlerin skor matrisleri arasındaki sapma
+    float_scores = float_emb @ float_emb.T
+    quant_scores = quant_emb @ quant_emb.T
+    drift = np.abs(float_scores - quant_scores)
+
+    report = {
+        "quantized_layers": layers,
+        "files": len(signals),
+        "self_cosine_min": float(self_cos.min()),
+        "self_cosine_mean": float(self_cos.mean()),
+        "score_drift_max": float(drift.max()),
+        "score_drift_mean": float(drift.mean()),
+        "float_latency_ms": float(np.median(float_lat) * 1000),
+        "int8_latency_ms": float(np.median(quant_lat) * 1000),
+        "float_model_bytes": model_size_bytes(float_model),
+        "int8_model_bytes": model_size_bytes(quantized_model),
+    }
+
+    if labels is not None and len(signals) > 1:
+        labels = np.asarray(labels)
+        for name, scores in (("float", float_scores), ("int8", quant_scores)):
+            scores = scores.copy()
+            np.fill_diagonal(scores, -np.inf)
+            nearest = np.argmax(scores, axis=1)
+            report[f"{name}_nn_accuracy"] = float(np.mean(labels[nearest] == labels))
+        report["nn_agreement"] = float(np.mean(
+            np.argmax(float_scores - 2 * np.eye(len(signals)), axis=1)
+            == np.argmax(quant_scores - 2 * np.eye(len(signals)), axis=1)
+        ))
+    return report
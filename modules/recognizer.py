@@ -1,118 +1,807 @@
+import copy
+import hashlib
+import json
 import os
+import shutil
+import threading
 import torch
+from collections import namedtuple
+from contextlib import contextmanager
 import torchaudio
-from speechbrain.inference.speaker import EncoderClassifier
 import numpy as np
 import soundfile as sf
 from pathlib import Path
+from .gallery import SpeakerGallery, compare_storage
+from .embedding_store import EmbeddingStore, read_layout
+from .ann_index import create_index, verify_index
+from .embedding_cache import EmbeddingCache
+from .vad import EnergyVAD
+from .frontend import AudioFrontend
+from .quantization import CALIBRATION_CLIPS, quantize_encoder
+from .model_loader import load_encoder
+from .metrics import MetricsRegistry
+from .score_norm import ASNorm
+from .long_audio import analyze_long_recording
+from .inference_pool import InferencePool
+from .sharded_gallery import ShardedGallery
+from utils.file_manager import atomic_write, walk_audio_files
+
+# Okuyucuların birlikte tutarlı görmesi gereken nesneler; tek atamayla değiştirilir
+GalleryState = namedtuple("GalleryState", ["gallery", "index", "score_norm"])
 
 class SpeakerRecognizer:
-    def __init__(self, saved_model_dir="./pretrained_models", device="cpu"):
+    CALIBRATION_FILE = "calibration.json"
+    # Bu kadar kayıttan sonra indeks diske yazılır (yeniden başlatmada kayıplar sınırlı kalır)
+    INDEX_SAVE_EVERY = 256
+
+    def __init__(self, saved_model_dir="./pretrained_models", device="cpu",
+                 index="exact", index_params=None,
+                 cache_size=256, cache_dir=None, cache_max_bytes=64 * 1024 * 1024,
+                 vad=None, quantize=False, timer=None, use_snapshot=True,
+                 classifier=None, data_dir="data", asnorm_params=None, asnorm_shortlist=50,
+                 gallery_dtype="float32", replicas=None, threads_per_replica=None, archive_audio=False,
+                 calibration_audio=None, shards=None, shard_params=None):
         self.device = device
-        # ECAPA-TDNN modeli, konuşmacı tanıma için endüstri standardıdır
-        print("Model yükleniyor... (İlk çalıştırmada indirme yapabilir)")
-        self.classifier = EncoderClassifier.from_hparams(
-            source="speechbrain/spkrec-ecapa-voxceleb",
-            savedir=saved_model_dir,
-            run_opts={"device": self.device}
+        self.sample_rate = 16000
+        # Aşama süreleri (decode/preprocess/encode/score) ve olay aboneleri
+        self.metrics = MetricsRegistry()
+        # Çözme + mono'ya indirme + model hızına yeniden örnekleme
+        self.frontend = AudioFrontend(target_rate=self.sample_rate)
+        self.saved_model_dir = saved_model_dir
+        self.model_source = "speechbrain/spkrec-ecapa-voxceleb"
+        if classifier is not None:
+            # Dışarıdan verilen kodlayıcı (ör. benchmark'lar için sahte kodlayıcı)
+            self.classifier = classifier
+            self.model_source = getattr(classifier, "source", self.model_source)
+        else:
+            # ECAPA-TDNN modeli, konuşmacı tanıma için endüstri standardıdır
+            print("Model yükleniyor... (İlk çalıştırmada indirme yapabilir)")
+            # Yerel anlık görüntü varsa hub'a gitmeden yüklenir
+            self.classifier = load_encoder(
+                self.model_source,
+                self.saved_model_dir,
+                device=self.device,
+                timer=timer,
+                use_snapshot=use_snapshot,
+            )
+            print("Model yüklendi.")
+
+        # İsteğe bağlı statik int8 nicemleme (sadece CPU); aktivasyon ölçekleri
+        # calibration_audio ile, verilmezse arşivlenmiş kayıt sesleriyle ölçülür
+        self.quantized = False
+        if quantize:
+            if self.device != "cpu":
+                raise ValueError("int8 nicemleme sadece device='cpu' ile kullanılabilir")
+            calibration = self._calibration_signals(calibration_audio, Path(data_dir) / "archive")
+            layers = quantize_encoder(self.classifier, calibration)
+            # Hiç katman nicemlenmediyse model kimliği (önbellek/galeri anahtarı) değişmez
+            self.quantized = layers > 0
+            if self.quantized:
+                print(f"Model int8 nicemlendi ({layers} katman).")
+
+        # İsteğe bağlı çıkarım havuzu: ağırlıkları paylaşan, iş parçacığı bütçeli replikalar
+        self.pool = None
+        if replicas:
+            self.pool = InferencePool(self.classifier, replicas=replicas,
+                                      threads_per_replica=threads_per_replica, metrics=self.metrics)
+            print(f"Çıkarım havuzu: {self.pool.replicas} replika x {self.pool.threads_per_replica} iş parçacığı.")
+
+        # Aynı kaydın tekrar tekrar kodlanmasını önleyen içerik-hash önbelleği
+        self.embedding_cache = EmbeddingCache(
+            model_id=self.model_id,
+            max_items=cache_size,
+            disk_dir=cache_dir,
+            disk_max_bytes=cache_max_bytes,
         )
-        print("Model yüklendi.")
+        
+        # İsteğe bağlı VAD: True -> EnergyVAD, ya da trim(signal, sr) sunan herhangi bir nesne
+        self.vad = EnergyVAD() if vad is True else vad
         
         # Veritabanı yolları
-        self.speakers_dir = Path("data/speakers")
-        self.embeddings_dir = Path("data/embeddings")
+        self.data_dir = Path(data_dir)
+        self.speakers_dir = self.data_dir / "speakers"
+        self.embeddings_dir = self.data_dir / "embeddings"
+        # archive_audio=True: kayıt sesleri data/archive/<isim>/ altında saklanır,
+        # model değişiminde galeri bunlardan yeniden kodlanabilir (modules.migrate)
+        self.archive_audio = archive_audio
+        self.archive_dir = self.data_dir / "archive"
         self._ensure_directories()
+        self.template_counts = {}
+        # Galeri başka bir modelle üretilmişse o modelin kimliği; bu durumda kayıt reddedilir
+        self.model_mismatch = None
+        # Skor ölçeği başına kalibre edilmiş eşikler (galeri dizininde calibration.json)
+        self.calibration = {}
         
+        # Bu oturumda güncellenen merkezler; diğerleri depodaki (mmap) matristen okunur
         self.known_embeddings = {}
-        self.load_embeddings()
+        self._stored_rows = {}
+        self._stored_matrix = None
+        # Skorlama için önceden normalize edilmiş, bitişik galeri matrisi
+        # gallery_dtype: "float32" (varsayılan), "float16" veya "int8" (satır başına ölçekli)
+        self.gallery_dtype = gallery_dtype
+        # Arama indeksi: "exact" (varsayılan) veya "ivf" (nprobe ile recall/gecikme ayarı)
+        self.index_kind = index
+        self.index_params = index_params or {}
+        # Kohort varsa (data/cohort/cohort.npy) skorlar AS-norm ile normalize edilir
+        self.asnorm_params = asnorm_params or {}
+        self.asnorm_shortlist = asnorm_shortlist
+        # shards=N: merkezlerin kopyası galeri dizinindeki N parça sürecinde tutulur ve
+        # skorlanır (modules.sharded_gallery); kaynak yine bu süreçteki depodur
+        if shards and index != "exact":
+            raise ValueError("Parçalı galeri sadece index='exact' ile kullanılabilir")
+        self.num_shards = shards
+        self.shard_params = shard_params or {}
+        self.sharded = None
+        # Okuyucular (tanıma) kilitsiz çalışır; yazıcılar (kayıt/yükleme/kohort) bu kilitle sıralanır
+        self._write_lock = threading.RLock()
+        # Son kayıttan beri indekse eklenip diske yazılmamış satır sayısı
+        self._index_unsaved = 0
+        self._state = self._new_state()
+        # Etkin depo dizinleri data/layout.json'dan okunur (taşıma sonrası yeni dizinler)
+        self._open_stores(read_layout(self.data_dir))
+        if timer:
+            with timer.phase("gallery_load"):
+                self.load_embeddings()
+        else:
+            self.load_embeddings()
+
+    def _new_state(self):
+        gallery = SpeakerGallery(dtype=self.gallery_dtype)
+        return GalleryState(gallery, create_index(self.index_kind, gallery, **self.index_params),
+                            ASNorm(**self.asnorm_params))
+
+    @property
+    def gallery(self):
+        return self._state.gallery
+
+    @property
+    def speaker_count(self):
+        """Kayıtlı konuşmacı sayısı (parçalı modda parçalardan toplanır)"""
+        return len(self.sharded) if self.sharded is not None else len(self.gallery)
+
+    def _gallery_empty(self):
+        # Parçalı modda boş galeri top_k'nın boş dönmesinden anlaşılır; sorgu başına
+        # ayrı bir sayım turu eklenmez
+        return self.sharded is None and len(self.gallery) == 0
+
+    @property
+    def index(self):
+        return self._state.index
+
+    @property
+    def score_norm(self):
+        return self._state.score_norm
+
+    @property
+    def model_id(self):
+        """Embedding'leri üreten modelin kimliği (önbellek anahtarlarına girer)"""
+        model_id = f"{self.model_source}|{Path(self.saved_model_dir).resolve()}"
+        if self.quantized:
+            model_id += "|int8"
+        return model_id
+
+    @property
+    def model_fingerprint(self):
+        """Galeri meta'sına yazılan model bilgisi; karşılaştırma model_id ile yapılır"""
+        return {"model_id": self.model_id, "source": self.model_source,
+                "savedir": str(Path(self.saved_model_dir).resolve()), "quantized": self.quantized}
+
+    def _open_stores(self, layout):
+        self.layout = layout
+        self.gallery_dir = self.data_dir / layout["gallery"]
+        self.templates_dir = self.data_dir / layout["templates"]
+        self.cohort_dir = self.data_dir / layout["cohort"]
+        # Tüm embedding'ler tek bir mmap matris + journal dosyasında tutulur
+        self.store = EmbeddingStore(self.gallery_dir)
+        # Konuşmacı başına ham şablonlar (denetim için); skorlama sadece merkezlerle yapılır
+        self.template_store = EmbeddingStore(self.templates_dir)
+        self.index_path = self.gallery_dir / f"index_{self.index.name}.npz"
+
+    def switch_layout(self, layout):
+        """Galeriyi başka depo dizinlerine geçirir (ör. taşıma sonrası); tanıma kesintisiz sürer"""
+        with self._write_lock:
+            self._open_stores(layout)
+            self.load_embeddings()
+
+    def _check_fingerprint(self):
+        """Depodaki model kimliğini doğrular; uyuşmazsa depodaki kimliği döner"""
+        stored = self.store.meta.get("model", {}).get("model_id")
+        if stored is not None and stored != self.model_id:
+            print(f"UYARI: Galeri farklı bir modelle oluşturulmuş ({stored}). Kayıt ve tanıma kapalı; "
+                  f"arşivden yeniden kodlamak için: python -m modules.migrate")
+            return stored
+        return None
+
+    def _require_model_match(self):
+        """Galeri başka bir modele aitse skorlama reddedilir; yeni modelin probe'ları eski merkezlerle kıyaslanamaz"""
+        if self.model_mismatch:
+            raise RuntimeError(f"Galeri başka bir modelle oluşturulmuş ({self.model_mismatch}); "
+                               f"önce arşivden yeniden kodlayın (python -m modules.migrate).")
 
     def _ensure_directories(self):
         self.speakers_dir.mkdir(parents=True, exist_ok=True)
         self.embeddings_dir.mkdir(parents=True, exist_ok=True)
 
-    
-    import soundfile as sf # Import soundfile for direct loading
+    def _load_signal(self, audio):
+        """Dosya yolundan veya numpy dizisinden (1, Time) boyutlu, 16 kHz mono sinyal üretir"""
+        with self.metrics.stage("decode"):
+            return self.frontend.load(audio)
+
+    def _calibration_signals(self, audio_inputs, archive_dir):
+        """int8 kalibrasyonu için en fazla CALIBRATION_CLIPS sinyal
+
+        Ses verilmezse arşivdeki dosyalardan eşit aralıklarla seçilir; böylece
+        tek bir konuşmacının kayıtlarıyla sınırlı kalınmaz.
+        """
+        if audio_inputs is None:
+            audio_inputs = [str(path) for path in walk_audio_files(archive_dir)]
+        audio_inputs = list(audio_inputs)
+        step = max(1, len(audio_inputs) // CALIBRATION_CLIPS)
+        signals = []
+        for audio in audio_inputs[::step][:CALIBRATION_CLIPS]:
+            try:
+                signals.append(self._load_signal(audio))
+            except Exception as e:
+                print(f"Kalibrasyon sesi okunamadı: {audio} ({e})")
+        return signals
+
+    def _preprocess(self, signal):
+        """Kodlayıcıdan önceki ses hattı: VAD açıksa konuşma dışı çerçeveleri atar
+
+        Atılan ses süresi "vad_removed_seconds" sayacına eklenir (havuz iş
+        parçacıklarından eşzamanlı çağrılır, paylaşılan alan tutulmaz).
+        """
+        if self.vad is None:
+            return signal
+        with self.metrics.stage("preprocess"):
+            trimmed, removed = self.vad.trim(signal.reshape(-1).numpy(), self.sample_rate)
+        self.metrics.increment("vad_removed_seconds", removed * signal.shape[-1] / self.sample_rate)
+        if removed <= 0.0:
+            return signal
+        return torch.from_numpy(trimmed).unsqueeze(0)
 
     def extract_embedding(self, audio_path):
-        """Bir ses dosyasından embedding vektörü çıkarır"""
-        # Torchaudio bazen codec sorunu çıkarıyor, bu yüzden doğrudan soundfile kullanıyoruz
-        try:
-            # soundfile (Time, Channels) döner veya (Time,)
-            data, fs = sf.read(audio_path)
-            
-            # Numpy -> Tensor
-            signal = torch.from_numpy(data).float()
-            
-            # Eğer mono ise (Time,) -> (1, Time)
-            if len(signal.shape) == 1:
-                signal = signal.unsqueeze(0)
-            # Eğer stereo ise (Time, Channels) -> (Channels, Time)
+        """Bir ses dosyasından veya numpy ses dizisinden embedding vektörü çıkarır"""
+        signal = self._preprocess(self._load_signal(audio_path))
+        key = self.embedding_cache.key_for(signal)
+        cached = self.embedding_cache.get(key)
+        if cached is not None:
+            return cached
+
+        with self.metrics.stage("encode"):
+            embeddings = self._encode(signal)
+        self.metrics.increment("encoded_items")
+        embedding = embeddings.squeeze().cpu().numpy()
+        self.embedding_cache.put(key, embedding)
+        return embedding
+
+    def _encode(self, wavs, wav_lens=None):
+        """Kodlayıcı çağrısı: havuz varsa bir replikaya gider, yoksa bu iş parçacığında çalışır"""
+        if self.pool is not None:
+            return self.pool.encode_batch(wavs, wav_lens)
+        with torch.inference_mode():
+            return self.classifier.encode_batch(wavs, wav_lens)
+
+    @staticmethod
+    def _pad(signals):
+        """Farklı uzunluktaki mono sinyalleri kendi yansımalarıyla doldurur: (batch, wav_lens)
+
+        Sıfırla doldurmak, kısa sinyalin sonundaki çerçeveleri (konvolüsyonların
+        tek dosyada gördüğü yansıtmalı kenar yerine sessizlik görerek) değiştirir
+        ve embedding'i tek dosya yolundan belirgin biçimde uzaklaştırır.
+        """
+        lengths = torch.tensor([sig.shape[-1] for sig in signals], dtype=torch.float32)
+        max_len = int(lengths.max().item())
+        batch = torch.empty(len(signals), max_len)
+        for row, sig in enumerate(signals):
+            samples = sig.reshape(-1).numpy()
+            batch[row] = torch.from_numpy(np.pad(samples, (0, max_len - samples.shape[0]), mode="reflect"))
+        # wav_lens: her sinyalin batch içindeki göreli uzunluğu (0, 1]
+        return batch, lengths / max_len
+
+    def _encode_padded(self, signals):
+        """Farklı uzunluktaki mono sinyalleri sıfırla doldurup tek batch'te kodlar"""
+        batch, wav_lens = self._pad(signals)
+        with self.metrics.stage("encode"):
+            embeddings = self._encode(batch, wav_lens)
+        self.metrics.increment("encoded_items", len(signals))
+        return embeddings.squeeze(1).cpu().numpy()
+
+    def extract_embeddings(self, audio_inputs, batch_size=16, bucket_batches=8, max_padding=0.25):
+        """Birden çok dosya/dizi için embedding'leri batch halinde çıkarır (N, D)
+
+        Girdiler `batch_size * bucket_batches` büyüklüğünde pencereler halinde
+        çözülür, pencere içinde uzunluğa göre sıralanıp batch'lere bölünür.
+        Bir batch'teki hiçbir sinyal, en uzununun `max_padding` oranından
+        fazla doldurulmaz; uymayan sinyal yeni bir batch başlatır. Böylece
+        benzer uzunluklar aynı batch'e düşer ve padding israfı sınırlı kalır.
+        Sonuçlar girdi sırasıyla döner. Çıkarım havuzu varsa penceredeki
+        batch'ler havuza birlikte gönderilir ve replikalarda paralel kodlanır.
+        """
+        audio_inputs = list(audio_inputs)
+        results = [None] * len(audio_inputs)
+        if self.pool is not None:
+            # Her replikaya en az bir batch düşecek kadar büyük pencere
+            bucket_batches = max(bucket_batches, self.pool.replicas)
+        window = max(1, batch_size * bucket_batches)
+
+        for win_start in range(0, len(audio_inputs), window):
+            win_idx = range(win_start, min(win_start + window, len(audio_inputs)))
+            signals = {}
+            keys = {}
+            for i in win_idx:
+                signal = self._preprocess(self._load_signal(audio_inputs[i]))
+                keys[i] = self.embedding_cache.key_for(signal, batched=True)
+                cached = self.embedding_cache.get(keys[i])
+                if cached is not None:
+                    results[i] = cached
+                else:
+                    signals[i] = signal
+            # Uzunluk kovaları: sıralı sırayla, dolum oranı sınırını aşmadan batch'lere böl
+            order = sorted(signals, key=lambda i: signals[i].shape[-1])
+            batches = []
+            for i in order:
+                length = signals[i].shape[-1]
+                if (batches and len(batches[-1]) < batch_size
+                        and length - signals[batches[-1][0]].shape[-1] <= max_padding * length):
+                    batches[-1].append(i)
+                else:
+                    batches.append([i])
+            if self.pool is not None and len(batches) > 1:
+                with self.metrics.stage("encode"):
+                    futures = [self.pool.submit(*self._pad([signals[i] for i in idx])) for idx in batches]
+                    outputs = [future.result().squeeze(1).cpu().numpy() for future in futures]
+                self.metrics.increment("encoded_items", len(order))
             else:
-                signal = signal.transpose(0, 1)
-                # Stereo ise mono'ya çevir (Ortalama al)
-                if signal.shape[0] > 1:
-                    signal = torch.mean(signal, dim=0, keepdim=True)
-            
-            # SpeechBrain embedding modeli genellikle 16kHz bekler, 
-            # ancak ECAPA-TDNN modeli bazen esnektir. 
-            # Yine de burada basitlik için resampling yapmıyoruz (AudioRecorder zaten 16k kaydediyor)
-             
-        except Exception as e:
-            # Fallback olarak yine de torchaudio deneyelim
-            print(f"Soundfile hatası, torchaudio deneniyor: {e}")
-            signal, fs = torchaudio.load(audio_path, backend="soundfile")
-            
-        embeddings = self.classifier.encode_batch(signal)
-        return embeddings.squeeze().cpu().numpy()
+                outputs = [self._encode_padded([signals[i] for i in idx]) for idx in batches]
+            for idx, embeddings in zip(batches, outputs):
+                for row, i in enumerate(idx):
+                    results[i] = embeddings[row]
+                    self.embedding_cache.put(keys[i], embeddings[row])
 
-    def save_speaker(self, name, audio_path):
-        """Yeni bir konuşmacı kaydeder"""
+        if not results:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack(results)
+
+    def save_speaker(self, name, audio_path, replace=False):
+        """Konuşmacıya yeni bir ses örneği (şablon) ekler (dosya yolu veya numpy ses dizisi)
+
+        Aynı isimle tekrar kayıt, mevcut kaydın üzerine yazmak yerine yeni
+        şablon olarak merkeze katılır; replace=True eski şablonları yok sayar.
+        """
         try:
             # Embedding çıkar
             embedding = self.extract_embedding(audio_path)
-            
-            # Embedding'i kaydet
-            emb_path = self.embeddings_dir / f"{name}.npy"
-            np.save(emb_path, embedding)
-            
-            # Ses dosyasını da arşivle (opsiyonel ama iyi bir pratik)
-            # shutil.copy(...) eklenebilir
-            
-            # Hafızayı güncelle
-            self.known_embeddings[name] = embedding
+            success, msg = self.enroll_embedding(name, embedding, replace=replace)
+            if success:
+                # Ses dosyasını da arşivle (model değişiminde yeniden kodlama için)
+                self.archive_samples(name, [audio_path], replace=replace)
+            return success, msg
+        except Exception as e:
+            return False, str(e)
+
+    def save_speaker_samples(self, name, audio_inputs, replace=False, batch_size=16):
+        """Birden çok ses örneğini batch halinde kodlayıp aynı konuşmacıya şablon olarak ekler"""
+        try:
+            embeddings = self.extract_embeddings(audio_inputs, batch_size=batch_size)
+            for i, embedding in enumerate(embeddings):
+                success, msg = self.enroll_embedding(name, embedding, replace=replace and i == 0)
+                if not success:
+                    return success, msg
+            self.archive_samples(name, audio_inputs, replace=replace)
+            return True, f"Kayıt başarılı ({len(embeddings)} örnek)."
+        except Exception as e:
+            return False, str(e)
+
+    def archive_samples(self, name, audio_inputs, replace=False):
+        """Kayıt seslerini data/archive/<isim>/ altına içerik hash'iyle saklar
+
+        replace=True eski arşivi her durumda siler; böylece taşıma, galeriden
+        çıkmış örnekleri yeniden kodlamaz. Arşiv hatası kaydı bozmaz.
+        """
+        speaker_dir = self.archive_dir / name
+        try:
+            if replace and speaker_dir.exists():
+                shutil.rmtree(speaker_dir)
+            if not self.archive_audio:
+                return
+            speaker_dir.mkdir(parents=True, exist_ok=True)
+            for audio in audio_inputs:
+                if isinstance(audio, (str, os.PathLike)):
+                    source = Path(audio)
+                    digest = hashlib.sha1(source.read_bytes()).hexdigest()[:16]
+                    target = speaker_dir / f"{digest}{source.suffix.lower()}"
+                    if not target.exists():
+                        with open(source, "rb") as src, atomic_write(target) as dst:
+                            shutil.copyfileobj(src, dst)
+                else:
+                    data, rate = self.frontend.decode(audio)
+                    digest = hashlib.sha1(data.tobytes()).hexdigest()[:16]
+                    target = speaker_dir / f"{digest}.wav"
+                    if not target.exists():
+                        with atomic_write(target) as dst:
+                            sf.write(dst, data, rate, format="WAV")
+        except Exception as e:
+            print(f"Ses arşivlenemedi ({name}): {e}")
+
+    def enroll_embedding(self, name, embedding, replace=False):
+        """Önceden çıkarılmış bir embedding'i konuşmacının şablonu olarak kaydeder
+
+        Merkez, L2-normalize şablonların artımlı ortalamasıdır:
+        m_n = m_{n-1} + (e_n - m_{n-1}) / n; galeride yeniden normalize edilir.
+        """
+        try:
+            self._require_model_match()
+            template = SpeakerGallery.normalize(embedding)
+            with self._write_lock:
+                if replace and self.template_counts.get(name):
+                    self._drop_templates(name)
+                if "model" not in self.store.meta:
+                    # Parmak izi olmayan (yeni veya eski) depo bu modelle yazılmaya başlar
+                    for store in (self.store, self.template_store):
+                        store.set_meta(model=self.model_fingerprint)
+                count = 0 if replace else self.template_counts.get(name, 0)
+                previous = self._centroid(name)
+                if count == 0 and previous is not None and not replace:
+                    # Şablonu olmayan eski kayıt: mevcut embedding ilk şablon sayılır
+                    self.template_store.append(f"{name}#0", previous)
+                    count = 1
+
+                if count == 0:
+                    mean = template
+                else:
+                    previous = SpeakerGallery.normalize(previous) if count == 1 else np.asarray(previous, dtype=np.float32)
+                    mean = previous + (template - previous) / (count + 1)
+
+                # Ham şablonu ve güncel ortalamayı depolara ekle (journal'a yazılır)
+                self.template_store.append(f"{name}#{count}", embedding)
+                self.store.append(name, mean)
+                self.template_counts[name] = count + 1
+
+                # Hafızayı güncelle
+                self.known_embeddings[name] = mean
+                if self.sharded is not None:
+                    self.sharded.add(name, mean)
+                    return True, "Kayıt başarılı."
+                state = self._state
+                # Kohort istatistiği satır okuyuculara görünmeden önce hesaplanır (1 x C çarpım)
+                state.score_norm.update_row(state.gallery.next_row(name), state.gallery.stored_vector(mean))
+                # Yeni galeri snapshot'ı yayınlanır; süren sorgular eski snapshot'la biter
+                row = state.gallery.add(name, mean)
+                state.index.add(row)
+                self._index_unsaved += 1
+                if self._index_unsaved >= self.INDEX_SAVE_EVERY:
+                    self._save_index()
             return True, "Kayıt başarılı."
         except Exception as e:
             return False, str(e)
 
+    def _centroid(self, name):
+        """Konuşmacının normalize edilmemiş (şablon ortalaması) merkezi, yoksa None"""
+        mean = self.known_embeddings.get(name)
+        if mean is None and name in self._stored_rows:
+            mean = np.asarray(self._stored_matrix[self._stored_rows[name]], dtype=np.float32)
+        return mean
+
+    def _drop_templates(self, name):
+        """Konuşmacının eski şablonlarını silme işaretleriyle siler (replace=True için)"""
+        count = self.template_counts.pop(name, 0)
+        self.template_store.delete([f"{name}#{i}" for i in range(count)])
+
+    def get_templates(self, name):
+        """Denetim için bir konuşmacının ham şablonlarını (K, D) döner"""
+        with self._write_lock:
+            names, matrix = self.template_store.load()
+        rows = [i for i, key in enumerate(names) if key.rpartition("#")[0] == name]
+        if not rows:
+            return np.empty((0, self.gallery.dim or 0), dtype=np.float32)
+        return np.asarray(matrix[rows])
+
     def load_embeddings(self):
-        """Kaydedilmiş tüm konuşmacıların embedding'lerini yükler"""
-        self.known_embeddings = {}
-        for emb_file in self.embeddings_dir.glob("*.npy"):
-            name = emb_file.stem
-            self.known_embeddings[name] = np.load(emb_file)
-        print(f"{len(self.known_embeddings)} konuşmacı yüklendi.")
-
-    def identify_speaker(self, audio_path, threshold=0.25):
-        """Verilen sesin kime ait olduğunu bulur"""
-        if not self.known_embeddings:
+        """Kaydedilmiş tüm konuşmacıların embedding'lerini yükler
+
+        Yeni galeri, indeks ve AS-norm durumu yan tarafta kurulur ve tek
+        atamayla yayınlanır; yükleme sürerken tanıma eski durumla devam eder.
+        """
+        with self._write_lock:
+            # Eski konuşmacı başına .npy dizini varsa tek seferlik depoya aktar
+            if not self.store.exists() and any(self.embeddings_dir.glob("*.npy")):
+                count = self.store.import_npy_dir(self.embeddings_dir)
+                print(f"{count} eski .npy embedding depoya aktarıldı.")
+
+            names, matrix = self.store.load()
+            # Farklı modelin vektörleri bu modelin embedding'leriyle karıştırılmaz
+            self.model_mismatch = self._check_fingerprint()
+            # Şablon sayıları artımlı merkez güncellemesi için gerekir
+            template_counts = {}
+            for key in self.template_store.names():
+                speaker, _, idx = key.rpartition("#")
+                if idx.isdigit():
+                    template_counts[speaker] = max(template_counts.get(speaker, 0), int(idx) + 1)
+
+            state = self._new_state()
+            if self.num_shards:
+                self._load_shards(names, matrix)
+            else:
+                state.gallery.add_many(names, matrix)
+                # Kayıtlı indeks yoksa veya galeriyle uyuşmuyorsa yeniden eğit
+                if not state.index.load(self.index_path):
+                    state.index.rebuild()
+                state.index.save(self.index_path)
+                self._index_unsaved = 0
+                # AS-norm önbelleği: kohortla uyuşan kayıtlı istatistikler yeniden kullanılır
+                # (Sıkıştırılmış galeride float32 matris sadece kohort varsa çözülür)
+                if ASNorm.has_cohort(self.cohort_dir) and state.score_norm.load(self.cohort_dir, state.gallery.matrix):
+                    state.score_norm.save(self.cohort_dir, state.gallery.matrix)
+
+            # Konuşmacı başına ayrı dizi tutulmaz: merkezler gerektiğinde depodaki matristen okunur
+            self.known_embeddings = {}
+            self._stored_rows = {name: i for i, name in enumerate(names)}
+            self._stored_matrix = matrix
+            self.template_counts = template_counts
+            self.calibration = self._load_calibration()
+            self._state = state
+        print(f"{len(names)} konuşmacı yüklendi.")
+
+    def _load_shards(self, names, matrix):
+        """Parça süreçlerini (gerekirse yeni galeri dizininde) açar ve depoyla eşitler
+
+        Yeni parçalar eşitlendikten sonra yayınlanır; önceki dizinin parçaları
+        (ör. taşıma sonrası) ancak ondan sonra kapatılır.
+        """
+        root = self.gallery_dir / "shards"
+        sharded = self.sharded
+        if sharded is None or sharded.root != root:
+            sharded = ShardedGallery(root, num_shards=self.num_shards, dtype=self.gallery_dtype,
+                                     **self.shard_params)
+        sent, removed = sharded.sync(names, matrix)
+        if sent or removed:
+            print(f"Parçalar depoyla eşitlendi: {sent} konuşmacı gönderildi, {removed} silindi.")
+        if ASNorm.has_cohort(self.cohort_dir):
+            print("UYARI: AS-norm parçalı galeride desteklenmiyor; ham kosinüs skorları kullanılır.")
+        previous, self.sharded = self.sharded, sharded
+        if previous is not None and previous is not sharded:
+            previous.close()
+
+    def _save_index(self):
+        """Yazılmamış kayıtları içeren indeksi diske yazar (yazma kilidi altında çağrılır)"""
+        self._state.index.save(self.index_path)
+        self._index_unsaved = 0
+
+    def close(self):
+        """Çıkarım havuzunu ve parça süreçlerini durdurur, bekleyen indeksi yazar"""
+        with self._write_lock:
+            if self._index_unsaved:
+                self._save_index()
+        if self.pool is not None:
+            self.pool.shutdown()
+        if self.sharded is not None:
+            self.sharded.close()
+    @property
+    def score_scale(self):
+        """Etkin skor ölçeği: kohort varsa "asnorm", yoksa ham "cosine" skorları"""
+        return "asnorm" if self.score_norm.enabled else "cosine"
+
+    @property
+    def default_threshold(self):
+        """Etkin skor ölçeği için varsayılan karar eşiği
+
+        Kalibre edilmiş eşik (modules.evaluation --apply) varsa o, yoksa
+        ham kosinüs için 0.25, AS-norm için ASNorm.threshold kullanılır.
+        """
+        calibrated = self.calibration.get(self.score_scale)
+        if calibrated is not None:
+            return calibrated["threshold"]
+        return self.score_norm.threshold if self.score_norm.enabled else 0.25
+
+    def _load_calibration(self):
+        """Galeri dizinindeki kalibrasyon; başka bir modelle yapılmışsa yok sayılır"""
+        path = self.gallery_dir / self.CALIBRATION_FILE
+        if not path.exists():
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("model_id") != self.model_id:
+            print("Kalibrasyon başka bir modele ait, varsayılan eşik kullanılıyor.")
+            return {}
+        return data.get("thresholds", {})
+
+    def set_threshold(self, threshold, scale=None, **info):
+        """Kalibre edilmiş karar eşiğini kaydeder (ör. EER/minDCF değerleriyle birlikte)"""
+        scale = scale or self.score_scale
+        with self._write_lock:
+            calibration = {**self.calibration, scale: {"threshold": float(threshold), **info}}
+            with atomic_write(self.gallery_dir / self.CALIBRATION_FILE, "w", encoding="utf-8") as f:
+                json.dump({"model_id": self.model_id, "thresholds": calibration}, f, indent=2)
+            self.calibration = calibration
+
+    def _update_cohort(self, method, embeddings):
+        # Kopya üzerinde hesaplanır, sonra yayınlanır: okuyucular yarım güncellenmiş istatistik görmez
+        if self.num_shards:
+            raise ValueError("AS-norm kohortu parçalı galeride desteklenmiyor")
+        with self._write_lock:
+            score_norm = copy.copy(self.score_norm)
+            matrix = self.gallery.matrix
+            getattr(score_norm, method)(embeddings, matrix)
+            score_norm.save(self.cohort_dir, matrix)
+            self._state = self._state._replace(score_norm=score_norm)
+
+    def set_cohort(self, embeddings):
+        """Kohortu değiştirir; tüm kayıtlı konuşmacıların istatistikleri yeniden hesaplanır"""
+        self._update_cohort("set_cohort", embeddings)
+
+    def add_cohort(self, embeddings):
+        """Kohorta yeni embedding'ler ekler; önbellek artımlı olarak güncellenir"""
+        self._update_cohort("add_cohort", embeddings)
+
+    def build_cohort(self, audio_inputs, batch_size=16):
+        """Ses dosyalarından kohort oluşturur (kayıtlı konuşmacılardan farklı kişiler olmalı)"""
+        self.set_cohort(self.extract_embeddings(audio_inputs, batch_size=batch_size))
+
+    def _rank(self, target_embedding, k):
+        """Aday listesini indeksten alır; kohort varsa AS-norm skorlarıyla yeniden sıralar"""
+        self._require_model_match()
+        if self.sharded is not None:
+            # Sorgu tüm parçalara yayınlanır, kısmi top-k listeleri birleştirilir
+            return self.sharded.top_k(target_embedding, k=k)
+        # Tüm okuma tek bir durum ve galeri snapshot'ı üzerinde, kilitsiz yapılır
+        state = self._state
+        snapshot = state.gallery.snapshot()
+        if not state.score_norm.enabled:
+            return state.index.search(target_embedding, k=k, snapshot=snapshot)
+        shortlist = state.index.search(target_embedding, k=max(k, self.asnorm_shortlist), snapshot=snapshot)
+        rows = [snapshot.row(name) for name, _ in shortlist]
+        raw = [score for _, score in shortlist]
+        # Probe tarafı: tek bir (C, D) matris çarpımı
+        probe = state.score_norm.probe_stats(target_embedding)
+        normalized = state.score_norm.normalize(raw, rows, probe)
+        order = np.argsort(-normalized, kind="stable")[:k]
+        return [(shortlist[i][0], float(normalized[i])) for i in order]
+
+    def identify_speaker(self, audio_path, threshold=None):
+        """Verilen sesin (dosya yolu veya numpy dizisi) kime ait olduğunu bulur"""
+        if self._gallery_empty():
             return "Bilinmiyor", 0.0
 
         target_embedding = self.extract_embedding(audio_path)
-        
-        best_score = -1.0
-        best_speaker = "Bilinmiyor"
-        
-        # Cosine Similarity hesapla
-        for name, emb in self.known_embeddings.items():
-            # Cosine similarity: (A . B) / (||A|| * ||B||)
-            # SpeechBrain embeddingleri genellikle normalize edilmiştir ama emin olmak için:
-            score = np.dot(target_embedding, emb) / (np.linalg.norm(target_embedding) * np.linalg.norm(emb))
-            
-            if score > best_score:
-                best_score = score
-                best_speaker = name
-        
+        return self.identify_embedding(target_embedding, threshold=threshold)
+
+    def identify_embedding(self, target_embedding, threshold=None):
+        """Önceden çıkarılmış bir embedding'in kime ait olduğunu bulur
+
+        threshold verilmezse etkin skor ölçeğinin varsayılan eşiği kullanılır.
+        """
+        if self._gallery_empty():
+            return "Bilinmiyor", 0.0
+        if threshold is None:
+            threshold = self.default_threshold
+
+        # Cosine Similarity: galeri satırları zaten normalize, tek matris-vektör çarpımı yeterli
+        with self.metrics.stage("score"):
+            ranked = self._rank(target_embedding, k=1)
+        if not ranked:
+            return "Bilinmiyor", 0.0
+        best_speaker, best_score = ranked[0]
+
         if best_score < threshold:
             return "Bilinmiyor", float(best_score)
             
         return best_speaker, float(best_score)
+
+    def verify(self, audio_a, audio_b, threshold=None):
+        """1:1 doğrulama: iki ses aynı konuşmacıya mı ait? (karar, skor)"""
+        embeddings = self.extract_embeddings([audio_a, audio_b])
+        return self.verify_embeddings(embeddings[0], embeddings[1], threshold=threshold)
+
+    def verify_embeddings(self, embedding_a, embedding_b, threshold=None):
+        """İki embedding için doğrulama; kohort varsa iki taraf da AS-norm ile normalize edilir"""
+        score_norm = self.score_norm
+        if score_norm.enabled:
+            # Kohort galeriyle aynı (uyuşmayan) modele ait
+            self._require_model_match()
+        a = SpeakerGallery.normalize(embedding_a)
+        b = SpeakerGallery.normalize(embedding_b)
+        score = float(a @ b)
+        if score_norm.enabled:
+            mu_a, sd_a = score_norm.probe_stats(a)
+            mu_b, sd_b = score_norm.probe_stats(b)
+            score = 0.5 * ((score - mu_a) / sd_a + (score - mu_b) / sd_b)
+        if threshold is None:
+            threshold = self.default_threshold
+        return score >= threshold, float(score)
+
+    def verify_speaker(self, name, audio_path, threshold=None):
+        """Kimlik iddiası doğrulama: ses, kayıtlı `name` konuşmacısına mı ait? (karar, skor)"""
+        return self.verify_claim_embedding(name, self.extract_embedding(audio_path), threshold=threshold)
+
+    def verify_claim_embedding(self, name, target_embedding, threshold=None):
+        """Embedding'i sadece iddia edilen konuşmacının merkeziyle skorlar (1 x D çarpım)"""
+        self._require_model_match()
+        if self.sharded is not None:
+            centroid = self._centroid(name)
+            if centroid is None:
+                raise ValueError(f"Kayıtlı konuşmacı değil: {name}")
+            with self.metrics.stage("score"):
+                score = float(SpeakerGallery.normalize(target_embedding) @ SpeakerGallery.normalize(centroid))
+            if threshold is None:
+                threshold = self.default_threshold
+            return score >= threshold, score
+        state = self._state
+        snapshot = state.gallery.snapshot()
+        if name not in snapshot:
+            raise ValueError(f"Kayıtlı konuşmacı değil: {name}")
+        row = snapshot.row(name)
+        with self.metrics.stage("score"):
+            score = snapshot.scores(target_embedding, rows=[row])
+            if state.score_norm.enabled:
+                score = state.score_norm.normalize(score, [row], state.score_norm.probe_stats(target_embedding))
+        if threshold is None:
+            threshold = self.default_threshold
+        score = float(score[0])
+        return score >= threshold, score
+
+    def top_k(self, audio_path, k=5):
+        """En benzer k konuşmacıyı (isim, skor) çiftleri olarak sıralı döner"""
+        if self._gallery_empty():
+            return []
+
+        target_embedding = self.extract_embedding(audio_path)
+        return self.top_k_embedding(target_embedding, k=k)
+
+    def top_k_embedding(self, target_embedding, k=5):
+        """Önceden çıkarılmış bir embedding için en benzer k konuşmacı"""
+        if self._gallery_empty():
+            return []
+        with self.metrics.stage("score"):
+            return self._rank(target_embedding, k=k)
+
+    def analyze_long_audio(self, audio_path, **kwargs):
+        """Uzun kaydı sınırlı bellekle segmentlere ayırıp konuşmacı zaman çizelgesi çıkarır"""
+        return analyze_long_recording(self, audio_path, **kwargs)
+
+    @contextmanager
+    def profile(self, trace_path=None, **profiler_kwargs):
+        """İsteğe bağlı torch profiler yakalaması; trace_path verilirse Chrome trace yazar"""
+        from torch.profiler import profile, ProfilerActivity
+        activities = [ProfilerActivity.CPU]
+        if self.device != "cpu" and torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+        with profile(activities=activities, record_shapes=True, **profiler_kwargs) as prof:
+            yield prof
+        if trace_path:
+            prof.export_chrome_trace(str(trace_path))
+
+    def verify_index(self, num_queries=100, k=10, noise=0.3, seed=0):
+        """Doğrulama modu: indeks sonuçlarını tam taramayla karşılaştırır
+
+        Sorgular galeriden rastgele seçilen satırlara gürültü eklenerek üretilir.
+        Parçalı modda indeks yoktur (parçalar tam tarama yapar); None döner.
+        """
+        if len(self.gallery) == 0:
+            return None
+        rng = np.random.default_rng(seed)
+        state = self._state
+        snapshot = state.gallery.snapshot()
+        rows = rng.choice(len(snapshot), min(num_queries, len(snapshot)), replace=False)
+        queries = snapshot.vectors(rows)
+        queries = queries + noise * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(queries.shape[1])
+        return verify_index(state.index, snapshot, queries, k=k)
+
+    def compare_gallery_storage(self, dtypes=("float16", "int8"), num_queries=100, k=10, noise=0.3, seed=0):
+        """float16/int8 galeri depolamasının float32'ye göre bellek, skor kayması ve top-1 uyumu
+
+        Referans, depodaki tam hassasiyetli merkezlerdir; sorgular verify_index
+        ile aynı şekilde üretilir.
+        """
+        with self._write_lock:
+            names, matrix = self.store.load()
+            matrix = np.asarray(matrix, dtype=np.float32)
+        if not names:
+            return None
+        rng = np.random.default_rng(seed)
+        rows = rng.choice(len(names), min(num_queries, len(names)), replace=False)
+        norms = np.linalg.norm(matrix[rows], axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        queries = matrix[rows] / norms
+        queries = queries + noise * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(queries.shape[1])
+        return compare_storage(matrix, queries, dtypes=dtypes, k=k)
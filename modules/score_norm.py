@@ -0,0 +1,214 @@
+import hashlib
+import numpy as np
+from pathlib import Path
+from utils.file_manager import atomic_write
+
+
+class ASNorm:
+    """Kohort tabanlı uyarlanabilir skor normalizasyonu (AS-norm)
+
+    s_norm = 0.5 * ((s - mu_e) / sd_e + (s - mu_p) / sd_p)
+
+    mu_e/sd_e: kayıtlı konuşmacının kohorttaki en yüksek `top_k` skorunun
+    ortalama/sapması. Bunlar kayıt anında hesaplanıp galeri satırlarıyla
+    hizalı olarak önbellekte tutulur. Sorguda sadece probe tarafı için tek
+    bir (C, D) matris çarpımı yapılır. Kohorta ekleme yapılınca her satırın
+    önbellekteki en iyi `top_k` skoru yeni kohort skorlarıyla birleştirilir
+    (artımlı yeniden hesap); kohort değiştirilirse önbellek geçersiz olur.
+    """
+
+    def __init__(self, cohort=None, top_k=100, threshold=3.0, block=8192):
+        self.top_k = top_k
+        self.threshold = threshold
+        self.block = block
+        self.cohort = np.empty((0, 0), dtype=np.float32)
+        self._top_scores = None  # (N, k) satır başına en iyi kohort skorları
+        self._buffer = None
+        self._stats = None
+        self.mean = np.empty(0, dtype=np.float32)
+        self.std = np.empty(0, dtype=np.float32)
+        if cohort is not None:
+            self.cohort = self._normalize_rows(cohort)
+
+    @property
+    def enabled(self):
+        return self.cohort.shape[0] > 0
+
+    @property
+    def fingerprint(self):
+        """Kohort içeriğinin özeti; önbellek geçerliliğini kontrol etmek için"""
+        h = hashlib.blake2b(np.ascontiguousarray(self.cohort).tobytes(), digest_size=16)
+        h.update(str(self.top_k).encode("ascii"))
+        return h.hexdigest()
+
+    @staticmethod
+    def _normalize_rows(matrix):
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _k(self):
+        return min(self.top_k, self.cohort.shape[0])
+
+    def _top_k_scores(self, rows, cohort):
+        """(R, D) satırların kohortla skorlarından en yüksek k tanesi (R, k)"""
+        scores = rows @ cohort.T
+        k = min(self.top_k, scores.shape[1])
+        if k < scores.shape[1]:
+            scores = np.partition(scores, scores.shape[1] - k, axis=1)[:, -k:]
+        return scores
+
+    def _update_stats(self):
+        # _top_scores toptan değişti; ekleme tamponu bir sonraki eklemede yeniden ayrılır
+        self._buffer = None
+        self.mean = self._top_scores.mean(axis=1)
+        self.std = np.maximum(self._top_scores.std(axis=1), 1e-6)
+
+    # --- Kayıt tarafı önbelleği ---
+    def rebuild(self, gallery_matrix):
+        """Tüm galeri için kohort istatistiklerini bloklar halinde hesaplar"""
+        n = gallery_matrix.shape[0]
+        if not self.enabled:
+            self._top_scores = None
+            self._buffer = None
+            self.mean = np.empty(0, dtype=np.float32)
+            self.std = np.empty(0, dtype=np.float32)
+            return
+        top = np.empty((n, self._k()), dtype=np.float32)
+        for start in range(0, n, self.block):
+            top[start:start + self.block] = self._top_k_scores(gallery_matrix[start:start + self.block], self.cohort)
+        self._top_scores = top
+        self._update_stats()
+
+    def update_row(self, row, vector):
+        """Yeni kayıt/güncelleme: tek satırın istatistiğini hesaplar (1 x C çarpım)"""
+        if not self.enabled:
+            return
+        top = self._top_k_scores(self._normalize_rows(vector), self.cohort)[0]
+        n = 0 if self._top_scores is None else self._top_scores.shape[0]
+        if row < n:
+            self._top_scores[row] = top
+            self.mean[row] = top.mean()
+            self.std[row] = max(top.std(), 1e-6)
+        else:
+            # Yeni satır: galeri sırası korunarak sona eklenir (kapasite ikiye katlanarak büyür)
+            self._append_row(top)
+
+    def _append_row(self, top):
+        n = 0 if self._top_scores is None else self._top_scores.shape[0]
+        if self._buffer is None or n >= self._buffer.shape[0]:
+            capacity = max(64, 2 * n)
+            buffer = np.empty((capacity, top.shape[0]), dtype=np.float32)
+            stats = np.empty((2, capacity), dtype=np.float32)
+            if n:
+                buffer[:n] = self._top_scores
+                stats[0, :n] = self.mean
+                stats[1, :n] = self.std
+            self._buffer, self._stats = buffer, stats
+        self._buffer[n] = top
+        self._stats[0, n] = top.mean()
+        self._stats[1, n] = max(top.std(), 1e-6)
+        self._top_scores = self._buffer[:n + 1]
+        self.mean = self._stats[0, :n + 1]
+        self.std = self._stats[1, :n + 1]
+
+    # --- Kohort değişiklikleri ---
+    def set_cohort(self, cohort, gallery_matrix):
+        """Kohortu değiştirir; önbellek geçersiz olur ve yeniden hesaplanır"""
+        self.cohort = self._normalize_rows(cohort)
+        self.rebuild(gallery_matrix)
+
+    def add_cohort(self, embeddings, gallery_matrix):
+        """Kohorta ekleme: mevcut en iyi-k skorları yeni üyelerin skorlarıyla birleştirilir"""
+        new = self._normalize_rows(embeddings)
+        if not self.enabled:
+            self.set_cohort(new, gallery_matrix)
+            return
+        self.cohort = np.vstack([self.cohort, new])
+        n = gallery_matrix.shape[0]
+        if self._top_scores is None or self._top_scores.shape[0] != n:
+            self.rebuild(gallery_matrix)
+            return
+        k = self._k()
+        merged = np.empty((n, k), dtype=np.float32)
+        for start in range(0, n, self.block):
+            candidates = np.hstack([self._top_scores[start:start + self.block],
+                                    gallery_matrix[start:start + self.block] @ new.T])
+            merged[start:start + self.block] = np.partition(candidates, candidates.shape[1] - k, axis=1)[:, -k:]
+        self._top_scores = merged
+        self._update_stats()
+
+    # --- Sorgu tarafı ---
+    def probe_stats(self, query):
+        """Probe için kohort istatistiği: tek (C, D) matris-vektör çarpımı"""
+        top = self._top_k_scores(self._normalize_rows(query), self.cohort)[0]
+        return float(top.mean()), float(max(top.std(), 1e-6))
+
+    def batch_stats(self, matrix):
+        """(N, D) embedding'lerin kohort istatistikleri (ortalama, sapma); bloklar halinde"""
+        matrix = np.asarray(matrix, dtype=np.float32)
+        n = matrix.shape[0]
+        mean = np.empty(n, dtype=np.float32)
+        std = np.empty(n, dtype=np.float32)
+        for start in range(0, n, self.block):
+            top = self._top_k_scores(self._normalize_rows(matrix[start:start + self.block]), self.cohort)
+            mean[start:start + self.block] = top.mean(axis=1)
+            std[start:start + self.block] = np.maximum(top.std(axis=1), 1e-6)
+        return mean, std
+
+    def normalize(self, raw_scores, rows, probe):
+        """Galeri satırları `rows` için ham kosinüs skorlarını AS-norm skorlarına çevirir"""
+        mu_p, sd_p = probe
+        rows = np.asarray(rows)
+        raw_scores = np.asarray(raw_scores, dtype=np.float32)
+        return 0.5 * ((raw_scores - self.mean[rows]) / self.std[rows] + (raw_scores - mu_p) / sd_p)
+
+    # --- Kalıcılık ---
+    def save(self, directory, gallery_matrix):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        with atomic_write(directory / "cohort.npy") as f:
+            np.save(f, self.cohort)
+        if self._top_scores is not None:
+            with atomic_write(directory / "asnorm_cache.npz") as f:
+                # Satır özetleri: yüklemede değişen (yeniden kayıt olmuş) satırları bulmak için
+                np.savez(f, top_scores=self._top_scores, fingerprint=self.fingerprint,
+                         row_sums=np.asarray(gallery_matrix, dtype=np.float64).sum(axis=1))
+
+    @staticmethod
+    def has_cohort(directory):
+        return (Path(directory) / "cohort.npy").exists()
+
+    def load(self, directory, gallery_matrix):
+        """Kohortu yükler; önbellek kohortla uyuşuyorsa kullanır, eksik satırları ekler"""
+        directory = Path(directory)
+        cohort_path = directory / "cohort.npy"
+        if not cohort_path.exists():
+            return False
+        self.cohort = self._normalize_rows(np.load(cohort_path))
+        cache_path = directory / "asnorm_cache.npz"
+        n = gallery_matrix.shape[0]
+        if cache_path.exists():
+            with np.load(cache_path) as data:
+                valid = str(data["fingerprint"]) == self.fingerprint and data["top_scores"].shape[0] <= n
+                top = data["top_scores"].astype(np.float32) if valid else None
+                row_sums = data["row_sums"] if valid else None
+            if top is not None:
+                count = top.shape[0]
+                current_sums = np.asarray(gallery_matrix[:count], dtype=np.float64).sum(axis=1)
+                stale = np.flatnonzero(~np.isclose(current_sums, row_sums, rtol=0, atol=1e-5))
+                # Önbellek kaydından sonra eklenen veya değişen satırlar artımlı olarak hesaplanır
+                if stale.size:
+                    top[stale] = self._top_k_scores(gallery_matrix[stale], self.cohort)
+                if count < n:
+                    extra = [self._top_k_scores(gallery_matrix[s:min(s + self.block, n)], self.cohort)
+                             for s in range(count, n, self.block)]
+                    top = np.vstack([top] + extra)
+                self._top_scores = top
+                self._update_stats()
+                return True
+        self.rebuild(gallery_matrix)
+        return True
@@ -0,0 +1,344 @@
+import argparse
+import asyncio
+import functools
+import json
+import os
+import time
+from collections import deque
+import numpy as np
+
+
+class Overloaded(Exception):
+    """Kuyruk dolu: istemci daha sonra tekrar denemeli (geri basınç)"""
+
+
+class MicroBatcher:
+    """Eşzamanlı embedding isteklerini encode_batch için mikro-batch'lerde toplar
+
+    İlk istek geldikten sonra en fazla `max_wait_ms` beklenir ya da
+    `max_batch` isteğe ulaşılır; toplanan grup tek bir extract_embeddings
+    çağrısıyla (iş parçacığında) kodlanır. Kuyruk `max_queue` ile sınırlıdır.
+    Tanıyıcının çıkarım havuzu varsa replika sayısı kadar batch eşzamanlı kodlanır.
+    """
+
+    def __init__(self, recognizer, max_batch=16, max_wait_ms=10, max_queue=256):
+        self.recognizer = recognizer
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.batch_sizes = deque(maxlen=1000)
+        pool = getattr(recognizer, "pool", None)
+        self.concurrency = pool.replicas if pool is not None else 1
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._pending = set()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+    def submit(self, audio):
+        """Sesi kuyruğa ekler, embedding için bir future döner"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((audio, future))
+        except asyncio.QueueFull:
+            raise Overloaded("Kuyruk dolu")
+        return future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(items) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # Zaman aşımına uğrayıp iptal edilen istekleri kodlama
+            items = [item for item in items if not item[1].done()]
+            if not items:
+                continue
+            self.batch_sizes.append(len(items))
+            # Çıkarım havuzu varsa replika sayısı kadar batch aynı anda kodlanır
+            await self._slots.acquire()
+            self._pending.add(loop.create_task(self._encode(items)))
+
+    async def _encode(self, items):
+        loop = asyncio.get_running_loop()
+        try:
+            try:
+                embeddings = await loop.run_in_executor(
+                    None, self.recognizer.extract_embeddings,
+                    [audio for audio, _ in items], self.max_batch
+                )
+            except Exception:
+                # Batch başarısızsa istekleri tek tek dene, hatalı olanı ayır
+                for audio, future in items:
+                    try:
+                        emb = await loop.run_in_executor(None, self.recognizer.extract_embedding, audio)
+                        if not future.done():
+                            future.set_result(emb)
+                    except Exception as item_error:
+                        if not future.done():
+                            future.set_exception(item_error)
+                return
+            for (_, future), emb in zip(items, embeddings):
+                if not future.done():
+                    future.set_result(emb)
+        finally:
+            self._slots.release()
+            self._pending.discard(asyncio.current_task())
+
+
+class SpeakerService:
+    """SpeakerRecognizer etrafında başsız (GUI'siz), çevrimdışı kayıt/tanıma servisi
+
+    HTTP (TCP) veya Unix soketi üzerinden JSON istekleri kabul eder:
+      POST /enroll    {"name": ..., "path": ...}
+      POST /identify  {"path": ..., "threshold": 0.25}  (eşik isteğe bağlı)
+      POST /top_k     {"path": ..., "k": 5}
+      POST /verify    {"name": ..., "path": ...} veya {"reference": {"path": ...}, "path": ...}
+      GET  /metrics
+    "path" yerine {"samples": [...], "sample_rate": 16000} de gönderilebilir.
+    """
+
+    def __init__(self, recognizer, max_batch=16, max_wait_ms=10, max_queue=256,
+                 request_timeout=30.0):
+        self.recognizer = recognizer
+        self.batcher = MicroBatcher(recognizer, max_batch, max_wait_ms, max_queue)
+        self.request_timeout = request_timeout
+        self.latencies = {}
+        self.counters = {"ok": 0, "error": 0, "overloaded": 0, "timeout": 0}
+        self._server = None
+
+    # --- İş mantığı ---
+    @staticmethod
+    def _audio_from_request(payload):
+        if "path" in payload:
+            return payload["path"]
+        if "samples" in payload:
+            samples = np.asarray(payload["samples"], dtype=np.float32)
+            return (samples, int(payload.get("sample_rate", 16000)))
+        raise ValueError("'path' veya 'samples' alanı gerekli")
+
+    async def _embed(self, payload):
+        future = self.batcher.submit(self._audio_from_request(payload))
+        try:
+            return await asyncio.wait_for(future, self.request_timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise
+
+    @staticmethod
+    async def _blocking(func, *args, **kwargs):
+        """Tanıyıcı çağrısını iş parçacığında çalıştırır; olay döngüsü (fsync, skorlama) bloklanmaz"""
+        return await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(func, *args, **kwargs))
+
+    async def enroll(self, payload):
+        name = payload.get("name")
+        if not name:
+            raise ValueError("'name' alanı gerekli")
+        audio = self._audio_from_request(payload)
+        embedding = await self._embed(payload)
+        success, msg = await self._blocking(self.recognizer.enroll_embedding, name, embedding)
+        if success:
+            # Yol veya satır içi örnekler arşivlenir; model değişiminde taşıma bunları yeniden kodlar
+            await self._blocking(self.recognizer.archive_samples, name, [audio])
+        return {"success": success, "message": msg}
+
+    async def identify(self, payload):
+        embedding = await self._embed(payload)
+        threshold = payload.get("threshold")
+        name, score = await self._blocking(
+            self.recognizer.identify_embedding, embedding,
+            threshold=None if threshold is None else float(threshold)
+        )
+        return {"name": name, "score": score}
+
+    async def verify(self, payload):
+        """Kimlik iddiası (name) veya iki ses (reference) için 1:1 doğrulama"""
+        threshold = payload.get("threshold")
+        threshold = None if threshold is None else float(threshold)
+        if "reference" in payload:
+            reference, embedding = await asyncio.gather(self._embed(payload["reference"]), self._embed(payload))
+            accepted, score = await self._blocking(
+                self.recognizer.verify_embeddings, reference, embedding, threshold=threshold)
+        elif payload.get("name"):
+            embedding = await self._embed(payload)
+            accepted, score = await self._blocking(
+                self.recognizer.verify_claim_embedding, payload["name"], embedding, threshold=threshold)
+        else:
+            raise ValueError("'name' veya 'reference' alanı gerekli")
+        return {"accepted": bool(accepted), "score": score}
+
+    async def top_k(self, payload):
+        embedding = await self._embed(payload)
+        ranked = await self._blocking(self.recognizer.top_k_embedding, embedding, k=int(payload.get("k", 5)))
+        return {"results": [{"name": n, "score": s} for n, s in ranked]}
+
+    def metrics(self, speakers=None):
+        report = {"counters": dict(self.counters),
+                  "queue_depth": self.batcher.queue.qsize(),
+                  "speakers": self.recognizer.speaker_count if speakers is None else speakers}
+        pool = getattr(self.recognizer, "pool", None)
+        if pool is not None:
+            report["inference_pool"] = pool.stats()
+        registry = getattr(self.recognizer, "metrics", None)
+        if registry is not None:
+            report["recognizer"] = registry.snapshot()
+        sizes = self.batcher.batch_sizes
+        report["mean_batch_size"] = float(np.mean(sizes)) if sizes else 0.0
+        for route, values in self.latencies.items():
+            arr = np.asarray(values) * 1000
+            report[f"{route}_latency_ms"] = {
+                "count": len(arr),
+                "p50": float(np.percentile(arr, 50)),
+                "p95": float(np.percentile(arr, 95)),
+                "p99": float(np.percentile(arr, 99)),
+            }
+        return report
+
+    # --- HTTP katmanı ---
+    async def dispatch(self, method, path, payload):
+        routes = {
+            ("POST", "/enroll"): self.enroll,
+            ("POST", "/identify"): self.identify,
+            ("POST", "/top_k"): self.top_k,
+            ("POST", "/verify"): self.verify,
+        }
+        if (method, path) == ("GET", "/metrics"):
+            # Parçalı galeride sayım parça süreçlerine gider; olay döngüsü dışında yapılır
+            speakers = await self._blocking(lambda: self.recognizer.speaker_count)
+            return 200, self.metrics(speakers)
+        handler = routes.get((method, path))
+        if handler is None:
+            return 404, {"error": "Bulunamadı"}
+
+        start = time.perf_counter()
+        try:
+            result = await handler(payload)
+            status = 200
+            self.counters["ok"] += 1
+        except Overloaded as e:
+            status, result = 503, {"error": str(e)}
+            self.counters["overloaded"] += 1
+        except asyncio.TimeoutError:
+            status, result = 504, {"error": "İstek zaman aşımına uğradı"}
+            self.counters["timeout"] += 1
+        except Exception as e:
+            status, result = 400, {"error": str(e)}
+            self.counters["error"] += 1
+        self.latencies.setdefault(path.strip("/"), deque(maxlen=10000)).append(
+            time.perf_counter() - start
+        )
+        return status, result
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            try:
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+                payload = json.loads(body) if body else {}
+                status, result = await self.dispatch(method.upper(), path, payload)
+            except (ValueError, json.JSONDecodeError) as e:
+                status, result = 400, {"error": str(e)}
+
+            data = json.dumps(result, ensure_ascii=False).encode("utf-8")
+            reasons = {200: "OK", 400: "Bad Request", 404: "Not Found",
+                       503: "Service Unavailable", 504: "Gateway Timeout"}
+            writer.write(
+                f"HTTP/1.1 {status} {reasons.get(status, '')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1") + data
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            # İstemci gövdeyi göndermeden ya da yanıtı beklemeden bağlantıyı kapattı
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8765, unix_path=None):
+        self.batcher.start()
+        if unix_path:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=unix_path)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.batcher.stop()
+        # Kuyruktaki kodlamalar ve parça süreçleri bitene kadar bekle (olay döngüsü dışında)
+        await self._blocking(self.recognizer.close)
+
+    async def serve_forever(self, **kwargs):
+        server = await self.start(**kwargs)
+        print(f"Servis hazır: {kwargs.get('unix_path') or '%s:%s' % (kwargs.get('host'), kwargs.get('port'))}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Başsız konuşmacı tanıma servisi")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="TCP yerine Unix soket yolu")
+    parser.add_argument("--max-batch", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    parser.add_argument("--max-queue", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--no-archive", action="store_true",
+                        help="Kayıt seslerini data/archive altına saklama (model taşıması bunlara ihtiyaç duyar)")
+    parser.add_argument("--replicas", type=int, default=None,
+                        help="Kodlayıcı replika sayısı (verilmezse havuz kullanılmaz)")
+    parser.add_argument("--threads-per-replica", type=int, default=None,
+                        help="Replika başına torch iş parçacığı; replicas x threads <= çekirdek")
+    parser.add_argument("--shards", type=int, default=None,
+                        help="Galeriyi bu kadar parça sürecine böl (verilmezse tek süreç)")
+    args = parser.parse_args()
+
+    # Servis tamamen çevrimdışı çalışır: model yerel anlık görüntüden/önbellekten yüklenir
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    from .recognizer import SpeakerRecognizer
+    recognizer = SpeakerRecognizer(replicas=args.replicas, threads_per_replica=args.threads_per_replica,
+                                   archive_audio=not args.no_archive, shards=args.shards)
+    service = SpeakerService(recognizer, args.max_batch, args.max_wait_ms,
+                             args.max_queue, args.timeout)
+    asyncio.run(service.serve_forever(host=args.host, port=args.port, unix_path=args.unix))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,453 @@
+import hashlib
+import heapq
+import itertools
+import json
+import multiprocessing
+import shutil
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+import numpy as np
+from pathlib import Path
+
+from utils.file_manager import atomic_write
+from .embedding_store import EmbeddingStore
+from .gallery import SpeakerGallery
+
+
+def slot_of(name, num_slots):
+    """İsmin sabit hash yuvası (süreçler ve çalıştırmalar arasında aynı)"""
+    digest = hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % num_slots
+
+
+def row_checksums(matrix, block=65536):
+    """Satırların sabit rastgele bir yöndeki izdüşümü; satır değişince değer de değişir
+
+    Ana depo ile parça depolarının aynı vektörleri tutup tutmadığını, vektörleri
+    süreçler arasında taşımadan karşılaştırmak için kullanılır.
+    """
+    out = np.empty(len(matrix), dtype=np.float32)
+    probe = None
+    for start in range(0, len(matrix), block):
+        chunk = np.asarray(matrix[start:start + block], dtype=np.float32)
+        if probe is None:
+            probe = np.random.default_rng(12345).standard_normal(chunk.shape[1]).astype(np.float32)
+        out[start:start + chunk.shape[0]] = chunk @ probe
+    return out
+
+
+# Parça sürecinde iş parçacığı havuzunda eşzamanlı çalışabilen salt okuma istekleri
+READ_OPS = frozenset({"top_k", "len", "names"})
+
+
+def _shard_worker(conn, root, dtype, query_threads=1):
+    """Parça süreci: kendi EmbeddingStore'unu (mmap + journal) yükler, istekleri yanıtlar
+
+    Her istek bir kimlik taşır ve yanıt aynı kimlikle döner. query_threads > 1
+    ise okumalar (galeri snapshot'ı üzerinden, kilitsiz) o kadar iş
+    parçacığında eşzamanlı çalışır; yazmalar alındıkları sırayla ana döngüde.
+    """
+    store = EmbeddingStore(root)
+    gallery = SpeakerGallery(dtype=dtype)
+    names, matrix = store.load()
+    gallery.add_many(names, matrix)
+
+    def export(slots, num_slots):
+        names, matrix = store.load()
+        rows = [i for i, name in enumerate(names) if slot_of(name, num_slots) in slots]
+        return [names[i] for i in rows], np.asarray(matrix[rows], dtype=np.float32)
+
+    def remove_many(drop):
+        names, matrix = store.load()
+        keep = [i for i, name in enumerate(names) if name not in drop]
+        store.write([names[i] for i in keep], np.asarray(matrix[keep], dtype=np.float32))
+        for name in drop:
+            gallery.remove(name)
+        return len(names) - len(keep)
+
+    def add_many(names, matrix):
+        # Taşıma toplu gelir: journal yerine tek seferde yeni nesil yazılır
+        stored_names, stored = store.load()
+        merged = dict(zip(stored_names, np.asarray(stored, dtype=np.float32)))
+        merged.update(zip(names, matrix))
+        store.write(list(merged), np.stack(list(merged.values())) if merged else
+                    np.empty((0, matrix.shape[1]), dtype=np.float32))
+        gallery.add_many(names, matrix)
+        return len(names)
+
+    def add(name, embedding):
+        store.append(name, embedding)
+        return gallery.add(name, embedding)
+
+    def checksums():
+        names, matrix = store.load()
+        return names, row_checksums(matrix)
+
+    handlers = {
+        "add": add,
+        "add_many": add_many,
+        "remove_many": remove_many,
+        "export": export,
+        "checksums": checksums,
+        "top_k": lambda query, k: gallery.top_k(query, k=k),
+        "len": lambda: len(gallery),
+        "names": lambda: gallery.names,
+    }
+    send_lock = threading.Lock()
+
+    def run(request_id, op, args):
+        try:
+            reply = (request_id, "ok", handlers[op](*args))
+        except Exception as e:
+            reply = (request_id, "error", f"{type(e).__name__}: {e}")
+        with send_lock:
+            conn.send(reply)
+
+    readers = ThreadPoolExecutor(max_workers=query_threads) if query_threads > 1 else None
+    while True:
+        try:
+            request_id, op, args = conn.recv()
+        except EOFError:
+            break
+        if op == "stop":
+            # Önce süren okumaların yanıtları gönderilir
+            if readers is not None:
+                readers.shutdown(wait=True)
+            with send_lock:
+                conn.send((request_id, "ok", None))
+            break
+        if readers is not None and op in READ_OPS:
+            readers.submit(run, request_id, op, args)
+        else:
+            run(request_id, op, args)
+    if readers is not None:
+        readers.shutdown(wait=True)
+    conn.close()
+
+
+class _Shard:
+    """Koordinatör tarafında bir parça sürecine bağlantı
+
+    İstekler kimlikle gönderilir ve bir Future döner; yanıtları ayrı bir
+    okuyucu iş parçacığı kimliğe göre eşleştirir. Böylece birden çok çağıran
+    aynı parçaya, birbirinin yanıtını beklemeden istek gönderebilir.
+    """
+
+    def __init__(self, shard_id, root, dtype, context, query_threads=1):
+        self.shard_id = shard_id
+        self.root = root
+        self.closed = False
+        self._send_lock = threading.Lock()
+        self._pending = {}
+        self._ids = itertools.count()
+        self._conn, child = context.Pipe()
+        self.process = context.Process(target=_shard_worker, args=(child, str(root), dtype, query_threads),
+                                       daemon=True)
+        self.process.start()
+        child.close()
+        self._reader = threading.Thread(target=self._dispatch, name=f"shard-{shard_id}-reader", daemon=True)
+        self._reader.start()
+
+    def send(self, op, *args):
+        """İsteği gönderir; yanıt geldiğinde tamamlanan Future döner"""
+        future = Future()
+        with self._send_lock:
+            if self.closed:
+                raise RuntimeError(f"Parça {self.shard_id} kapatıldı")
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+            self._conn.send((request_id, op, args))
+        return future
+
+    def _dispatch(self):
+        while True:
+            try:
+                request_id, status, result = self._conn.recv()
+            except (EOFError, OSError):
+                break
+            future = self._pending.pop(request_id, None)
+            if future is None:
+                continue
+            if status == "ok":
+                future.set_result(result)
+            else:
+                future.set_exception(RuntimeError(f"Parça {self.shard_id}: {result}"))
+        # Süreç bağlantıyı kapattı: yanıtı gelmeyecek istekler hatayla biter
+        with self._send_lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(EOFError(f"Parça {self.shard_id} bağlantısı kapandı"))
+
+    def call(self, op, *args):
+        return self.send(op, *args).result()
+
+    def stop(self):
+        try:
+            future = self.send("stop")
+        except RuntimeError:
+            return
+        self.closed = True
+        try:
+            future.result(timeout=5)
+        except Exception:
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class ShardedGallery:
+    """Konuşmacıları hash ile N yerel süreç arasında bölen galeri
+
+    Her isim sabit bir hash yuvasına (`num_slots` adet) düşer; yuva tablosu
+    hangi yuvanın hangi parçada olduğunu söyler ve root/shards.json'da
+    saklanır. Her parça kendi dizininde bir EmbeddingStore (mmap'li matris +
+    journal) ve bellekte bir SpeakerGallery tutar; böylece galeri belleği
+    ve skorlama süreçlere dağılır.
+
+    Sorgu embedding'i tüm parçalara aynı anda gönderilir (scatter), her
+    parçanın kısmi top-k listesi birleştirilir (gather). Parça eklemek veya
+    çıkarmak yuvaları taşır: taşınan konuşmacılar önce hedef parçaya
+    kopyalanır, sonra tablo değiştirilir, en son kaynaktan silinir. Taşıma
+    sırasında sorgular kesintisiz sürer (kopya anındaki çiftler isimle
+    tekilleştirilir); kayıtlar taşıma bitene kadar bekler.
+
+    Eşzamanlı sorgular birbirini beklemez: her parçaya kimlikli istekler üst
+    üste gönderilir. `query_threads` > 1 ile bir parça içinde de okumalar
+    paralel çalışır (parça başına boş çekirdek varsa faydalıdır).
+    """
+
+    TABLE_FILE = "shards.json"
+
+    def __init__(self, root, num_shards=4, num_slots=1024, dtype="float32", start_method="spawn",
+                 query_threads=1):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.dtype = dtype
+        self.query_threads = query_threads
+        self._context = multiprocessing.get_context(start_method)
+        # Kayıt ve yeniden dengeleme sıralanır; sorgular bu kilidi almaz
+        self._write_lock = threading.RLock()
+
+        table_path = self.root / self.TABLE_FILE
+        if table_path.exists():
+            with open(table_path, "r", encoding="utf-8") as f:
+                table = json.load(f)
+            self.num_slots = table["num_slots"]
+            shard_ids = table["shards"]
+            slots = table["slots"]
+            self._next_id = table["next_id"]
+        else:
+            self.num_slots = num_slots
+            shard_ids = list(range(num_shards))
+            slots = [shard_ids[i % num_shards] for i in range(num_slots)]
+            self._next_id = num_shards
+
+        shards = {shard_id: self._start_shard(shard_id) for shard_id in shard_ids}
+        # Okuyucular için (parçalar, yuva tablosu) tek atamayla yayınlanır
+        self._routing = (shards, tuple(slots))
+        self._save_table()
+
+    def _start_shard(self, shard_id):
+        return _Shard(shard_id, self.root / f"shard_{shard_id}", self.dtype, self._context, self.query_threads)
+
+    def _save_table(self):
+        shards, slots = self._routing
+        table = {"num_slots": self.num_slots, "shards": sorted(shards), "slots": list(slots),
+                 "next_id": self._next_id}
+        with atomic_write(self.root / self.TABLE_FILE, "w", encoding="utf-8") as f:
+            json.dump(table, f)
+
+    @property
+    def shard_ids(self):
+        return sorted(self._routing[0])
+
+    def owner(self, name):
+        shards, slots = self._routing
+        return shards[slots[slot_of(name, self.num_slots)]]
+
+    # --- Yazma ---
+    def add(self, name, embedding):
+        """Konuşmacıyı sahibi olan parçaya ekler (aynı isim varsa günceller)"""
+        with self._write_lock:
+            return self.owner(name).call("add", name, np.asarray(embedding, dtype=np.float32))
+
+    def add_many(self, names, matrix):
+        """Toplu ekleme: isimler parçalara göre gruplanıp her parçaya tek istekle gönderilir"""
+        matrix = np.asarray(matrix, dtype=np.float32)
+        with self._write_lock:
+            groups = {}
+            for i, name in enumerate(names):
+                groups.setdefault(self.owner(name).shard_id, []).append(i)
+            shards = self._routing[0]
+            self._scatter_to([shards[shard_id] for shard_id in groups], "add_many",
+                             lambda shard: ([names[i] for i in groups[shard.shard_id]],
+                                            matrix[groups[shard.shard_id]]))
+
+    def remove(self, names):
+        """Konuşmacıları sahibi olan parçalardan siler; silinen sayısını döner"""
+        with self._write_lock:
+            groups = {}
+            for name in names:
+                groups.setdefault(self.owner(name).shard_id, set()).add(name)
+            shards = self._routing[0]
+            return sum(self._scatter_to([shards[shard_id] for shard_id in groups], "remove_many",
+                                        lambda shard: (groups[shard.shard_id],)))
+
+    def sync(self, names, matrix):
+        """Parçaları verilen (isim, matris) içeriğine eşitler; (gönderilen, silinen) sayısını döner
+
+        Satırlar parçalardaki depolarla izdüşüm sağlamalarıyla karşılaştırılır;
+        sadece eksik ya da farklı satırlar gönderilir, fazlalar silinir.
+        Parçalar zaten eşitse hiçbir şey yazılmaz.
+        """
+        with self._write_lock:
+            current = {}
+            for shard_names, sums in self._scatter("checksums"):
+                current.update(zip(shard_names, sums.tolist()))
+            expected = row_checksums(matrix) if len(names) else np.empty(0, dtype=np.float32)
+            changed = [i for i, name in enumerate(names)
+                       if name not in current or not np.isclose(current[name], expected[i], rtol=1e-5, atol=1e-6)]
+            stale = set(current).difference(names)
+            if stale:
+                self.remove(stale)
+            if changed:
+                self.add_many([names[i] for i in changed], np.asarray(matrix[changed], dtype=np.float32))
+            return len(changed), len(stale)
+
+    # --- Okuma ---
+    @staticmethod
+    def _scatter_to(shards, op, args_for):
+        """İsteği parçalara gönderir, sonra yanıtları toplar (parçalar paralel çalışır)
+
+        Kilit tutulmaz: eşzamanlı sorgular aynı parçalara üst üste gönderilebilir.
+        Bu arada durdurulmuş (ör. yeniden dengelemede çıkarılan) parçalar atlanır.
+        """
+        sent = []
+        for shard in shards:
+            try:
+                sent.append((shard, shard.send(op, *args_for(shard))))
+            except RuntimeError:
+                if not shard.closed:
+                    raise
+        results = []
+        for shard, future in sent:
+            try:
+                results.append(future.result())
+            except EOFError:
+                if not shard.closed:
+                    raise
+        return results
+
+    def _scatter(self, op, *args):
+        return self._scatter_to(self._routing[0].values(), op, lambda shard: args)
+
+    def top_k(self, query, k=5):
+        """Tüm parçalara yayınlanan sorgunun kısmi top-k listelerini birleştirir"""
+        if k <= 0:
+            return []
+        partials = self._scatter("top_k", np.asarray(query, dtype=np.float32), k)
+        best = {}
+        for partial in partials:
+            for name, score in partial:
+                # Taşıma anında bir isim iki parçada birden olabilir
+                if score > best.get(name, -np.inf):
+                    best[name] = score
+        return heapq.nlargest(k, best.items(), key=lambda item: item[1])
+
+    def identify(self, query, threshold=0.25):
+        ranked = self.top_k(query, k=1)
+        if not ranked or ranked[0][1] < threshold:
+            return "Bilinmiyor", float(ranked[0][1]) if ranked else 0.0
+        return ranked[0][0], float(ranked[0][1])
+
+    def __len__(self):
+        # Her parça sadece satır sayısını döner; taşıma anında kopyalanan
+        # konuşmacılar kısa bir süre iki kez sayılabilir
+        return sum(self._scatter("len"))
+
+    def sizes(self):
+        """Parça başına konuşmacı sayısı"""
+        shards = sorted(self._routing[0])
+        return dict(zip(shards, self._scatter("len")))
+
+    # --- Yeniden dengeleme ---
+    def _migrate(self, new_slots, new_shards):
+        """Yuvaları yeni tabloya göre taşır: kopyala -> tabloyu yayınla -> kaynaktan sil"""
+        shards, slots = self._routing
+        moves = {}
+        for slot, (old, new) in enumerate(zip(slots, new_slots)):
+            if old != new:
+                moves.setdefault(old, {}).setdefault(new, set()).add(slot)
+
+        moved = {}
+        for old, targets in moves.items():
+            for new, slot_set in targets.items():
+                names, matrix = shards[old].call("export", slot_set, self.num_slots)
+                if names:
+                    new_shards[new].call("add_many", names, matrix)
+                moved.setdefault(old, []).extend(names)
+        self._routing = (new_shards, tuple(new_slots))
+        self._save_table()
+        for old, names in moved.items():
+            if old in new_shards and names:
+                shards[old].call("remove_many", set(names))
+        return sum(len(names) for names in moved.values())
+
+    def _balanced_slots(self, shard_ids):
+        """Mevcut atamayı olabildiğince koruyarak yuvaları parçalara eşit dağıtır"""
+        slots = list(self._routing[1])
+        target = {shard_id: self.num_slots // len(shard_ids) for shard_id in shard_ids}
+        for shard_id in shard_ids[:self.num_slots % len(shard_ids)]:
+            target[shard_id] += 1
+        counts = {shard_id: 0 for shard_id in shard_ids}
+        free = []
+        for slot, owner in enumerate(slots):
+            if owner in counts and counts[owner] < target[owner]:
+                counts[owner] += 1
+            else:
+                free.append(slot)
+        for shard_id in shard_ids:
+            while counts[shard_id] < target[shard_id]:
+                slots[free.pop()] = shard_id
+                counts[shard_id] += 1
+        return slots
+
+    def add_shard(self):
+        """Yeni parça süreci başlatır ve yuvaların payına düşenini ona taşır"""
+        with self._write_lock:
+            shard_id = self._next_id
+            self._next_id += 1
+            new_shards = dict(self._routing[0])
+            new_shards[shard_id] = self._start_shard(shard_id)
+            moved = self._migrate(self._balanced_slots(sorted(new_shards)), new_shards)
+            print(f"Parça {shard_id} eklendi, {moved} konuşmacı taşındı.")
+            return shard_id
+
+    def remove_shard(self, shard_id):
+        """Parçanın yuvalarını diğerlerine taşır, süreci durdurur ve dizinini siler"""
+        with self._write_lock:
+            if shard_id not in self._routing[0] or len(self._routing[0]) == 1:
+                raise ValueError(f"Parça çıkarılamaz: {shard_id}")
+            old = self._routing[0][shard_id]
+            new_shards = {sid: shard for sid, shard in self._routing[0].items() if sid != shard_id}
+            moved = self._migrate(self._balanced_slots(sorted(new_shards)), new_shards)
+            old.stop()
+            shutil.rmtree(old.root, ignore_errors=True)
+            print(f"Parça {shard_id} çıkarıldı, {moved} konuşmacı taşındı.")
+
+    def rebalance(self):
+        """Yuvaları mevcut parçalar arasında yeniden eşitler"""
+        with self._write_lock:
+            return self._migrate(self._balanced_slots(self.shard_ids), dict(self._routing[0]))
+
+    def close(self):
+        with self._write_lock:
+            for shard in self._routing[0].values():
+                shard.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
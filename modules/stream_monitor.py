@@ -0,0 +1,201 @@
+import threading
+import time
+from collections import deque
+
+
+class StreamMonitor:
+    """Halka tampondan kayan pencerelerle sürekli konuşmacı takibi
+
+    Her `hop` saniyede bir son `window` saniyelik ses tanıyıcıya verilir ve
+    (zaman_damgası, konuşmacı, skor) olayı üretilir. Tüketici geride kalırsa
+    ezilen pencereler atlanır; bellek kullanımı kayıt süresinden bağımsızdır.
+    Tanıma hata verirse pencere atlanır, hata `on_error(exc)` ile ve
+    "stream_errors" metriğiyle bildirilir; art arda `max_errors` hatada izleme
+    durdurulur (`failed` işaretlenir).
+    """
+
+    def __init__(self, recorder, recognizer, window=3.0, hop=1.0, threshold=None,
+                 on_event=None, max_events=1000, buffer_seconds=None,
+                 on_error=None, max_errors=5):
+        if hop <= 0 or window <= 0:
+            raise ValueError("window ve hop pozitif olmalı")
+        self.recorder = recorder
+        self.recognizer = recognizer
+        self.window = window
+        self.hop = hop
+        self.threshold = threshold
+        self.on_event = on_event
+        self.on_error = on_error
+        self.max_errors = max_errors
+        # Tampon, tüketici gecikmesine pay bırakacak kadar büyük olmalı
+        self.buffer_seconds = buffer_seconds or max(4 * window, window + 4 * hop)
+        self.events = deque(maxlen=max_events)
+        self.skipped_windows = 0
+        self.error_count = 0
+        self.last_error = None
+        self.failed = False
+        self._stop = threading.Event()
+        # Kayıt hem stop()'tan hem (hata sonrası) işçi iş parçacığından kapatılabilir
+        self._recorder_lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self.failed = False
+        self.recorder.start_streaming(buffer_seconds=self.buffer_seconds)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._stop_recorder()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        ring = self.recorder.ring
+        sr = self.recorder.sample_rate
+        win = int(self.window * sr)
+        hop = int(self.hop * sr)
+        next_end = win
+        consecutive = 0
+
+        while not self._stop.is_set():
+            available = ring.total_written
+            if available < next_end:
+                self._stop.wait(min(self.hop, (next_end - available) / sr))
+                continue
+
+            # Geride kaldıysak ezilmiş pencereleri atla, en güncel pencereye geç
+            if available - ring.capacity > next_end - win:
+                behind = (available - next_end) // hop
+                self.skipped_windows += behind
+                next_end += behind * hop
+
+            audio = ring.read(next_end - win, next_end)
+            if audio is None:
+                self.skipped_windows += 1
+                next_end += hop
+                continue
+
+            try:
+                speaker, score = self.recognizer.identify_speaker(audio, threshold=self.threshold)
+                event = (next_end / sr, speaker, score)
+                self.events.append(event)
+                if self.on_event:
+                    self.on_event(*event)
+                consecutive = 0
+            except Exception as e:
+                consecutive += 1
+                self._report_error(e)
+                if self.max_errors and consecutive >= self.max_errors:
+                    print(f"İzleme {consecutive} ardışık hata sonrası durduruldu: {e}")
+                    self.failed = True
+                    self._stop.set()
+                    self._stop_recorder()
+                    return
+            next_end += hop
+
+    def _stop_recorder(self):
+        with self._recorder_lock:
+            self.recorder.stop_streaming()
+
+    def _report_error(self, error):
+        """Pencere hatasını sayar; metriklere ve (varsa) on_error'a iletir"""
+        self.error_count += 1
+        self.last_error = error
+        metrics = getattr(self.recognizer, "metrics", None)
+        if metrics is not None:
+            metrics.increment("stream_errors")
+        if self.on_error:
+            try:
+                self.on_error(error)
+            except Exception as e:
+                print(f"İzleme hata geri çağrısı hata verdi: {e}")
+        else:
+            print(f"İzleme penceresi tanınamadı: {error}")
+
+    def latest(self):
+        return self.events[-1] if self.events else None
+
+
+def identify_progressive(recorder, recognizer, max_duration=4.0, step=0.5, min_duration=1.0,
+                         min_score=None, min_margin=None, patience=2, threshold=None, timeout=None):
+    """Büyüyen kayıt tamponunu aralıklarla skorlayıp erken karar veren tanıma
+
+    Her `step` saniyede bir o ana kadarki ses skorlanır. En iyi skor
+    `min_score` üzerinde ve ikinciye farkı `min_margin` üzerinde olan aynı
+    konuşmacı art arda `patience` adım boyunca kalırsa kayıt erken durur.
+    Skorlar tanıyıcının etkin ölçeğindedir; verilmezse `min_score` ve
+    `min_margin` varsayılan eşikten türetilir (kosinüste 0.35 ve 0.10).
+    Ses `timeout` saniye içinde gelmezse (varsayılan 2 x max_duration) eldeki
+    sesle karar verilir ve sonuçta "timed_out" işaretlenir. Her adım oturumun
+    başından okur; tampon tüm pencere ve bekleme süresini tutar. Skorlama buna
+    rağmen oturum başının ezileceği kadar geride kalırsa eldeki en iyi sonuçla
+    durulur ve "overrun" işaretlenir.
+    Dönüş: isim, skor, fark, durma zamanı (sn) ve erken çıkış bilgisi.
+    """
+    if threshold is None:
+        threshold = recognizer.default_threshold
+    if min_score is None:
+        min_score = 1.4 * threshold
+    if min_margin is None:
+        min_margin = 0.4 * threshold
+    sr = recorder.sample_rate
+    wait = timeout if timeout is not None else 2 * max_duration
+    # Kayıt, karar verilene kadar sürer: en geç bekleme süresi artı son skorlama adımı
+    ring = recorder.start_streaming(buffer_seconds=max(max_duration, wait) + max_duration + step)
+    deadline = time.monotonic() + wait
+    result = {"name": "Bilinmiyor", "score": 0.0, "margin": 0.0, "stop_time": 0.0,
+              "early_exit": False, "timed_out": False, "overrun": False}
+    try:
+        streak = 0
+        last_leader = None
+        t = max(step, min_duration)
+        while True:
+            t = min(t, max_duration)
+            end = int(t * sr)
+            while ring.total_written < end:
+                if time.monotonic() > deadline:
+                    # Ses akışı durdu/yavaş: eldeki sesle (yeterliyse) son bir karar ver
+                    result["timed_out"] = True
+                    end = ring.total_written
+                    t = end / sr
+                    break
+                time.sleep(min(0.02, step / 4))
+            if result["timed_out"] and t < min_duration:
+                break
+            audio = ring.read(0, end)
+            if audio is None:
+                result["overrun"] = True
+                break
+
+            ranked = recognizer.top_k(audio, k=2)
+            if not ranked:
+                result["stop_time"] = t
+                return result
+            leader, score = ranked[0]
+            margin = score - ranked[1][1] if len(ranked) > 1 else score
+            result.update(name=leader, score=score, margin=margin, stop_time=t)
+
+            if score >= min_score and margin >= min_margin:
+                streak = streak + 1 if leader == last_leader else 1
+            else:
+                streak = 0
+            last_leader = leader
+
+            if streak >= patience and t < max_duration:
+                result["early_exit"] = True
+                break
+            if t >= max_duration or result["timed_out"]:
+                break
+            t += step
+    finally:
+        recorder.stop_streaming()
+
+    if result["score"] < threshold:
+        result["name"] = "Bilinmiyor"
+    return result
@@ -0,0 +1,57 @@
+import numpy as np
+
+
+class EnergyVAD:
+    """Hızlı, vektörel çerçeve-enerjisi tabanlı ses aktivite tespiti (VAD)
+
+    Sinyal sabit uzunluklu çerçevelere bölünür, her çerçevenin log enerjisi
+    hesaplanır. En yüksek enerjinin `threshold_db` altında kalan çerçeveler
+    sessizlik sayılır; konuşma çerçevelerinin çevresindeki `pad_frames`
+    çerçeve korunur. Aynı `trim(signal, sample_rate)` arayüzünü sunan başka
+    bir sınıf (ör. model tabanlı VAD) tanıyıcıya doğrudan verilebilir; uzun
+    kayıtlarda VAD'a göre bölme için `speech_mask(signal, sample_rate)` da
+    gerekir (yoksa sabit segmentler kullanılır).
+    """
+
+    def __init__(self, frame_ms=30, threshold_db=-35.0, floor_db=-60.0, pad_frames=3, min_speech_ms=300):
+        self.frame_ms = frame_ms
+        self.threshold_db = threshold_db
+        self.floor_db = floor_db
+        self.pad_frames = pad_frames
+        self.min_speech_ms = min_speech_ms
+
+    def speech_mask(self, signal, sample_rate):
+        """Çerçeve başına konuşma maskesi ve çerçeve uzunluğu döner"""
+        frame_len = max(1, int(sample_rate * self.frame_ms / 1000))
+        n_frames = signal.shape[0] // frame_len
+        if n_frames == 0:
+            return np.ones(1, dtype=bool), signal.shape[0]
+        frames = signal[:n_frames * frame_len].reshape(n_frames, frame_len)
+        energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-12)
+        threshold = max(energy_db.max() + self.threshold_db, self.floor_db)
+        mask = energy_db > threshold
+        if self.pad_frames > 0 and mask.any():
+            kernel = np.ones(2 * self.pad_frames + 1)
+            mask = np.convolve(mask.astype(np.float32), kernel, mode="same") > 0
+        return mask, frame_len
+
+    def trim(self, signal, sample_rate):
+        """Sessiz çerçeveleri atar; (kırpılmış sinyal, atılan oran) döner"""
+        signal = np.asarray(signal, dtype=np.float32).reshape(-1)
+        total = signal.shape[0]
+        if total == 0:
+            return signal, 0.0
+        mask, frame_len = self.speech_mask(signal, sample_rate)
+        n_frames = mask.shape[0]
+        kept_frames = int(mask.sum())
+        # Çok az konuşma bulunduysa sinyale dokunma (tanıma için yetersiz olur)
+        if kept_frames * frame_len < sample_rate * self.min_speech_ms / 1000:
+            return signal, 0.0
+
+        frames = signal[:n_frames * frame_len].reshape(n_frames, frame_len)
+        trimmed = frames[mask].reshape(-1)
+        # Son yarım çerçeve, son tam çerçeve konuşmaysa korunur
+        tail = signal[n_frames * frame_len:]
+        if tail.size and mask[-1]:
+            trimmed = np.concatenate([trimmed, tail])
+        return trimmed, 1.0 - trimmed.shape[0] / total
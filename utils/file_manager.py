@@ -1,10 +1,40 @@
 import os
 import shutil
+from contextlib import contextmanager
 from pathlib import Path
 
 def ensure_dir(directory):
     Path(directory).mkdir(parents=True, exist_ok=True)
 
+def fsync_dir(directory):
+    """Dizin girdisini (ör. rename sonrası) diske işler; Windows'ta desteklenmez"""
+    if os.name == "nt":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+@contextmanager
+def atomic_write(path, mode="wb", encoding=None):
+    """Önce geçici dosyaya yazar, fsync edip hedefin üzerine atomik olarak taşır
+
+    Çökme anında hedef ya eski ya yeni haliyle kalır, asla yarım yazılmış olmaz.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    try:
+        with open(tmp_path, mode, encoding=encoding) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    fsync_dir(path.parent)
+
 def list_files(directory, extension=None):
     path = Path(directory)
     if not path.exists():
@@ -12,3 +42,13 @@ def list_files(directory, extension=None):
     if extension:
         return list(path.glob(f"*.{extension}"))
     return list(path.iterdir())
+
+AUDIO_EXTENSIONS = ("wav", "flac", "ogg", "mp3")
+
+def walk_audio_files(directory, extensions=AUDIO_EXTENSIONS):
+    """Dizini alt klasörleriyle birlikte tarar, ses dosyalarını sıralı döner"""
+    path = Path(directory)
+    if not path.exists():
+        return []
+    suffixes = {f".{ext.lower()}" for ext in extensions}
+    return sorted(p for p in path.rglob("*") if p.is_file() and p.suffix.lower() in suffixes)
@@ -0,0 +1,32 @@
+import time
+from contextlib import contextmanager
+
+
+class PhaseTimer:
+    """Başlangıç aşamalarının sürelerini ölçer ve raporlar"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def as_dict(self):
+        report = {name: round(duration, 4) for name, duration in self.phases}
+        report["total"] = round(time.perf_counter() - self.origin, 4)
+        return report
+
+    def report(self):
+        """Aşama sürelerini tablo olarak yazdırır ve sözlük olarak döner"""
+        print("---------------- Başlangıç Süreleri ----------------")
+        for name, duration in self.phases:
+            print(f"{name:<28} {duration * 1000:>10.1f} ms")
+        total = time.perf_counter() - self.origin
+        print(f"{'TOPLAM':<28} {total * 1000:>10.1f} ms")
+        return self.as_dict()